@@ -3,6 +3,15 @@ from flask import Flask
 from .db import db, migrate_setup
 from .config import Config
 from .admin import init_admin
+from .reviews import init_reviews
+from .search import init_search
+from .notifications import init_notifications
+from .assets import init_assets
+from .http_cache import init_http_cache
+from .images import init_images
+from .metrics import init_metrics
+from .querylog import init_querylog
+from .cli import register_cli
 from .routes.public import bp as public_bp
 from .routes.webapp import bp as webapp_bp
 
@@ -10,8 +19,17 @@ def create_app():
     app = Flask(__name__, template_folder="templates", static_folder="static")
     app.config.from_object(Config)
     db.init_app(app)
+    init_metrics(app)
+    init_querylog(app)
+    init_reviews(app)
+    init_notifications(app)
     migrate_setup(app)
+    init_search(app)
     init_admin(app)
+    init_assets(app)
+    init_http_cache(app)
+    init_images(app)
+    register_cli(app)
 
     app.register_blueprint(public_bp)
     app.register_blueprint(webapp_bp, url_prefix="/app")
@@ -1,24 +1,238 @@
-from flask_admin import Admin
+import itertools
+import os
+import uuid
+from datetime import date, datetime, timedelta
+from flask import (Response, current_app, flash, jsonify, redirect, request, session,
+                   stream_with_context, url_for)
+from flask_admin import Admin, BaseView, expose
 from flask_admin.contrib.sqla import ModelView
+from sqlalchemy import func, literal
 from ..db import db
 from ..models import User, Product, Service, Order, OrderItem, Review, Feedback, Category
+from ..catalog import bump_version
+from ..auth import invalidate_user, get_principal
+from ..images import pending_remote, process_model_images
+from ..analytics import report
+from ..exports import FORMATS, export_orders
+from .. import catalog_import
+from .counts import estimated_count
+
+# модели, из которых собирается снимок каталога
+CATALOG_MODELS = (Product, Service, Review, Category)
+
+def _is_admin():
+    hdr = request.headers.get("X-Telegram-Admin")
+    if hdr and hdr == str(current_app.config["TELEGRAM_ADMIN_ID"]):
+        return True
+
+    uid = session.get("uid")
+    if uid:
+        # роль из кэша принципалов (app/auth.py), без запроса в БД на каждый хит
+        user = get_principal(uid)
+        if user and getattr(user, "role", "client") == "admin":
+            return True
+    return False
 
 class SecuredModelView(ModelView):
+    page_size = 50
+    named_filter_urls = True
+
     def is_accessible(self):
-        from flask import current_app, request, session
+        return _is_admin()
 
-        hdr = request.headers.get("X-Telegram-Admin")
-        if hdr and hdr == str(current_app.config["TELEGRAM_ADMIN_ID"]):
-            return True
+    def after_model_change(self, form, model, is_created):
+        if self.model in CATALOG_MODELS:
+            bump_version()
+        if self.model is User:
+            invalidate_user(model.id)
+
+    def after_model_delete(self, model):
+        if self.model in CATALOG_MODELS:
+            bump_version()
+        if self.model is User:
+            invalidate_user(model.id)
+
+class ProductView(SecuredModelView):
+    def on_model_change(self, form, model, is_created):
+        # локальные файлы из images_json → миниатюры сразу (app/images.py);
+        # ссылки http(s) не качаем в запросе админки — их обработает `flask images backfill`
+        errors = process_model_images(current_app, model, remote=False)
+        if errors:
+            flash(f"Не удалось обработать картинок: {errors}", "warning")
+        remote = pending_remote(model.images_json)
+        if remote:
+            flash(f"Картинки по ссылкам ({remote}) появятся после `flask images backfill`", "info")
+
+class LargeTableView(SecuredModelView):
+    """Список для таблиц на миллионы строк.
+
+    Сортировка — только по колонкам с индексами, счётчик без фильтров —
+    оценка из статистики СУБД, с фильтрами — COUNT с потолком, размер
+    страницы и глубина OFFSET ограничены. column_default_filters
+    подставляются при первом открытии списка (сброс фильтров их не
+    возвращает).
+    """
+    column_default_filters = {}
+    simple_list_pager = True  # родительский COUNT(*) не нужен — считаем в _count
+    can_set_page_size = True
+    page_size_options = (20, 50, 100)
+
+    def _cfg(self, key, default):
+        return current_app.config.get(key, default)
+
+    @expose("/")
+    def index_view(self):
+        if self.column_default_filters and not request.args:
+            own_list = url_for(".index_view", _external=True)
+            if not (request.referrer or "").startswith(own_list):
+                return redirect(url_for(".index_view", **self.column_default_filters))
+        return super().index_view()
+
+    def _get_list_extra_args(self):
+        args = super()._get_list_extra_args()
+        max_size = self._cfg("ADMIN_PAGE_SIZE_MAX", 100)
+        page_size = min(args.page_size or self.page_size, max_size)
+        max_page = max(self._cfg("ADMIN_MAX_OFFSET", 10000) // page_size, 0)
+        if args.page_size != page_size or (args.page or 0) > max_page:
+            args = args.clone(page_size=page_size, page=min(args.page or 0, max_page))
+        return args
+
+    def get_list(self, page, sort_column, sort_desc, search, filters,
+                 execute=True, page_size=None):
+        _, query = super().get_list(page, sort_column, sort_desc, search, filters,
+                                    execute=False, page_size=page_size)
+        count = self._count(query, search, filters)
+        return count, (query.all() if execute else query)
+
+    def _count(self, query, search, filters):
+        exact_max = self._cfg("ADMIN_EXACT_COUNT_MAX", 50000)
+        if not search and not filters:
+            estimate = estimated_count(self.model.__table__)
+            if estimate is not None and estimate > exact_max:
+                return estimate
+        # COUNT по подзапросу с LIMIT: дальше потолка не сканируем
+        capped = (query.limit(None).offset(None).order_by(None)
+                  .with_entities(literal(1)).limit(exact_max).subquery())
+        return self.session.query(func.count()).select_from(capped).scalar()
+
+class OrderView(LargeTableView):
+    column_default_sort = ("created_at", True)
+    column_sortable_list = ("id", "created_at", "status")
+    column_filters = ("status", "payment_status", "created_at", "user_id")
+
+class OrderItemView(LargeTableView):
+    column_default_sort = ("id", True)
+    column_sortable_list = ("id",)
+    column_filters = ("order_id", "item_type")
+
+class ReviewView(LargeTableView):
+    column_default_sort = ("created_at", True)
+    column_sortable_list = ("id", "created_at")
+    column_filters = ("is_moderated", "target_type", "target_id", "created_at")
+    column_default_filters = {"flt0_is_moderated_equals": "0"}  # очередь модерации
+
+class FeedbackView(LargeTableView):
+    column_default_sort = ("created_at", True)
+    column_sortable_list = ("id", "created_at", "status")
+    column_filters = ("status", "created_at")
+    column_default_filters = {"flt0_status_equals": "new"}
+
+def _period(default_days: int = 30):
+    """(from, to) из ?from=&to=YYYY-MM-DD; по умолчанию — последние default_days дней."""
+    date_to = date.fromisoformat(request.args["to"]) if request.args.get("to") else datetime.utcnow().date()
+    date_from = (date.fromisoformat(request.args["from"]) if request.args.get("from")
+                 else date_to - timedelta(days=default_days - 1))
+    if date_from > date_to:
+        raise ValueError("from > to")
+    return date_from, date_to
+
+class AnalyticsView(BaseView):
+    """JSON-отчёт по витринам продаж (app/analytics.py): ?from=&to=YYYY-MM-DD&top=N."""
+
+    def is_accessible(self):
+        return _is_admin()
+
+    @expose("/")
+    def index(self):
+        try:
+            date_from, date_to = _period()
+            top = int(request.args.get("top", 10))
+        except ValueError:
+            return jsonify({"ok": False, "error": "invalid_params"}), 400
+        return jsonify(dict(report(date_from, date_to, top), ok=True))
+
+class ExportView(BaseView):
+    """Потоковая выгрузка заказов (app/exports.py): ?format=csv|jsonl&from=&to=&status=."""
+
+    def is_accessible(self):
+        return _is_admin()
+
+    @expose("/")
+    def index(self):
+        fmt = request.args.get("format", "csv")
+        try:
+            date_from, date_to = _period()
+        except ValueError:
+            return jsonify({"ok": False, "error": "invalid_params"}), 400
+        if fmt not in FORMATS:
+            return jsonify({"ok": False, "error": "invalid_format"}), 400
+        statuses = [s for arg in request.args.getlist("status") for s in arg.split(",") if s]
+        body = export_orders(fmt, date_from, date_to, statuses)
+        if fmt == "csv":
+            body = itertools.chain(["\ufeff"], body)  # BOM — Excel откроет кириллицу
+        resp = Response(stream_with_context(body), content_type=FORMATS[fmt])
+        resp.headers["Content-Disposition"] = f"attachment; filename=orders_{date_from}_{date_to}.{fmt}"
+        resp.headers["Cache-Control"] = "no-store"
+        resp.headers["X-Accel-Buffering"] = "no"  # nginx: отдавать по мере готовности
+        return resp
+
+class CatalogImportView(BaseView):
+    """Загрузка прайс-листа поставщика (app/catalog_import.py)."""
+
+    def is_accessible(self):
+        return _is_admin()
+
+    @expose("/", methods=("GET", "POST"))
+    def index(self):
+        if request.method == "POST":
+            upload = request.files.get("file")
+            name = (upload.filename or "") if upload else ""
+            if not name.lower().endswith((".csv", ".xlsx", ".xlsm")):
+                flash("Нужен файл CSV или XLSX", "error")
+                return redirect(url_for(".index"))
+            options = {"deactivate_missing": bool(request.form.get("deactivate_missing")),
+                       "sku_prefix": (request.form.get("sku_prefix") or "").strip() or None,
+                       "dry_run": bool(request.form.get("dry_run")),
+                       "force": bool(request.form.get("force"))}
+            path = os.path.join(catalog_import.import_dir(),
+                                f"{uuid.uuid4().hex}{os.path.splitext(name)[1].lower()}")
+            upload.save(path)
+            job_id = catalog_import.enqueue(path, name, **options)
+            if job_id:
+                return redirect(url_for(".index", job=job_id))
+            # без Redis очереди нет — импортируем в этом запросе
+            try:
+                result = catalog_import.import_file(path, **options)
+            except ValueError as e:
+                db.session.rollback()
+                flash(f"Импорт не выполнен: {e}", "error")
+                return redirect(url_for(".index"))
+            finally:
+                os.remove(path)
+            return self.render("admin/catalog_import.html", job={"status": "done", "filename": name,
+                                                                  "result": result})
+        job_id = request.args.get("job")
+        job = catalog_import.job_status(job_id) if job_id else None
+        return self.render("admin/catalog_import.html", job=job)
 
-        uid = session.get("uid")
-        if uid:
-            user = User.query.get(uid)
-            if user and getattr(user, "role", "client") == "admin":
-                return True
-        return False
+MODEL_VIEWS = {Product: ProductView, Order: OrderView, OrderItem: OrderItemView,
+               Review: ReviewView, Feedback: FeedbackView}
 
 def init_admin(app):
     admin = Admin(app, name="Winst-Grad Admin", template_mode="bootstrap4", url="/admin")
     for mdl in (User, Category, Product, Service, Order, OrderItem, Review, Feedback):
-        admin.add_view(SecuredModelView(mdl, db.session))
+        view = MODEL_VIEWS.get(mdl, SecuredModelView)
+        admin.add_view(view(mdl, db.session))
+    admin.add_view(AnalyticsView(name="Аналитика", endpoint="analytics"))
+    admin.add_view(ExportView(name="Выгрузка заказов", endpoint="export"))
+    admin.add_view(CatalogImportView(name="Импорт прайса", endpoint="catalog_import", url="catalog-import"))
@@ -0,0 +1,46 @@
+"""Приблизительное число строк таблицы из статистики СУБД.
+
+Точный COUNT(*) по InnoDB-таблице на миллионы строк — полный проход по
+индексу; для счётчика в списке админки хватает оценки:
+MySQL — information_schema.TABLES.TABLE_ROWS, PostgreSQL — pg_class.reltuples,
+SQLite — MAX(rowid) (верхняя граница, удаления не учитывает).
+Оценки кэшируются в процессе на ADMIN_COUNT_CACHE_TTL секунд.
+"""
+import logging
+from typing import Optional
+from flask import current_app
+from sqlalchemy import text
+from ..cache import TTLCache
+from ..db import db
+
+log = logging.getLogger(__name__)
+
+_estimates = TTLCache(maxsize=64, ttl=60)
+
+_QUERIES = {
+    "mysql": "SELECT TABLE_ROWS FROM information_schema.TABLES "
+             "WHERE TABLE_SCHEMA = DATABASE() AND TABLE_NAME = :t",
+    "postgresql": "SELECT reltuples::bigint FROM pg_class WHERE oid = to_regclass(:t)",
+    "sqlite": 'SELECT MAX(rowid) FROM "{t}"',
+}
+
+
+def estimated_count(table) -> Optional[int]:
+    """Оценка числа строк или None, если СУБД её не даёт."""
+    cached = _estimates.get(table.name)
+    if cached is not None:
+        return cached
+    dialect = db.engine.dialect.name
+    sql = _QUERIES.get(dialect)
+    if sql is None:
+        return None
+    try:
+        value = db.session.execute(text(sql.format(t=table.name)), {"t": table.name}).scalar()
+    except Exception as e:
+        log.warning("row estimate for %s failed: %s", table.name, e)
+        return None
+    if value is None or value < 0:  # reltuples = -1 у ни разу не анализированной таблицы
+        return None
+    value = int(value)
+    _estimates.set(table.name, value, ttl=current_app.config.get("ADMIN_COUNT_CACHE_TTL", 60))
+    return value
@@ -0,0 +1,209 @@
+"""Витрины продаж и отчёт для админки.
+
+sales_daily (день × статус) и sales_daily_items (день × статус × позиция)
+пересчитываются по дням создания заказа. Инкрементально: заказы с
+Order.updated_at новее водяной метки (с запасом REFRESH_OVERLAP на
+транзакции, закоммиченные позже своей метки времени) дают список дней,
+каждый такой день пересчитывается целиком — повторный прогон ничего не
+портит. `flask analytics refresh` запускается по расписанию (cron/systemd
+timer, раз в несколько минут); `--full` пересобирает всё, например после
+удаления заказов.
+
+Отчёт (report) читает только витрины и кэшируется по водяной метке:
+после очередного пересчёта ключ меняется сам.
+"""
+import json
+import logging
+from datetime import date, datetime, time, timedelta
+from flask import current_app
+from sqlalchemy import delete, func, select
+from .cache import TTLCache, get_redis, redis_failed
+from .db import db
+from .models import Order, OrderItem, Product, RollupWatermark, SalesDaily, SalesDailyItem, Service
+
+log = logging.getLogger(__name__)
+
+ROLLUP = "sales"
+REFRESH_OVERLAP = timedelta(minutes=5)
+REPORT_KEY = "wg:analytics:{}"
+TOP_MAX = 100
+
+_orders = Order.__table__
+_items = OrderItem.__table__
+_daily = SalesDaily.__table__
+_daily_items = SalesDailyItem.__table__
+_wm = RollupWatermark.__table__
+
+_reports = TTLCache(maxsize=256, ttl=300)
+
+
+# --------- пересчёт ---------
+def _recompute_day(conn, day: date):
+    start = datetime.combine(day, time.min)
+    in_day = (_orders.c.created_at >= start, _orders.c.created_at < start + timedelta(days=1))
+    status = func.coalesce(_orders.c.status, "new")
+
+    item_rows = conn.execute(
+        select(status.label("status"), _items.c.item_type, _items.c.item_id,
+               func.count(func.distinct(_orders.c.id)), func.count(_items.c.id),
+               func.sum(_items.c.qty), func.sum(_items.c.total))
+        .select_from(_items.join(_orders, _orders.c.id == _items.c.order_id))
+        .where(*in_day, _items.c.item_type.isnot(None), _items.c.item_id.isnot(None))
+        .group_by(status, _items.c.item_type, _items.c.item_id)
+    ).all()
+    lines_by_status = {}
+    for st, _, _, _, lines, _, _ in item_rows:
+        lines_by_status[st] = lines_by_status.get(st, 0) + lines
+
+    status_rows = conn.execute(
+        select(status, func.count(_orders.c.id), func.sum(_orders.c.total))
+        .where(*in_day).group_by(status)
+    ).all()
+
+    conn.execute(delete(_daily).where(_daily.c.day == day))
+    conn.execute(delete(_daily_items).where(_daily_items.c.day == day))
+    if status_rows:
+        conn.execute(_daily.insert(), [
+            {"day": day, "status": st, "orders": n, "items": lines_by_status.get(st, 0), "revenue": rev or 0}
+            for st, n, rev in status_rows
+        ])
+    for i in range(0, len(item_rows), 1000):
+        conn.execute(_daily_items.insert(), [
+            {"day": day, "status": st, "item_type": t, "item_id": item_id,
+             "orders": n, "qty": qty or 0, "revenue": rev or 0}
+            for st, t, item_id, n, _, qty, rev in item_rows[i:i + 1000]
+        ])
+
+
+def _all_days(conn):
+    lo, hi = conn.execute(select(func.min(_orders.c.created_at), func.max(_orders.c.created_at))).one()
+    if lo is None:
+        return []
+    return [lo.date() + timedelta(days=i) for i in range((hi.date() - lo.date()).days + 1)]
+
+
+def refresh(full: bool = False) -> dict:
+    """Пересчитать витрины; возвращает {"days": …, "watermark": …}."""
+    conn = db.session.connection()
+    # строка метки под блокировкой: два параллельных refresh не пишут одни дни
+    row = conn.execute(select(_wm.c.watermark).where(_wm.c.name == ROLLUP).with_for_update()).first()
+    watermark = row.watermark if row else None
+
+    if full or watermark is None:
+        days = _all_days(conn)
+        new_watermark = conn.execute(select(func.max(_orders.c.updated_at))).scalar()
+        conn.execute(delete(_daily))
+        conn.execute(delete(_daily_items))
+    else:
+        days, new_watermark = set(), watermark
+        changed = conn.execute(
+            select(_orders.c.created_at, _orders.c.updated_at)
+            .where(_orders.c.updated_at > watermark - REFRESH_OVERLAP)
+            .execution_options(yield_per=5000)
+        )
+        for created_at, updated_at in changed:
+            if created_at is not None:
+                days.add(created_at.date())
+            new_watermark = max(new_watermark, updated_at)
+        days = sorted(days)
+
+    for day in days:
+        _recompute_day(conn, day)
+
+    values = {"watermark": new_watermark or watermark, "refreshed_at": datetime.utcnow()}
+    if row is None:
+        conn.execute(_wm.insert().values(name=ROLLUP, **values))
+    else:
+        conn.execute(_wm.update().where(_wm.c.name == ROLLUP).values(**values))
+    db.session.commit()
+    log.info("sales rollup: %s days recomputed, watermark %s", len(days), values["watermark"])
+    return {"days": len(days), "watermark": values["watermark"]}
+
+
+# --------- отчёт ---------
+def _excluded() -> tuple:
+    return tuple(current_app.config.get("ANALYTICS_EXCLUDE_STATUSES", ("cancelled",)))
+
+
+def _top(kind: str, date_from: date, date_to: date, limit: int) -> list:
+    revenue = func.sum(_daily_items.c.revenue)
+    rows = db.session.execute(
+        select(_daily_items.c.item_id, func.sum(_daily_items.c.qty), revenue, func.sum(_daily_items.c.orders))
+        .where(_daily_items.c.item_type == kind, _daily_items.c.day.between(date_from, date_to),
+               _daily_items.c.status.notin_(_excluded()))
+        .group_by(_daily_items.c.item_id).order_by(revenue.desc()).limit(limit)
+    ).all()
+    model = Product if kind == "product" else Service
+    names = dict(db.session.execute(
+        select(model.id, model.name).where(model.id.in_([r[0] for r in rows]))
+    ).all()) if rows else {}
+    return [{"id": item_id, "name": names.get(item_id), "qty": float(qty or 0),
+             "revenue": float(rev or 0), "orders": int(n or 0)}
+            for item_id, qty, rev, n in rows]
+
+
+def _build_report(date_from: date, date_to: date, top: int) -> dict:
+    in_range = _daily.c.day.between(date_from, date_to)
+    by_status = {
+        st: {"orders": int(n or 0), "items": int(items or 0), "revenue": float(rev or 0)}
+        for st, n, items, rev in db.session.execute(
+            select(_daily.c.status, func.sum(_daily.c.orders), func.sum(_daily.c["items"]),
+                   func.sum(_daily.c.revenue))
+            .where(in_range).group_by(_daily.c.status)
+        )
+    }
+    by_day = [
+        {"day": day.isoformat() if hasattr(day, "isoformat") else str(day),
+         "orders": int(n or 0), "revenue": float(rev or 0)}
+        for day, n, rev in db.session.execute(
+            select(_daily.c.day, func.sum(_daily.c.orders), func.sum(_daily.c.revenue))
+            .where(in_range, _daily.c.status.notin_(_excluded()))
+            .group_by(_daily.c.day).order_by(_daily.c.day)
+        )
+    ]
+    counted = [v for st, v in by_status.items() if st not in _excluded()]
+    orders = sum(v["orders"] for v in counted)
+    revenue = sum(v["revenue"] for v in counted)
+    return {
+        "from": date_from.isoformat(), "to": date_to.isoformat(),
+        "summary": {"orders": orders, "revenue": round(revenue, 2),
+                    "items": sum(v["items"] for v in counted),
+                    "average_order_value": round(revenue / orders, 2) if orders else 0.0},
+        "by_status": by_status,
+        "by_day": by_day,
+        "top_products": _top("product", date_from, date_to, top),
+        "top_services": _top("service", date_from, date_to, top),
+    }
+
+
+def report(date_from: date, date_to: date, top: int = 10) -> dict:
+    """Отчёт за период по витринам; кэш в процессе и в Redis до следующего пересчёта."""
+    top = max(1, min(top, TOP_MAX))
+    wm = db.session.execute(
+        select(_wm.c.watermark, _wm.c.refreshed_at).where(_wm.c.name == ROLLUP)
+    ).first()
+    stamp = wm.refreshed_at.isoformat() if wm and wm.refreshed_at else "never"
+    key = REPORT_KEY.format(f"{stamp}:{date_from}:{date_to}:{top}")
+
+    cached = _reports.get(key)
+    if cached is not None:
+        return cached
+    r = get_redis()
+    if r is not None:
+        try:
+            raw = r.get(key)
+            if raw:
+                cached = json.loads(raw)
+        except Exception as e:
+            redis_failed(e)
+            r = None
+    if cached is None:
+        cached = _build_report(date_from, date_to, top)
+        cached["refreshed_at"] = None if stamp == "never" else stamp
+        if r is not None:
+            try:
+                r.set(key, json.dumps(cached), ex=current_app.config.get("ANALYTICS_CACHE_TTL", 3600))
+            except Exception as e:
+                redis_failed(e)
+    _reports.set(key, cached)
+    return cached
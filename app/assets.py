@@ -0,0 +1,133 @@
+"""Статика с отпечатком содержимого: `flask assets build` → static/dist.
+
+Сборка кладёт css/js из static/ как dist/<путь>.<hash>.<ext> рядом с
+.gz-вариантом (если он меньше) и пишет dist/manifest.json вида
+{"js/app.js": "js/app.3f2a1b9c0d.js"}. В шаблонах asset_url("js/app.js")
+даёт ссылку на файл с отпечатком; /assets/... отдаёт его (или .gz, если
+клиент принимает gzip) с Cache-Control: immutable — Telegram WebView
+больше не перепроверяет файлы при каждом открытии. Без манифеста
+(разработка) asset_url возвращает обычный url_for("static", ...).
+
+Старые сборки не удаляются без --prune: HTML, отданный до выкладки,
+ссылается на прежние имена.
+"""
+import gzip
+import hashlib
+import json
+import logging
+import os
+from flask import Blueprint, current_app, request, send_from_directory, url_for, abort
+
+log = logging.getLogger(__name__)
+
+DIST_DIR = "dist"
+MANIFEST = "manifest.json"
+SOURCE_EXT = (".css", ".js")
+IMMUTABLE = "public, max-age=31536000, immutable"
+
+bp = Blueprint("assets", __name__)
+
+_manifest = {"mtime": None, "files": {}}
+
+
+def _dist(app) -> str:
+    return os.path.join(app.static_folder, DIST_DIR)
+
+
+def _write(path: str, data: bytes):
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    tmp = path + ".tmp"
+    with open(tmp, "wb") as f:
+        f.write(data)
+    os.replace(tmp, path)
+
+
+def build_assets(app, prune: bool = False) -> dict:
+    """Собрать dist/ и манифест; вернуть манифест."""
+    static, dist = app.static_folder, _dist(app)
+    files = {}
+    for root, dirs, names in os.walk(static):
+        dirs[:] = [d for d in dirs if os.path.join(root, d) != dist]
+        for name in sorted(names):
+            if not name.endswith(SOURCE_EXT):
+                continue
+            src = os.path.join(root, name)
+            rel = os.path.relpath(src, static).replace(os.sep, "/")
+            with open(src, "rb") as f:
+                data = f.read()
+            digest = hashlib.sha256(data).hexdigest()[:10]
+            base, ext = os.path.splitext(rel)
+            hashed = f"{base}.{digest}{ext}"
+            out = os.path.join(dist, hashed)
+            if not os.path.exists(out):
+                _write(out, data)
+                packed = gzip.compress(data, compresslevel=9, mtime=0)
+                if len(packed) < len(data):
+                    _write(out + ".gz", packed)
+            files[rel] = hashed
+    _write(os.path.join(dist, MANIFEST), json.dumps(files, indent=2, sort_keys=True).encode("utf-8"))
+    if prune:
+        keep = set(files.values()) | {f + ".gz" for f in files.values()} | {MANIFEST}
+        for root, _, names in os.walk(dist):
+            for name in names:
+                path = os.path.join(root, name)
+                if os.path.relpath(path, dist).replace(os.sep, "/") not in keep:
+                    os.remove(path)
+    return files
+
+
+def _load_manifest() -> dict:
+    path = os.path.join(_dist(current_app), MANIFEST)
+    try:
+        mtime = os.path.getmtime(path)
+    except OSError:
+        return {}
+    # перечитываем только после новой сборки
+    if mtime != _manifest["mtime"]:
+        with open(path, encoding="utf-8") as f:
+            _manifest["files"] = json.load(f)
+        _manifest["mtime"] = mtime
+    return _manifest["files"]
+
+
+def assets_version() -> str:
+    """Меняется с каждой сборкой статики (для ETag страниц, ссылающихся на неё)."""
+    _load_manifest()
+    return str(_manifest["mtime"] or "")
+
+
+def asset_url(path: str) -> str:
+    hashed = _load_manifest().get(path)
+    if hashed is None:
+        return url_for("static", filename=path)
+    return url_for("assets.asset", filename=hashed)
+
+
+@bp.get("/assets/<path:filename>")
+def asset(filename):
+    dist = _dist(current_app)
+    if filename.endswith(".gz") or filename == MANIFEST:
+        abort(404)
+    gz = "gzip" in request.headers.get("Accept-Encoding", "")
+    if gz and os.path.isfile(os.path.join(dist, filename + ".gz")):
+        resp = send_from_directory(dist, filename + ".gz", mimetype=_mimetype(filename),
+                                   etag=True, conditional=True)
+        resp.headers["Content-Encoding"] = "gzip"
+    else:
+        resp = send_from_directory(dist, filename, etag=True, conditional=True)
+    resp.headers["Cache-Control"] = IMMUTABLE
+    resp.vary.add("Accept-Encoding")
+    return resp
+
+
+def _mimetype(filename: str) -> str:
+    if filename.endswith(".css"):
+        return "text/css"
+    if filename.endswith(".js"):
+        return "text/javascript"
+    return "application/octet-stream"
+
+
+def init_assets(app):
+    app.register_blueprint(bp)
+    app.jinja_env.globals["asset_url"] = asset_url
@@ -1,8 +1,12 @@
 import time
+import json
 import jwt
+from datetime import datetime
 from typing import Optional, Tuple, Dict
 from flask import current_app, request, make_response, g, session, render_template
 from functools import wraps
+from .cache import TTLCache, get_redis, redis_failed
+from .metrics import jwt_refreshed
 
 
 ACCESS_COOKIE = "wg_at"
@@ -51,16 +55,129 @@ def clear_auth_cookies(resp):
     for name in (ACCESS_COOKIE, REFRESH_COOKIE):
         resp.delete_cookie(name, domain=current_app.config["COOKIE_DOMAIN"], path="/", samesite="None")
 
+# --------- кэш аутентифицированного пользователя ---------
+USER_KEY = "wg:user:{}"
+PRINCIPAL_FIELDS = ("id", "telegram_id", "username", "first_name", "last_name", "role",
+                    "phone", "email", "delivery_address", "created_at")
+
+_principals = TTLCache(maxsize=10000, ttl=10)
+
+
+class AuthUser:
+    """Лёгкий снимок пользователя для request.user/g.user.
+       Полная ORM-строка — через load() (нужна для изменений).
+    """
+    __slots__ = PRINCIPAL_FIELDS + ("_row",)
+
+    def __init__(self, **fields):
+        for name in PRINCIPAL_FIELDS:
+            setattr(self, name, fields.get(name))
+        self._row = None
+
+    @classmethod
+    def from_row(cls, row) -> "AuthUser":
+        return cls(**{name: getattr(row, name) for name in PRINCIPAL_FIELDS})
+
+    def to_json(self) -> str:
+        data = {name: getattr(self, name) for name in PRINCIPAL_FIELDS}
+        data["created_at"] = self.created_at.isoformat() if self.created_at else None
+        return json.dumps(data)
+
+    @classmethod
+    def from_json(cls, raw) -> "AuthUser":
+        data = json.loads(raw)
+        if data.get("created_at"):
+            data["created_at"] = datetime.fromisoformat(data["created_at"])
+        return cls(**data)
+
+    def copy(self) -> "AuthUser":
+        return AuthUser(**{name: getattr(self, name) for name in PRINCIPAL_FIELDS})
+
+    def __getattr__(self, name):
+        # поля, которых нет в снимке, — из полной строки
+        if name.startswith("_"):
+            raise AttributeError(name)
+        return getattr(self.load(), name)
+
+    def load(self):
+        """ORM-объект User (один запрос, при первом обращении)."""
+        if self._row is None:
+            from .db import db
+            from .models import User
+            self._row = db.session.get(User, self.id)
+        return self._row
+
+
+def get_principal(user_id: int) -> Optional[AuthUser]:
+    """Пользователь по id: кэш воркера → Redis → БД."""
+    cached = _principals.get(user_id)
+    if cached is not None:
+        return cached.copy()
+
+    user = None
+    r = get_redis()
+    if r is not None:
+        try:
+            raw = r.get(USER_KEY.format(user_id))
+            user = AuthUser.from_json(raw) if raw else None
+        except Exception as e:
+            redis_failed(e)
+            r = None
+    if user is None:
+        from .db import db
+        from .models import User
+        row = db.session.get(User, user_id)
+        if row is None:
+            return None
+        user = AuthUser.from_row(row)
+        user._row = row
+        if r is not None:
+            try:
+                r.set(USER_KEY.format(user_id), user.to_json(),
+                      ex=current_app.config["AUTH_CACHE_REDIS_TTL"])
+            except Exception as e:
+                redis_failed(e)
+    _principals.set(user_id, user.copy(), ttl=current_app.config["AUTH_CACHE_TTL"])
+    return user
+
+
+def invalidate_user(user_id: Optional[int]):
+    """Сбросить кэш после изменения пользователя (профиль, Telegram, админка).
+       Другие воркеры увидят изменения не позже AUTH_CACHE_TTL секунд.
+    """
+    if not user_id:
+        return
+    _principals.pop(user_id)
+    r = get_redis()
+    if r is not None:
+        try:
+            r.delete(USER_KEY.format(user_id))
+        except Exception as e:
+            redis_failed(e)
+
+
 def _extract_tokens():
     return request.cookies.get(ACCESS_COOKIE), request.cookies.get(REFRESH_COOKIE)
 
+def cookie_user() -> Optional[AuthUser]:
+    """Пользователь по действующему access или refresh из cookies (без выдачи новых)."""
+    for token, typ in zip(_extract_tokens(), ("access", "refresh")):
+        if not token:
+            continue
+        try:
+            data = _decode(token, verify_exp=True)
+        except jwt.PyJWTError:
+            continue
+        if data and data.get("typ") == typ:
+            return get_principal(int(data["sub"]))
+    return None
+
 def jwt_required(view):
     """Достаёт пользователя из access; если access истёк — обновляет по refresh.
        ВАЖНО: request.user и g.user ставим ДО вызова view().
     """
     @wraps(view)
     def wrapper(*args, **kwargs):
-        from .models import User  # локальный импорт, чтобы избежать циклов
         access, refresh = _extract_tokens()
         user = None
         new_tokens = None
@@ -70,7 +187,7 @@ def jwt_required(view):
             try:
                 data = _decode(access, verify_exp=True)
                 if data and data.get("typ") == "access":
-                    user = User.query.get(int(data["sub"]))
+                    user = get_principal(int(data["sub"]))
             except jwt.ExpiredSignatureError:
                 # ок, попробуем по refresh
                 pass
@@ -82,11 +199,12 @@ def jwt_required(view):
             try:
                 data = _decode(refresh, verify_exp=True)
                 if data and data.get("typ") == "refresh":
-                    user = User.query.get(int(data["sub"]))
+                    user = get_principal(int(data["sub"]))
                     if user:
                         new_tokens = create_tokens(user.id, getattr(user, "role", "client"))
             except jwt.PyJWTError:
                 pass
+            jwt_refreshed(new_tokens is not None)
 
         if user is None:
             from flask import jsonify
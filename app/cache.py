@@ -0,0 +1,82 @@
+import time
+import logging
+import threading
+from collections import OrderedDict
+from typing import Any, Optional
+from flask import current_app
+
+log = logging.getLogger(__name__)
+
+_redis_clients = {}
+_redis_down_until = 0.0
+REDIS_RETRY_SECONDS = 30
+
+
+def get_redis():
+    """Клиент Redis из Config.REDIS_URL или None, если Redis недоступен.
+       После ошибки соединения не дёргаем Redis REDIS_RETRY_SECONDS секунд.
+    """
+    global _redis_down_until
+    url = current_app.config.get("REDIS_URL")
+    if not url or time.monotonic() < _redis_down_until:
+        return None
+    client = _redis_clients.get(url)
+    if client is None:
+        try:
+            import redis
+            client = redis.Redis.from_url(url, socket_timeout=0.5, socket_connect_timeout=0.5)
+        except Exception as e:
+            log.warning("redis init failed: %s", e)
+            _redis_down_until = time.monotonic() + REDIS_RETRY_SECONDS
+            return None
+        _redis_clients[url] = client
+    return client
+
+
+def redis_failed(exc: Exception):
+    """Отмечаем, что Redis недоступен — дальше работаем без него."""
+    global _redis_down_until
+    log.warning("redis unavailable: %s", exc)
+    _redis_down_until = time.monotonic() + REDIS_RETRY_SECONDS
+
+
+class TTLCache:
+    """Небольшой потокобезопасный LRU-кэш с TTL (на процесс воркера)."""
+
+    def __init__(self, maxsize: int = 1024, ttl: float = 60.0):
+        self.maxsize = maxsize
+        self.ttl = ttl
+        self._data = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, key, default=None) -> Any:
+        with self._lock:
+            item = self._data.get(key)
+            if item is None:
+                return default
+            value, expires = item
+            if expires < time.monotonic():
+                del self._data[key]
+                return default
+            self._data.move_to_end(key)
+            return value
+
+    def set(self, key, value, ttl: Optional[float] = None):
+        expires = time.monotonic() + (self.ttl if ttl is None else ttl)
+        with self._lock:
+            self._data[key] = (value, expires)
+            self._data.move_to_end(key)
+            while len(self._data) > self.maxsize:
+                self._data.popitem(last=False)
+
+    def pop(self, key, default=None):
+        with self._lock:
+            item = self._data.pop(key, None)
+        return item[0] if item else default
+
+    def clear(self):
+        with self._lock:
+            self._data.clear()
+
+    def __len__(self):
+        return len(self._data)
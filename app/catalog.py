@@ -0,0 +1,168 @@
+"""Снимок каталога (товары, услуги, агрегаты отзывов) с версией в Redis.
+
+Версия лежит в Redis (`wg:catalog:version`), сам снимок — под ключом версии.
+Каждый воркер держит у себя копию последнего снимка и при запросе сверяет
+только номер версии. Сохранение в админке поднимает версию — все воркеры
+подхватывают новый снимок, а MySQL строит его один раз.
+"""
+import hashlib
+import json
+import time
+import threading
+from datetime import datetime
+from decimal import Decimal
+from flask import current_app
+from .cache import get_redis, redis_failed
+from .models import Product, Service, Review, ReviewAggregate
+from .reviews import RECENT_REVIEWS
+from .images import first_variant
+
+VERSION_KEY = "wg:catalog:version"
+SNAPSHOT_KEY = "wg:catalog:snapshot:{}"
+REVIEW_ITEMS = RECENT_REVIEWS  # сколько последних отзывов держим на карточку
+
+_local = {"version": None, "snapshot": None, "built_at": 0.0}
+_local_version = 0  # когда Redis нет — версия живёт только в процессе
+_lock = threading.Lock()
+
+
+# --------- сборка ---------
+def _iso(dt):
+    return dt.isoformat() if dt else None
+
+def _build_snapshot() -> dict:
+    products = Product.query.filter_by(is_active=True).order_by(Product.name, Product.id).all()
+    services = Service.query.filter_by(is_active=True).order_by(Service.name).all()
+
+    # агрегаты ведёт app/reviews.py — читаем O(карточек), а не O(отзывов)
+    aggs = ReviewAggregate.query.filter(ReviewAggregate.review_count > 0).all()
+    recent = {}
+    for agg in aggs:
+        recent[(agg.target_type, agg.target_id)] = json.loads(agg.recent_ids or "[]")[:REVIEW_ITEMS]
+    wanted = [rid for ids in recent.values() for rid in ids]
+    by_id = {}
+    for i in range(0, len(wanted), 1000):
+        for rv in Review.query.filter(Review.id.in_(wanted[i:i + 1000])):
+            by_id[rv.id] = rv
+
+    reviews = {"product": {}, "service": {}}
+    for agg in aggs:
+        bucket = reviews.get(agg.target_type)
+        if bucket is None:
+            continue
+        items = [by_id[rid] for rid in recent[(agg.target_type, agg.target_id)] if rid in by_id]
+        bucket[str(agg.target_id)] = {
+            "count": agg.review_count,
+            "sum": agg.rating_sum,
+            "items": [{"id": rv.id, "rating": rv.rating, "text": rv.text,
+                       "created_at": _iso(rv.created_at)} for rv in items],
+        }
+
+    return {
+        "products": [{
+            "id": p.id, "category_id": p.category_id, "name": p.name, "sku": p.sku,
+            "unit": p.unit, "description": p.description, "price": str(p.price or 0),
+            "images_json": p.images_json, "updated_at": _iso(p.updated_at),
+        } for p in products],
+        "services": [{
+            "id": s.id, "name": s.name, "description": s.description,
+            "base_price": str(s.base_price or 0),
+        } for s in services],
+        "reviews": reviews,
+    }
+
+
+def _digest(obj) -> str:
+    return hashlib.sha1(json.dumps(obj, sort_keys=True, ensure_ascii=False).encode("utf-8")).hexdigest()[:12]
+
+
+def _hydrate(raw: dict, version) -> dict:
+    """JSON → структуры для шаблона (Decimal, datetime, int-ключи).
+
+    "version" у услуги и у агрегата отзывов — отпечаток содержимого для
+    ключей кэша карточек (app/fragments.py); у товара вместо него updated_at.
+    """
+    def dt(v):
+        return datetime.fromisoformat(v) if v else None
+
+    products = []
+    for p in raw["products"]:
+        p = dict(p, price=Decimal(p["price"]), updated_at=dt(p["updated_at"]),
+                 thumb=first_variant(p["images_json"], "thumb"))
+        products.append(p)
+    services = [dict(s, base_price=Decimal(s["base_price"]), version=_digest(s)) for s in raw["services"]]
+
+    review_stats = {"product": {}, "service": {}}
+    for rtype, bucket in raw["reviews"].items():
+        for target_id, st in bucket.items():
+            review_stats[rtype][int(target_id)] = {
+                "count": st["count"],
+                "sum": st["sum"],
+                "average": st["sum"] / max(st["count"], 1),
+                "items": [dict(it, created_at=dt(it["created_at"])) for it in st["items"]],
+                "version": _digest(st),
+            }
+    return {"version": version, "products": products, "services": services,
+            "review_stats": review_stats}
+
+
+# --------- версия ---------
+def current_version():
+    """Текущая версия каталога (из Redis или локальная)."""
+    r = get_redis()
+    if r is not None:
+        try:
+            return int(r.get(VERSION_KEY) or 0)
+        except Exception as e:
+            redis_failed(e)
+    return f"local-{_local_version}"
+
+
+def bump_version():
+    """Инвалидировать снимок во всех воркерах."""
+    global _local_version
+    with _lock:
+        _local_version += 1
+        _local["version"] = None
+    r = get_redis()
+    if r is not None:
+        try:
+            r.incr(VERSION_KEY)
+        except Exception as e:
+            redis_failed(e)
+
+
+# --------- чтение ---------
+def get_snapshot() -> dict:
+    version = current_version()
+    local_ttl = current_app.config.get("CATALOG_LOCAL_TTL", 30)
+    with _lock:
+        snap = _local["snapshot"]
+        if snap is not None and _local["version"] == version:
+            # без Redis другие воркеры не могут нас уведомить — живём по TTL
+            if not str(version).startswith("local-") or time.monotonic() - _local["built_at"] < local_ttl:
+                return snap
+
+    raw = None
+    r = get_redis() if not str(version).startswith("local-") else None
+    key = SNAPSHOT_KEY.format(version)
+    if r is not None:
+        try:
+            cached = r.get(key)
+            raw = json.loads(cached) if cached else None
+        except Exception as e:
+            redis_failed(e)
+            r = None
+    if raw is None:
+        raw = _build_snapshot()
+        if r is not None:
+            try:
+                r.set(key, json.dumps(raw, ensure_ascii=False),
+                      ex=current_app.config.get("CATALOG_CACHE_TTL", 86400), nx=True)
+            except Exception as e:
+                redis_failed(e)
+
+    snap = _hydrate(raw, version)
+    with _lock:
+        _local.update(version=version, snapshot=snap, built_at=time.monotonic())
+    return snap
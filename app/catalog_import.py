@@ -0,0 +1,521 @@
+"""Импорт прайс-листов поставщиков (CSV/XLSX) с пакетным upsert по SKU.
+
+Файл читается потоком, строки идут пачками по IMPORT_BATCH: один
+SELECT … WHERE sku IN (…) на пачку, сравнение в памяти и один нативный
+upsert (ON DUPLICATE KEY UPDATE / ON CONFLICT (sku) DO UPDATE) только
+для новых и изменившихся строк — без ORM и без запроса на строку.
+Обновляются лишь колонки, которые есть в файле; updated_at ставится явно
+(onupdate ORM для Core-записи не срабатывает), от него зависят кэши
+карточек (app/fragments.py). В конце — поисковый индекс по изменённым
+товарам и bump_version каталога.
+
+Колонки узнаются по заголовку (регистр не важен): sku/артикул,
+name/наименование, price/цена, active/наличие, unit/ед. Обязателен SKU;
+новому товару нужны ещё название и цена. XLSX — через openpyxl
+(необязательная зависимость).
+
+Снятие с продажи (deactivate_missing) не выполняется, если в файле были
+ошибки или не нашлось ни одного артикула: битая строка или чужой формат
+иначе сняли бы с продажи живые товары. Переопределяется force.
+Артикул строки, которую не удалось разобрать, всё равно считается
+увиденным.
+
+Запуск: `flask catalog import FILE`, из админки (/admin/catalog-import/)
+— файлом в очередь Redis, которую разбирает `flask catalog import-worker`;
+без Redis админка импортирует сразу, в запросе. Воркер забирает задание
+BRPOPLPUSH в список JOB_PROCESSING и убирает его оттуда по завершении;
+задания упавшего воркера, висящие там дольше IMPORT_JOB_STALE, при
+следующем обходе возвращаются в очередь (не больше JOB_ATTEMPTS раз).
+"""
+import csv
+import json
+import logging
+import os
+import time
+import uuid
+from datetime import datetime
+from decimal import Decimal, InvalidOperation, ROUND_HALF_UP
+from typing import Iterator, Optional
+from flask import current_app
+from sqlalchemy import bindparam, select
+from .cache import get_redis, redis_failed
+from .db import db
+from .models import Product
+
+log = logging.getLogger(__name__)
+
+JOB_QUEUE = "wg:jobs:catalog_import"
+JOB_PROCESSING = JOB_QUEUE + ":processing"
+JOB_ATTEMPTS = 3
+JOB_KEY = "wg:job:catalog_import:{}"
+JOB_TTL = 7 * 86400
+ERROR_SAMPLES = 20
+
+COLUMNS = {
+    "sku": ("sku", "артикул", "код", "code"),
+    "name": ("name", "наименование", "название", "товар"),
+    "price": ("price", "цена", "цена, руб", "цена руб", "стоимость"),
+    "is_active": ("is_active", "active", "активен", "наличие", "в наличии"),
+    "unit": ("unit", "ед", "ед.", "ед. изм.", "единица"),
+}
+_TRUE = {"1", "true", "yes", "y", "да", "+", "есть", "в наличии"}
+_FALSE = {"0", "false", "no", "n", "нет", "-", "нет в наличии"}
+
+_products = Product.__table__
+
+
+class CatalogImportError(ValueError):
+    """Файл не читается или без обязательных колонок."""
+
+
+# --------- чтение файла ---------
+def _norm(value) -> str:
+    return str(value or "").strip().lower().replace("ё", "е")
+
+
+def _map_columns(header) -> dict:
+    """{поле: индекс колонки} по строке заголовка."""
+    names = [_norm(h) for h in header]
+    mapping = {}
+    for field, aliases in COLUMNS.items():
+        for i, name in enumerate(names):
+            if name in aliases:
+                mapping[field] = i
+                break
+    if "sku" not in mapping:
+        raise CatalogImportError(f"no SKU column in header: {header}")
+    return mapping
+
+
+def _csv_rows(path: str) -> Iterator[list]:
+    with open(path, "rb") as f:
+        head = f.read(64 * 1024)
+    try:
+        head.decode("utf-8")
+        encoding = "utf-8-sig"
+    except UnicodeDecodeError as e:
+        # обрезанный на границе буфера многобайтный символ — всё ещё UTF-8
+        encoding = "utf-8-sig" if e.start >= len(head) - 3 else "cp1251"
+    with open(path, newline="", encoding=encoding) as f:
+        sample = f.read(16 * 1024)
+        f.seek(0)
+        try:
+            dialect = csv.Sniffer().sniff(sample, delimiters=";,\t")
+        except csv.Error:
+            dialect = csv.excel
+        yield from csv.reader(f, dialect)
+
+
+def _xlsx_rows(path: str) -> Iterator[list]:
+    try:
+        from openpyxl import load_workbook
+    except ImportError:
+        raise CatalogImportError("XLSX import needs openpyxl (pip install openpyxl)")
+    wb = load_workbook(path, read_only=True, data_only=True)
+    try:
+        for row in wb.worksheets[0].iter_rows(values_only=True):
+            yield list(row)
+    finally:
+        wb.close()
+
+
+def read_rows(path: str) -> Iterator[tuple]:
+    """(номер строки, {поле: сырое значение}) по строкам файла после заголовка."""
+    rows = _xlsx_rows(path) if path.lower().endswith((".xlsx", ".xlsm")) else _csv_rows(path)
+    mapping = None
+    for line_no, row in enumerate(rows, start=1):
+        if not any(v not in (None, "") for v in row):
+            continue
+        if mapping is None:
+            mapping = _map_columns(row)
+            continue
+        yield line_no, {f: (row[i] if i < len(row) else None) for f, i in mapping.items()}
+    if mapping is None:
+        raise CatalogImportError("empty file")
+
+
+# --------- разбор значений ---------
+def _price(value) -> Decimal:
+    if isinstance(value, (int, float, Decimal)):
+        price = Decimal(str(value))
+    else:
+        text = str(value).replace("\xa0", "").replace(" ", "").replace(",", ".")
+        price = Decimal(text)
+    if price < 0:
+        raise ValueError("negative price")
+    return price.quantize(Decimal("0.01"), rounding=ROUND_HALF_UP)
+
+
+def _flag(value) -> Optional[bool]:
+    if isinstance(value, bool):
+        return value
+    text = _norm(value)
+    if text in _TRUE:
+        return True
+    if text in _FALSE:
+        return False
+    if not text:
+        return None
+    raise ValueError(f"bad active flag {value!r}")
+
+
+def _sku(raw: dict) -> str:
+    if isinstance(raw["sku"], float) and raw["sku"].is_integer():
+        return str(int(raw["sku"]))  # числовой артикул из Excel
+    return str(raw["sku"] if raw["sku"] is not None else "").strip()
+
+
+def _parse(raw: dict) -> dict:
+    """Сырые значения строки → {поле: значение}; пустые ячейки не трогают товар."""
+    sku = _sku(raw)
+    if not sku:
+        raise ValueError("empty SKU")
+    values = {"sku": sku}
+    if raw.get("name") not in (None, ""):
+        values["name"] = str(raw["name"]).strip()[:255]
+    if raw.get("price") not in (None, ""):
+        try:
+            values["price"] = _price(raw["price"])
+        except (InvalidOperation, ValueError):
+            raise ValueError(f"bad price {raw['price']!r}")
+    if raw.get("unit") not in (None, ""):
+        values["unit"] = str(raw["unit"]).strip()[:16]
+    if "is_active" in raw:
+        flag = _flag(raw["is_active"])
+        if flag is not None:
+            values["is_active"] = flag
+    return values
+
+
+# --------- запись ---------
+def _upsert_stmt(fields: tuple):
+    # без .values(rows): строки идут executemany — скомпилированный запрос
+    # кэшируется, а не собирается заново на каждую пачку
+    dialect = db.engine.dialect.name
+    if dialect in ("mysql", "mariadb"):
+        from sqlalchemy.dialects.mysql import insert
+        stmt = insert(_products)
+        return stmt.on_duplicate_key_update(**{f: stmt.inserted[f] for f in fields})
+    if dialect in ("sqlite", "postgresql"):
+        if dialect == "sqlite":
+            from sqlalchemy.dialects.sqlite import insert
+        else:
+            from sqlalchemy.dialects.postgresql import insert
+        stmt = insert(_products)
+        return stmt.on_conflict_do_update(index_elements=[_products.c.sku],
+                                          set_={f: stmt.excluded[f] for f in fields})
+    return None
+
+
+def _write(new_rows: list, changed_rows: list, fields: tuple):
+    stmt = _upsert_stmt(fields)
+    if stmt is not None:
+        db.session.execute(stmt, new_rows + changed_rows)
+        return
+    # прочие СУБД: разница уже известна — INSERT новых и UPDATE изменённых
+    if new_rows:
+        db.session.execute(_products.insert(), new_rows)
+    if changed_rows:
+        db.session.execute(
+            _products.update().where(_products.c.sku == bindparam("b_sku"))
+            .values(**{f: bindparam(f"b_{f}") for f in fields}),
+            [{f"b_{k}": v for k, v in row.items() if k in fields or k == "sku"} for row in changed_rows],
+        )
+
+
+def _apply_batch(batch: list, stats: dict, dry_run: bool) -> set:
+    """Пачка [(line_no, values)] → изменённые SKU."""
+    by_sku = {}
+    for line_no, values in batch:
+        by_sku[values["sku"]] = (line_no, values)  # повтор SKU в файле — побеждает последний
+    existing = {
+        row.sku: row
+        for row in db.session.execute(
+            select(_products.c.sku, _products.c.name, _products.c.price,
+                   _products.c.is_active, _products.c.unit)
+            .where(_products.c.sku.in_(list(by_sku)))
+        )
+    }
+    now = datetime.utcnow()
+    new_rows, changed_rows, fields = [], [], set()
+    for sku, (line_no, values) in by_sku.items():
+        row = existing.get(sku)
+        if row is None:
+            if "name" not in values or "price" not in values:
+                stats["errors"] += 1
+                _sample(stats, line_no, f"new SKU {sku} needs name and price")
+                continue
+            new_rows.append({"sku": sku, "name": values["name"], "price": values["price"],
+                             "unit": values.get("unit", "шт"), "is_active": values.get("is_active", True),
+                             "created_at": now, "updated_at": now})
+            continue
+        diff = {f: v for f, v in values.items() if f != "sku" and getattr(row, f) != v}
+        if not diff:
+            stats["unchanged"] += 1
+            continue
+        fields.update(diff)
+        changed_rows.append(dict({"sku": sku, "name": row.name, "price": row.price,
+                                  "unit": row.unit, "is_active": row.is_active}, **diff, updated_at=now))
+    stats["inserted"] += len(new_rows)
+    stats["updated"] += len(changed_rows)
+    if (new_rows or changed_rows) and not dry_run:
+        if new_rows:
+            fields.update(("name", "price", "unit", "is_active"))
+        # в одном upsert у всех строк одинаковый набор колонок
+        for row in changed_rows:
+            row.setdefault("created_at", now)
+        _write(new_rows, changed_rows, tuple(sorted(fields)) + ("updated_at",))
+        db.session.commit()
+    return {r["sku"] for r in new_rows + changed_rows}
+
+
+def _sample(stats: dict, line_no: int, message: str):
+    if len(stats["error_samples"]) < ERROR_SAMPLES:
+        stats["error_samples"].append(f"line {line_no}: {message}")
+
+
+def _deactivate_missing(seen: set, sku_prefix: Optional[str], dry_run: bool, batch: int) -> list:
+    query = select(_products.c.id, _products.c.sku).where(
+        _products.c.is_active.is_(True), _products.c.sku.isnot(None))
+    if sku_prefix:
+        query = query.where(_products.c.sku.startswith(sku_prefix, autoescape=True))
+    ids = [pid for pid, sku in db.session.execute(query) if sku not in seen]
+    if ids and not dry_run:
+        now = datetime.utcnow()
+        for i in range(0, len(ids), batch):
+            db.session.execute(
+                _products.update().where(_products.c.id.in_(ids[i:i + batch]))
+                .values(is_active=False, updated_at=now)
+            )
+        db.session.commit()
+    return ids
+
+
+def import_file(path: str, deactivate_missing: bool = False, sku_prefix: Optional[str] = None,
+                dry_run: bool = False, batch: Optional[int] = None, force: bool = False) -> dict:
+    """Импортировать прайс-лист; возвращает счётчики inserted/updated/unchanged/deactivated/errors.
+       deactivate_skipped — почему не снимали с продажи (ошибки в файле / пустой файл без force).
+    """
+    from .catalog import bump_version
+    from .search import reindex
+
+    batch = batch or current_app.config.get("IMPORT_BATCH", 1000)
+    stats = {"rows": 0, "inserted": 0, "updated": 0, "unchanged": 0, "deactivated": 0,
+             "errors": 0, "error_samples": [], "dry_run": dry_run, "deactivate_skipped": None}
+    t0 = time.perf_counter()
+    seen, touched, pending = set(), set(), []
+    for line_no, raw in read_rows(path):
+        stats["rows"] += 1
+        sku = _sku(raw)
+        if sku_prefix and not sku.startswith(sku_prefix):
+            stats["errors"] += 1
+            _sample(stats, line_no, f"SKU outside prefix {sku_prefix}")
+            continue
+        if sku:
+            seen.add(sku)  # товар в файле есть, даже если строка битая
+        try:
+            values = _parse(raw)
+        except ValueError as e:
+            stats["errors"] += 1
+            _sample(stats, line_no, str(e))
+            continue
+        pending.append((line_no, values))
+        if len(pending) >= batch:
+            touched |= _apply_batch(pending, stats, dry_run)
+            pending = []
+    if pending:
+        touched |= _apply_batch(pending, stats, dry_run)
+
+    deactivated = []
+    if deactivate_missing and not force:
+        if not seen:
+            stats["deactivate_skipped"] = "no SKUs in file"
+        elif stats["errors"]:
+            stats["deactivate_skipped"] = f"{stats['errors']} errors in file"
+    if deactivate_missing and not stats["deactivate_skipped"]:
+        deactivated = _deactivate_missing(seen, sku_prefix, dry_run, batch)
+        stats["deactivated"] = len(deactivated)
+
+    if not dry_run and (touched or deactivated):
+        ids = list(deactivated)
+        touched = list(touched)
+        for i in range(0, len(touched), batch):
+            ids += db.session.execute(
+                select(_products.c.id).where(_products.c.sku.in_(touched[i:i + batch]))
+            ).scalars().all()
+        reindex(ids)
+        bump_version()
+    stats["seconds"] = round(time.perf_counter() - t0, 2)
+    log.info("catalog import %s: %s", os.path.basename(path), stats)
+    return stats
+
+
+# --------- фоновые задания ---------
+def import_dir() -> str:
+    path = current_app.config["IMPORT_DIR"]
+    os.makedirs(path, exist_ok=True)
+    return path
+
+
+def enqueue(path: str, filename: str, **options) -> Optional[str]:
+    """Поставить файл в очередь импорта; None — Redis недоступен."""
+    r = get_redis()
+    if r is None:
+        return None
+    job_id = uuid.uuid4().hex
+    key = JOB_KEY.format(job_id)
+    try:
+        pipe = r.pipeline()
+        pipe.hset(key, mapping={"status": "queued", "path": path, "filename": filename,
+                                "options": json.dumps(options), "created_at": datetime.utcnow().isoformat()})
+        pipe.expire(key, JOB_TTL)
+        pipe.lpush(JOB_QUEUE, job_id)
+        pipe.execute()
+    except Exception as e:
+        redis_failed(e)
+        return None
+    return job_id
+
+
+def job_status(job_id: str) -> Optional[dict]:
+    r = get_redis()
+    if r is None:
+        return None
+    try:
+        raw = r.hgetall(JOB_KEY.format(job_id))
+    except Exception as e:
+        redis_failed(e)
+        return None
+    if not raw:
+        return None
+    job = {k.decode(): v.decode() for k, v in raw.items()}
+    if "result" in job:
+        job["result"] = json.loads(job["result"])
+    return job
+
+
+def _set(r, key: str, mapping: dict):
+    # статус задания — не повод ронять воркер
+    try:
+        r.hset(key, mapping=mapping)
+    except Exception as e:
+        log.warning("import job %s: cannot write status: %s", key, e)
+
+
+def run_job(job_id: str, r=None):
+    """Выполнить задание. Ошибка чтения из Redis уходит наверх — задание
+       остаётся в JOB_PROCESSING; ошибки записи статуса только логируются.
+    """
+    r = r or get_redis()
+    key = JOB_KEY.format(job_id)
+    job = {k.decode(): v.decode() for k, v in r.hgetall(key).items()}
+    if not job:
+        log.warning("import job %s: not found", job_id)
+        return
+    _set(r, key, {"status": "running", "started_at": datetime.utcnow().isoformat()})
+    try:
+        stats = import_file(job["path"], **json.loads(job.get("options") or "{}"))
+        _set(r, key, {"status": "done", "result": json.dumps(stats)})
+    except Exception as e:
+        db.session.rollback()
+        log.exception("import job %s failed", job_id)
+        _set(r, key, {"status": "failed", "error": str(e)[:1000]})
+    finally:
+        _set(r, key, {"finished_at": datetime.utcnow().isoformat()})
+        try:
+            os.remove(job["path"])
+        except OSError:
+            pass
+
+
+def _age(value: Optional[str]) -> float:
+    try:
+        return (datetime.utcnow() - datetime.fromisoformat(value)).total_seconds()
+    except (TypeError, ValueError):
+        return float("inf")
+
+
+def requeue_stale(r, stale_after: Optional[int] = None) -> int:
+    """Вернуть в очередь задания из JOB_PROCESSING, брошенные упавшим воркером.
+
+    Завершённые (или уже удалённые по TTL) просто убираются из списка;
+    после JOB_ATTEMPTS попыток задание помечается failed.
+    """
+    stale_after = stale_after if stale_after is not None else current_app.config.get("IMPORT_JOB_STALE", 3600)
+    requeued = 0
+    for raw_id in r.lrange(JOB_PROCESSING, 0, -1):
+        key = JOB_KEY.format(raw_id.decode())
+        job = {k.decode(): v.decode() for k, v in r.hgetall(key).items()}
+        status = job.get("status")
+        if status not in ("queued", "running"):
+            r.lrem(JOB_PROCESSING, 1, raw_id)
+            continue
+        if _age(job.get("started_at") or job.get("created_at")) < stale_after:
+            continue  # ещё работает (или только что взято)
+        attempts = int(job.get("attempts") or 0) + 1
+        pipe = r.pipeline()
+        pipe.lrem(JOB_PROCESSING, 1, raw_id)
+        if attempts >= JOB_ATTEMPTS:
+            pipe.hset(key, mapping={"status": "failed", "attempts": attempts,
+                                    "error": "worker died during import"})
+        else:
+            # RPUSH: BRPOPLPUSH берёт справа — задание уйдёт следующим
+            pipe.hset(key, mapping={"status": "queued", "attempts": attempts,
+                                    "created_at": datetime.utcnow().isoformat()})
+            pipe.hdel(key, "started_at")
+            pipe.rpush(JOB_QUEUE, raw_id)
+            requeued += 1
+        pipe.execute()
+        log.warning("import job %s: stale, attempt %s", raw_id.decode(), attempts)
+    return requeued
+
+
+def claim(r, timeout: int) -> Optional[str]:
+    """Взять задание из очереди, оставив его в JOB_PROCESSING до done()."""
+    raw_id = r.brpoplpush(JOB_QUEUE, JOB_PROCESSING, timeout=timeout)
+    return raw_id.decode() if raw_id else None
+
+
+def done(r, job_id: str):
+    r.lrem(JOB_PROCESSING, 1, job_id)
+
+
+def _worker_redis(poll: int):
+    # у общего клиента socket_timeout 0.5 с — блокирующий BRPOPLPUSH с ним не дождаться
+    import redis
+    return redis.Redis.from_url(current_app.config["REDIS_URL"], socket_timeout=poll + 5,
+                                socket_connect_timeout=2)
+
+
+def run_worker(poll: int = 5):
+    """Разбирать очередь импорта, пока не остановят."""
+    log.info("catalog import worker started")
+    r, swept = None, 0.0
+    while True:
+        if not current_app.config.get("REDIS_URL"):
+            time.sleep(poll)
+            continue
+        try:
+            r = r or _worker_redis(poll)
+            if time.monotonic() - swept > poll * 12:
+                requeue_stale(r)
+                swept = time.monotonic()
+            job_id = claim(r, poll)
+        except Exception as e:
+            log.warning("import worker: redis unavailable: %s", e)
+            r = None
+            time.sleep(poll)
+            continue
+        if not job_id:
+            continue
+        try:
+            run_job(job_id, r)
+        except Exception:
+            # не подтверждаем: requeue_stale вернёт задание в очередь
+            log.exception("import job %s crashed", job_id)
+            continue
+        try:
+            done(r, job_id)
+        except Exception as e:
+            # останется в JOB_PROCESSING — requeue_stale уберёт его по статусу
+            log.warning("import job %s: cannot ack: %s", job_id, e)
@@ -0,0 +1,171 @@
+import click
+from flask.cli import AppGroup
+
+reviews_cli = AppGroup("reviews", help="Отзывы и агрегаты рейтингов.")
+
+
+@reviews_cli.command("rebuild-aggregates")
+def rebuild_aggregates_cmd():
+    """Пересчитать review_aggregates по всем промодерированным отзывам."""
+    from .reviews import rebuild_aggregates
+    n = rebuild_aggregates()
+    click.echo(f"review aggregates rebuilt: {n} targets")
+
+
+search_cli = AppGroup("search", help="Поисковый индекс каталога.")
+
+
+@search_cli.command("reindex")
+def search_reindex_cmd():
+    """Пересобрать FTS5-индекс (SQLite). В MySQL FULLTEXT ведёт сама СУБД."""
+    from .search import reindex
+    n = reindex()
+    click.echo(f"search index rebuilt: {n} rows")
+
+
+assets_cli = AppGroup("assets", help="Статика с отпечатками (static/dist).")
+
+
+@assets_cli.command("build")
+@click.option("--prune", is_flag=True, help="Удалить файлы прежних сборок.")
+def assets_build_cmd(prune):
+    """Собрать css/js с хэшем в имени, .gz-варианты и manifest.json."""
+    from flask import current_app
+    from .assets import build_assets
+    files = build_assets(current_app, prune=prune)
+    for src, hashed in sorted(files.items()):
+        click.echo(f"{src} -> {hashed}")
+
+
+images_cli = AppGroup("images", help="Производные картинок товаров (MEDIA_ROOT).")
+
+
+@images_cli.command("backfill")
+@click.option("--workers", type=int, default=None, help="Процессов в пуле (по умолчанию — по числу CPU).")
+@click.option("--batch", type=int, default=200, show_default=True)
+@click.option("--force", is_flag=True, help="Пересчитать и уже обработанные картинки.")
+def images_backfill_cmd(workers, batch, force):
+    """Построить миниатюры и средний размер для всех товаров с картинками."""
+    from flask import current_app
+    from .images import backfill
+    stats = backfill(current_app, workers=workers, batch=batch, force=force)
+    click.echo(f"products: {stats['products']}, updated: {stats['updated']}, errors: {stats['errors']}")
+
+
+analytics_cli = AppGroup("analytics", help="Витрины продаж для отчётов админки.")
+
+
+@analytics_cli.command("refresh")
+@click.option("--full", is_flag=True, help="Пересобрать витрины целиком.")
+def analytics_refresh_cmd(full):
+    """Пересчитать дни с изменёнными заказами (запускать по расписанию)."""
+    from .analytics import refresh
+    stats = refresh(full=full)
+    click.echo(f"days recomputed: {stats['days']}, watermark: {stats['watermark']}")
+
+
+export_cli = AppGroup("export", help="Выгрузки для бухгалтерии.")
+
+
+@export_cli.command("orders")
+@click.option("--format", "fmt", type=click.Choice(["csv", "jsonl"]), default="csv", show_default=True)
+@click.option("--from", "date_from", type=click.DateTime(["%Y-%m-%d"]), default=None)
+@click.option("--to", "date_to", type=click.DateTime(["%Y-%m-%d"]), default=None)
+@click.option("--status", "statuses", multiple=True, help="Статус заказа (можно несколько раз).")
+@click.option("-o", "--output", type=click.File("w", encoding="utf-8", lazy=True), default="-",
+              help="Файл (по умолчанию stdout).")
+def export_orders_cmd(fmt, date_from, date_to, statuses, output):
+    """Заказы с позициями потоком, без загрузки всей выборки в память."""
+    from .exports import export_orders
+    for chunk in export_orders(fmt, date_from and date_from.date(), date_to and date_to.date(), statuses):
+        output.write(chunk)
+
+
+catalog_cli = AppGroup("catalog", help="Каталог: импорт прайс-листов поставщиков.")
+
+
+@catalog_cli.command("import")
+@click.argument("path", type=click.Path(exists=True, dir_okay=False))
+@click.option("--deactivate-missing", is_flag=True, help="Снять с продажи товары, которых нет в файле.")
+@click.option("--sku-prefix", default=None, help="Артикулы поставщика (и область --deactivate-missing).")
+@click.option("--dry-run", is_flag=True, help="Только посчитать изменения.")
+@click.option("--batch", type=int, default=None, help="Строк на пачку (IMPORT_BATCH).")
+@click.option("--force", is_flag=True, help="--deactivate-missing даже при ошибках в файле.")
+def catalog_import_cmd(path, deactivate_missing, sku_prefix, dry_run, batch, force):
+    """Импорт CSV/XLSX: upsert по SKU только изменившихся строк."""
+    from .catalog_import import import_file
+    stats = import_file(path, deactivate_missing=deactivate_missing, sku_prefix=sku_prefix,
+                        dry_run=dry_run, batch=batch, force=force)
+    samples = stats.pop("error_samples")
+    skipped = stats.pop("deactivate_skipped")
+    click.echo(" ".join(f"{k}={v}" for k, v in stats.items()))
+    for line in samples:
+        click.echo(f"  {line}", err=True)
+    if skipped:
+        click.echo(f"deactivation skipped: {skipped} (use --force)", err=True)
+
+
+@catalog_cli.command("import-worker")
+def catalog_import_worker_cmd():
+    """Разбирать очередь импорта из админки (Redis)."""
+    from .catalog_import import run_worker
+    run_worker()
+
+
+db_cli = AppGroup("db", help="Миграции схемы (Alembic, каталог migrations/).")
+
+
+@db_cli.command("upgrade")
+@click.argument("revision", default="head")
+@click.option("--sql", is_flag=True, help="Только вывести SQL (offline).")
+def db_upgrade_cmd(revision, sql):
+    """Накатить миграции до REVISION (по умолчанию head)."""
+    from .db import upgrade
+    upgrade(revision, sql=sql)
+
+
+@db_cli.command("downgrade")
+@click.argument("revision")
+def db_downgrade_cmd(revision):
+    """Откатить схему до REVISION."""
+    from alembic import command
+    from .db import alembic_config
+    command.downgrade(alembic_config(), revision)
+
+
+@db_cli.command("stamp")
+@click.argument("revision", default="head")
+def db_stamp_cmd(revision):
+    """Пометить базу ревизией без выполнения миграций."""
+    from alembic import command
+    from .db import alembic_config
+    command.stamp(alembic_config(), revision)
+
+
+@db_cli.command("current")
+def db_current_cmd():
+    """Ревизия базы и головная ревизия кода."""
+    from .db import current_revision, head_revision
+    rev, head = current_revision(), head_revision()
+    click.echo(f"database: {rev or '-'}\nhead:     {head}" + ("" if rev == head else "\n(run `flask db upgrade`)"))
+
+
+@db_cli.command("revision")
+@click.option("-m", "--message", required=True)
+@click.option("--autogenerate/--empty", default=True, help="Сравнить db.metadata с базой.")
+def db_revision_cmd(message, autogenerate):
+    """Создать новую миграцию в migrations/versions."""
+    from alembic import command
+    from .db import alembic_config
+    command.revision(alembic_config(), message=message, autogenerate=autogenerate)
+
+
+def register_cli(app):
+    app.cli.add_command(reviews_cli)
+    app.cli.add_command(search_cli)
+    app.cli.add_command(db_cli)
+    app.cli.add_command(assets_cli)
+    app.cli.add_command(images_cli)
+    app.cli.add_command(analytics_cli)
+    app.cli.add_command(export_cli)
+    app.cli.add_command(catalog_cli)
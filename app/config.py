@@ -1,18 +1,56 @@
 import os
 from dotenv import load_dotenv
+from .profiles import load_profile, engine_options
 load_dotenv()
 
 class Config:
     SECRET_KEY = os.getenv("SECRET_KEY","dev")
     SQLALCHEMY_DATABASE_URI = os.getenv("SQLALCHEMY_DATABASE_URI")
     SQLALCHEMY_TRACK_MODIFICATIONS = False
+    # пул соединений согласован с профилем gunicorn (WG_PROFILE), см. app/profiles.py
+    WG_PROFILE = os.getenv("WG_PROFILE", "sync")
+    SQLALCHEMY_ENGINE_OPTIONS = engine_options(load_profile(WG_PROFILE, check=False), SQLALCHEMY_DATABASE_URI)
+    # схема — через `flask db upgrade` (migrations/); create_all на пустой базе только для SQLite/разработки
+    DB_AUTO_CREATE = os.getenv("DB_AUTO_CREATE", "1" if (SQLALCHEMY_DATABASE_URI or "").startswith("sqlite") else "0") == "1"
     REDIS_URL = os.getenv("REDIS_URL","redis://127.0.0.1:6379/0")
+    NOTIFY_STREAM = os.getenv("NOTIFY_STREAM", "wg:notify:orders")  # смены статусов заказов → бот
+    CATALOG_CACHE_TTL = int(os.getenv("CATALOG_CACHE_TTL", "86400"))  # снимок каталога в Redis, сек
+    CATALOG_LOCAL_TTL = int(os.getenv("CATALOG_LOCAL_TTL", "30"))     # копия в воркере без Redis, сек
     WEBAPP_URL = os.getenv("WEBAPP_URL")
     TELEGRAM_BOT_TOKEN = os.getenv("TELEGRAM_BOT_TOKEN")
     TELEGRAM_ADMIN_ID = int(os.getenv("TELEGRAM_ADMIN_ID","0"))
+    FRAGMENT_CACHE_REDIS_TTL = int(os.getenv("FRAGMENT_CACHE_REDIS_TTL", str(7 * 86400)))  # карточки каталога
+    # картинки товаров: производные (app/images.py) и исходники для локальных ссылок
+    MEDIA_ROOT = os.getenv("MEDIA_ROOT", os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "media"))
+    MEDIA_SOURCE_ROOT = os.getenv("MEDIA_SOURCE_ROOT", os.path.join(MEDIA_ROOT, "uploads"))
+    COMPRESS_MIN_SIZE = int(os.getenv("COMPRESS_MIN_SIZE", "1024"))  # gzip ответов больше N байт
+    COMPRESS_LEVEL = int(os.getenv("COMPRESS_LEVEL", "6"))
+    ADMIN_PAGE_SIZE_MAX = int(os.getenv("ADMIN_PAGE_SIZE_MAX", "100"))
+    ADMIN_MAX_OFFSET = int(os.getenv("ADMIN_MAX_OFFSET", "10000"))            # глубже — только через фильтры
+    ADMIN_EXACT_COUNT_MAX = int(os.getenv("ADMIN_EXACT_COUNT_MAX", "50000"))  # больше — оценка из статистики
+    ADMIN_COUNT_CACHE_TTL = int(os.getenv("ADMIN_COUNT_CACHE_TTL", "60"))
+    # диагностика SQL (app/querylog.py): медленные запросы — всегда, поиск N+1 — при QUERY_DIAGNOSTICS=1
+    SLOW_QUERY_MS = int(os.getenv("SLOW_QUERY_MS", "500"))  # 0 — не логировать
+    QUERY_DIAGNOSTICS = os.getenv("QUERY_DIAGNOSTICS", "0") == "1"
+    N_PLUS_ONE_THRESHOLD = int(os.getenv("N_PLUS_ONE_THRESHOLD", "5"))  # одинаковых запросов на HTTP-запрос
+    # /metrics (app/metrics.py): с токеном — Authorization: Bearer; без него — только прямые
+    # запросы с этих адресов, по умолчанию никому (прокси обязан ставить X-Forwarded-For)
+    METRICS_TOKEN = os.getenv("METRICS_TOKEN")
+    METRICS_ALLOW_IPS = tuple(ip.strip() for ip in os.getenv("METRICS_ALLOW_IPS", "").split(",") if ip.strip())
+    # отчёт /admin/analytics/ (app/analytics.py): кэш до следующего `flask analytics refresh`
+    ANALYTICS_CACHE_TTL = int(os.getenv("ANALYTICS_CACHE_TTL", "3600"))
+    ANALYTICS_EXCLUDE_STATUSES = tuple(os.getenv("ANALYTICS_EXCLUDE_STATUSES", "cancelled").split(","))  # не в выручке
+    # импорт прайс-листов (app/catalog_import.py): загрузки из админки ждут воркера здесь
+    IMPORT_DIR = os.getenv("IMPORT_DIR", os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "instance", "imports"))
+    IMPORT_BATCH = int(os.getenv("IMPORT_BATCH", "1000"))
+    IMPORT_JOB_STALE = int(os.getenv("IMPORT_JOB_STALE", "3600"))  # сек: задание упавшего воркера — снова в очередь
+    SEARCH_FT_MIN_TOKEN_SIZE = int(os.getenv("SEARCH_FT_MIN_TOKEN_SIZE", "3"))  # = innodb_ft_min_token_size (app/search.py)
+    BOT_API_SECRET = os.getenv("BOT_API_SECRET")  # общий секрет бота для /app/api/telegram/register*
     ALLOWED_ORIGINS = os.getenv("ALLOWED_ORIGINS","").split(",") if os.getenv("ALLOWED_ORIGINS") else []
     JWT_SECRET = os.getenv("JWT_SECRET", "change_me_long_random")
     JWT_ACCESS_TTL_MIN = int(os.getenv("JWT_ACCESS_TTL_MIN", "15"))
     JWT_REFRESH_TTL_DAYS = int(os.getenv("JWT_REFRESH_TTL_DAYS", "30"))
+    AUTH_CACHE_TTL = int(os.getenv("AUTH_CACHE_TTL", "10"))              # снимок пользователя в воркере, сек
+    AUTH_CACHE_REDIS_TTL = int(os.getenv("AUTH_CACHE_REDIS_TTL", "300"))  # и в Redis, сек
     COOKIE_DOMAIN = os.getenv("COOKIE_DOMAIN", "winstgrad.ru")
     COOKIE_SECURE = True  # у нас https
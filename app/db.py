@@ -1,13 +1,50 @@
 from flask_sqlalchemy import SQLAlchemy
-from flask import current_app
 from alembic import command
 from alembic.config import Config as AlembicConfig
+from alembic.script import ScriptDirectory
+from sqlalchemy import inspect, text
+import logging
 import os
 
 db = SQLAlchemy()
+log = logging.getLogger(__name__)
+
+MIGRATIONS_DIR = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "migrations")
+
+def alembic_config() -> AlembicConfig:
+    cfg = AlembicConfig()
+    cfg.set_main_option("script_location", MIGRATIONS_DIR)
+    return cfg
+
+def head_revision() -> str:
+    return ScriptDirectory.from_config(alembic_config()).get_current_head()
+
+def current_revision():
+    """Ревизия базы (одна строка из alembic_version) или None."""
+    try:
+        with db.engine.connect() as conn:
+            return conn.execute(text("SELECT version_num FROM alembic_version")).scalar()
+    except Exception:
+        return None
+
+def upgrade(revision: str = "head", sql: bool = False):
+    command.upgrade(alembic_config(), revision, sql=sql)
 
 def migrate_setup(app):
-    # ленивый вариант: создаём таблицы, если миграции не настроены
+    """Проверка схемы при старте воркера: один SELECT, без DDL.
+
+    Схему меняет только `flask db upgrade` (до рестарта воркеров). Для
+    SQLite/разработки (DB_AUTO_CREATE) пустая база создаётся create_all и
+    помечается головной ревизией.
+    """
     with app.app_context():
         from . import models  # noqa
-        db.create_all()
+        rev = current_revision()
+        if rev is None and app.config.get("DB_AUTO_CREATE") and not inspect(db.engine).has_table("users"):
+            db.create_all()
+            command.stamp(alembic_config(), "head")
+            return
+        head = head_revision()
+        if rev != head:
+            # база от create_all без alembic_version: `flask db stamp 0001_initial`, затем upgrade
+            log.error("database schema is at %s, code expects %s — run `flask db upgrade`", rev, head)
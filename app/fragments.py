@@ -0,0 +1,93 @@
+"""Кэш HTML карточек каталога (_product_card.html, _service_card.html).
+
+Карточка не содержит ничего пользовательского, поэтому один фрагмент
+годится всем: ключ — id, Product.updated_at (у услуги — отпечаток полей)
+и версия агрегата отзывов из снимка каталога, плюс версия шаблонов.
+Сначала смотрим LRU процесса, промахи добираем одним MGET из Redis,
+недостающее рендерим и пишем обратно одним pipeline. Свои
+непромодерированные отзывы пользователя рендерятся отдельно и
+подставляются на место <!--wg:pending-->.
+"""
+import logging
+from collections import defaultdict
+from flask import current_app
+from markupsafe import Markup
+from .cache import TTLCache, get_redis, redis_failed
+from .http_cache import templates_version
+
+log = logging.getLogger(__name__)
+
+FRAGMENT_KEY = "wg:frag:{}:{}"
+PENDING_MARK = "<!--wg:pending-->"
+
+CARD_TEMPLATES = {"product": ("_product_card.html", "p"), "service": ("_service_card.html", "s")}
+
+# ключи содержат версии — TTL лишь ограничивает память под устаревшие
+_local = TTLCache(maxsize=5000, ttl=86400)
+
+
+def _card_key(kind: str, item: dict, stats) -> str:
+    if kind == "product":
+        updated = item.get("updated_at")
+        item_ver = updated.isoformat() if updated else "-"
+    else:
+        item_ver = item["version"]
+    return f"{kind}:{item['id']}:{item_ver}:{stats['version'] if stats else '-'}"
+
+
+def render_cards(kind: str, items: list, stats_bucket: dict, pending: dict = None) -> list:
+    """HTML карточек в порядке items; pending — {id: [свои отзывы на модерации]}."""
+    template, var = CARD_TEMPLATES[kind]
+    keys = [_card_key(kind, it, stats_bucket.get(it["id"])) for it in items]
+    html = [_local.get(k) for k in keys]
+
+    missing = [i for i, h in enumerate(html) if h is None]
+    r = get_redis() if missing else None
+    tv = templates_version()
+    if r is not None:
+        try:
+            found = r.mget([FRAGMENT_KEY.format(tv, keys[i]) for i in missing])
+        except Exception as e:
+            redis_failed(e)
+            r, found = None, [None] * len(missing)
+        for i, raw in zip(missing, found):
+            if raw is not None:
+                html[i] = raw.decode("utf-8") if isinstance(raw, bytes) else raw
+                _local.set(keys[i], html[i])
+
+    rendered = {}
+    tpl = None
+    for i, h in enumerate(html):
+        if h is not None:
+            continue
+        if tpl is None:
+            tpl = current_app.jinja_env.get_template(template)
+        it = items[i]
+        html[i] = tpl.render(**{var: it, "stats": stats_bucket.get(it["id"])})
+        _local.set(keys[i], html[i])
+        rendered[FRAGMENT_KEY.format(tv, keys[i])] = html[i]
+    if rendered and r is not None:
+        try:
+            ttl = current_app.config.get("FRAGMENT_CACHE_REDIS_TTL", 7 * 86400)
+            pipe = r.pipeline(transaction=False)
+            for key, value in rendered.items():
+                pipe.set(key, value, ex=ttl)
+            pipe.execute()
+        except Exception as e:
+            redis_failed(e)
+
+    if pending:
+        own = current_app.jinja_env.get_template("_pending_reviews.html")
+        for i, it in enumerate(items):
+            reviews = pending.get(it["id"])
+            if reviews:
+                html[i] = html[i].replace(PENDING_MARK, own.render(reviews=reviews), 1)
+    return [Markup(h) for h in html]
+
+
+def group_pending(reviews) -> dict:
+    """Отзывы пользователя на модерации → {тип: {id: [отзывы]}}."""
+    out = defaultdict(lambda: defaultdict(list))
+    for rv in reviews:
+        out[rv.target_type][rv.target_id].append(rv)
+    return out
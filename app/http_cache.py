@@ -0,0 +1,88 @@
+"""Условные GET и gzip для отрисованных страниц.
+
+@conditional(tag_fn): tag_fn() до рендеринга возвращает версии данных,
+от которых зависит страница (версия каталога, последний заказ
+пользователя, снимок профиля), или None — тогда страница отдаётся как
+обычно. Из них, URL, версии шаблонов и манифеста статики собирается
+слабый ETag; совпавший If-None-Match → 304 без шаблона и запросов вьюхи.
+
+compress_response (after_request): gzip для текстовых ответов больше
+COMPRESS_MIN_SIZE, если клиент его принимает. Сильный ETag при сжатии
+становится слабым — представление уже другое побайтно.
+"""
+import gzip
+import hashlib
+import os
+from functools import wraps
+from flask import current_app, make_response, request
+from .assets import assets_version
+
+COMPRESSIBLE = ("text/html", "text/css", "text/plain", "text/csv", "text/javascript",
+                "application/json", "application/javascript")
+
+_templates_version = ""
+
+
+def _hash_templates(folder: str) -> str:
+    """Версия шаблонов: одинакова у всех воркеров одной выкладки."""
+    h = hashlib.sha1()
+    for root, dirs, names in os.walk(folder):
+        dirs.sort()
+        for name in sorted(names):
+            path = os.path.join(root, name)
+            h.update(os.path.relpath(path, folder).encode("utf-8"))
+            with open(path, "rb") as f:
+                h.update(f.read())
+    return h.hexdigest()[:12]
+
+
+def templates_version() -> str:
+    return _templates_version
+
+
+def conditional(tag_fn):
+    def decorator(view):
+        @wraps(view)
+        def wrapper(*args, **kwargs):
+            parts = tag_fn()
+            if parts is None:
+                return view(*args, **kwargs)
+            raw = "|".join(map(str, (*parts, request.full_path, _templates_version, assets_version())))
+            etag = hashlib.sha1(raw.encode("utf-8")).hexdigest()
+            if request.if_none_match.contains_weak(etag):
+                resp = make_response("", 304)
+            else:
+                resp = make_response(view(*args, **kwargs))
+                if resp.status_code != 200:
+                    return resp
+            resp.set_etag(etag, weak=True)
+            resp.headers["Cache-Control"] = "private, no-cache"
+            return resp
+        return wrapper
+    return decorator
+
+
+def compress_response(resp):
+    cfg = current_app.config
+    if (resp.status_code != 200 or resp.direct_passthrough or resp.is_streamed
+            or "Content-Encoding" in resp.headers
+            or resp.mimetype not in COMPRESSIBLE):
+        return resp
+    resp.vary.add("Accept-Encoding")
+    if "gzip" not in request.headers.get("Accept-Encoding", "").lower():
+        return resp
+    data = resp.get_data()
+    if len(data) < cfg.get("COMPRESS_MIN_SIZE", 1024):
+        return resp
+    resp.set_data(gzip.compress(data, compresslevel=cfg.get("COMPRESS_LEVEL", 6)))
+    resp.headers["Content-Encoding"] = "gzip"
+    etag, weak = resp.get_etag()
+    if etag and not weak:
+        resp.set_etag(etag, weak=True)
+    return resp
+
+
+def init_http_cache(app):
+    global _templates_version
+    _templates_version = _hash_templates(os.path.join(app.root_path, app.template_folder))
+    app.after_request(compress_response)
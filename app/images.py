@@ -0,0 +1,266 @@
+"""Производные изображений товаров: миниатюры и средний размер в WebP/JPEG.
+
+Product.images_json — список ссылок на исходники (URL или путь относительно
+MEDIA_SOURCE_ROOT). После обработки элемент списка становится словарём:
+
+    {"src": "<исходная ссылка>", "sha256": "...", "width": 1600, "height": 1200,
+     "variants": {"thumb": {"w": 160, "h": 120, "webp": "ab/cd/<sha>-thumb.webp",
+                            "jpeg": "ab/cd/<sha>-thumb.jpg"}, "medium": {...}}}
+
+Файлы лежат в MEDIA_ROOT под именами из sha256 исходника — одинаковые
+картинки у разных товаров хранятся один раз, а /media/... можно отдавать
+с Cache-Control: immutable. При сохранении товара в админке сразу
+обрабатываются только локальные файлы; ссылки http(s) (до FETCH_TIMEOUT
+на каждую) ждут `flask images backfill` — его запускают по расписанию,
+он работает пулом процессов и обновляет updated_at товара, от которого
+зависит кэш карточек (app/fragments.py).
+
+Функции process_* не зависят от Flask и запускаются в дочерних процессах.
+"""
+import hashlib
+import io
+import json
+import logging
+import os
+from typing import Optional
+from flask import Blueprint, abort, current_app, send_from_directory, url_for
+
+log = logging.getLogger(__name__)
+
+# имя → (максимальная сторона, качество WebP, качество JPEG)
+VARIANTS = {
+    "thumb": (160, 75, 80),
+    "medium": (640, 80, 82),
+}
+MAX_SOURCE_BYTES = 20 * 1024 * 1024
+MAX_PIXELS = 40_000_000  # защита от «бомб» с огромным разрешением
+FETCH_TIMEOUT = 15
+
+
+class ImageError(ValueError):
+    pass
+
+
+# --------- чистые функции (работают и в пуле процессов) ---------
+def _read_source(ref: str, source_root: str) -> bytes:
+    if _is_remote(ref):
+        import requests
+        with requests.get(ref, timeout=FETCH_TIMEOUT, stream=True) as r:
+            r.raise_for_status()
+            data = r.raw.read(MAX_SOURCE_BYTES + 1, decode_content=True)
+    else:
+        path = os.path.realpath(os.path.join(source_root, ref.lstrip("/")))
+        if not path.startswith(os.path.realpath(source_root) + os.sep):
+            raise ImageError(f"path outside MEDIA_SOURCE_ROOT: {ref}")
+        with open(path, "rb") as f:
+            data = f.read(MAX_SOURCE_BYTES + 1)
+    if len(data) > MAX_SOURCE_BYTES:
+        raise ImageError(f"image too large: {ref}")
+    return data
+
+
+def _save(path: str, data: bytes):
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    tmp = f"{path}.{os.getpid()}.tmp"
+    with open(tmp, "wb") as f:
+        f.write(data)
+    os.replace(tmp, path)
+
+
+def derive(data: bytes, media_root: str) -> dict:
+    """Построить производные для байтов исходника; вернуть метаданные."""
+    from PIL import Image, ImageOps
+
+    digest = hashlib.sha256(data).hexdigest()
+    prefix = f"{digest[:2]}/{digest[2:4]}/{digest}"
+    try:
+        img = Image.open(io.BytesIO(data))
+        if img.width * img.height > MAX_PIXELS:
+            raise ImageError(f"image too large: {img.width}x{img.height}")
+        img = ImageOps.exif_transpose(img)
+        img.load()
+    except ImageError:
+        raise
+    except Exception as e:
+        raise ImageError(f"cannot decode image: {e}") from e
+
+    has_alpha = img.mode in ("RGBA", "LA") or (img.mode == "P" and "transparency" in img.info)
+    rgba = img.convert("RGBA") if has_alpha else img.convert("RGB")
+    meta = {"sha256": digest, "width": img.width, "height": img.height, "variants": {}}
+    for name, (size, webp_q, jpeg_q) in VARIANTS.items():
+        webp_rel, jpeg_rel = f"{prefix}-{name}.webp", f"{prefix}-{name}.jpg"
+        resized = rgba.copy()
+        resized.thumbnail((size, size), Image.LANCZOS)
+        # имена из хэша исходника — готовые файлы не пересчитываем
+        if not os.path.exists(os.path.join(media_root, webp_rel)):
+            buf = io.BytesIO()
+            resized.save(buf, "WEBP", quality=webp_q, method=4)
+            _save(os.path.join(media_root, webp_rel), buf.getvalue())
+        if not os.path.exists(os.path.join(media_root, jpeg_rel)):
+            flat = resized
+            if has_alpha:
+                flat = Image.new("RGB", resized.size, (255, 255, 255))
+                flat.paste(resized, mask=resized.getchannel("A"))
+            buf = io.BytesIO()
+            flat.save(buf, "JPEG", quality=jpeg_q, optimize=True, progressive=True)
+            _save(os.path.join(media_root, jpeg_rel), buf.getvalue())
+        meta["variants"][name] = {"w": resized.width, "h": resized.height,
+                                  "webp": webp_rel, "jpeg": jpeg_rel}
+    return meta
+
+
+def _is_remote(ref: str) -> bool:
+    return ref.startswith(("http://", "https://"))
+
+
+def _needs_processing(entry) -> bool:
+    return isinstance(entry, str) or (isinstance(entry, dict)
+                                      and set(VARIANTS) - set(entry.get("variants") or {}))
+
+
+def process_images_json(images_json: Optional[str], media_root: str, source_root: str,
+                        force: bool = False, remote: bool = True):
+    """images_json → (новый images_json, число ошибок). Необработанные ссылки остаются как были;
+       remote=False — ссылки http(s) не скачиваются.
+    """
+    try:
+        entries = json.loads(images_json) if images_json else []
+    except ValueError:
+        return images_json, 1
+    if not isinstance(entries, list):
+        entries = [entries]
+    out, errors = [], 0
+    for entry in entries:
+        if not force and not _needs_processing(entry):
+            out.append(entry)
+            continue
+        ref = entry if isinstance(entry, str) else entry.get("src")
+        if not ref or (not remote and _is_remote(ref)):
+            out.append(entry)
+            continue
+        try:
+            meta = derive(_read_source(ref, source_root), media_root)
+            out.append(dict(meta, src=ref))
+        except Exception as e:
+            log.warning("image %r: %s", ref, e)
+            errors += 1
+            out.append(entry)
+    return json.dumps(out, ensure_ascii=False), errors
+
+
+def process_product(args):
+    """(product_id, images_json, media_root, source_root, force) → (product_id, images_json, errors)."""
+    product_id, images_json, media_root, source_root, force = args
+    new_json, errors = process_images_json(images_json, media_root, source_root, force)
+    return product_id, new_json, errors
+
+
+# --------- приложение ---------
+def media_roots(app) -> tuple:
+    return app.config["MEDIA_ROOT"], app.config["MEDIA_SOURCE_ROOT"]
+
+
+def process_model_images(app, product, remote: bool = True) -> int:
+    """Обработать images_json товара на месте. Возвращает число ошибок."""
+    if not product.images_json:
+        return 0
+    media_root, source_root = media_roots(app)
+    new_json, errors = process_images_json(product.images_json, media_root, source_root, remote=remote)
+    if new_json != product.images_json:
+        product.images_json = new_json
+    return errors
+
+
+def pending_remote(images_json: Optional[str]) -> int:
+    """Сколько ссылок http(s) в images_json ещё без производных."""
+    try:
+        entries = json.loads(images_json) if images_json else []
+    except ValueError:
+        return 0
+    return sum(1 for e in (entries if isinstance(entries, list) else [entries])
+               if _needs_processing(e) and _is_remote(e if isinstance(e, str) else e.get("src") or ""))
+
+
+def backfill(app, workers: int = None, batch: int = 200, force: bool = False) -> dict:
+    """Пересчитать производные для всех товаров с картинками в пуле процессов."""
+    from concurrent.futures import ProcessPoolExecutor
+    from datetime import datetime
+    from sqlalchemy import bindparam, select, update
+    from .db import db
+    from .models import Product
+    from .catalog import bump_version
+
+    products = Product.__table__
+    media_root, source_root = media_roots(app)
+    stats = {"products": 0, "updated": 0, "errors": 0}
+    last_id = 0
+    with ProcessPoolExecutor(max_workers=workers) as pool:
+        while True:
+            rows = db.session.execute(
+                select(products.c.id, products.c.images_json)
+                .where(products.c.id > last_id, products.c.images_json.isnot(None),
+                       products.c.images_json != "")
+                .order_by(products.c.id).limit(batch)
+            ).all()
+            if not rows:
+                break
+            last_id = rows[-1].id
+            jobs = [(r.id, r.images_json, media_root, source_root, force) for r in rows]
+            changed = []
+            originals = {r.id: r.images_json for r in rows}
+            for product_id, new_json, errors in pool.map(process_product, jobs):
+                stats["products"] += 1
+                stats["errors"] += errors
+                if new_json != originals[product_id]:
+                    changed.append({"pid": product_id, "images": new_json})
+            if changed:
+                # updated_at — часть ключа кэша карточки: без него осталась бы старая картинка
+                db.session.execute(
+                    update(products).where(products.c.id == bindparam("pid"))
+                    .values(images_json=bindparam("images"), updated_at=datetime.utcnow()),
+                    changed,
+                )
+                db.session.commit()
+                stats["updated"] += len(changed)
+            log.info("images backfill: %s", stats)
+    if stats["updated"]:
+        bump_version()
+    return stats
+
+
+bp = Blueprint("media", __name__)
+
+
+@bp.get("/media/<path:filename>")
+def media(filename):
+    if not filename.endswith((".webp", ".jpg")):
+        abort(404)
+    resp = send_from_directory(current_app.config["MEDIA_ROOT"], filename, conditional=True)
+    # имя — хэш содержимого, файл по этому адресу никогда не меняется
+    resp.headers["Cache-Control"] = "public, max-age=31536000, immutable"
+    return resp
+
+
+def media_url(rel: str) -> str:
+    return url_for("media.media", filename=rel)
+
+
+def init_images(app):
+    app.register_blueprint(bp)
+    app.jinja_env.globals["media_url"] = media_url
+
+
+def first_variant(images_json: Optional[str], name: str) -> Optional[dict]:
+    """Первая готовая производная `name` из images_json (для карточек)."""
+    if not images_json:
+        return None
+    try:
+        entries = json.loads(images_json)
+    except ValueError:
+        return None
+    for entry in entries if isinstance(entries, list) else []:
+        if isinstance(entry, dict):
+            variant = (entry.get("variants") or {}).get(name)
+            if variant:
+                return variant
+    return None
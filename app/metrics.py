@@ -0,0 +1,161 @@
+"""Метрики Prometheus: время запросов, SQL на запрос, пул соединений, refresh JWT.
+
+- wg_http_request_duration_seconds{endpoint,method,status}
+- wg_db_queries_per_request{endpoint}, wg_db_time_per_request_seconds{endpoint}
+  (события before/after_cursor_execute движка, счётчики копятся в g)
+- wg_db_pool_wait_seconds — ожидание соединения из пула,
+  wg_db_connections_in_use — выданные соединения (события checkout/checkin)
+- wg_jwt_refresh_total{result} — обновления токенов в jwt_required
+
+/metrics отдаёт текстовый формат Prometheus по заголовку Authorization:
+Bearer <METRICS_TOKEN>. Без токена — только прямым запросам с адресов из
+METRICS_ALLOW_IPS (по умолчанию список пуст — 403): gunicorn стоит за
+обратным прокси без ProxyFix, remote_addr проксированного запроса — адрес
+прокси, поэтому запросы с X-Forwarded-For/X-Real-IP/Forwarded по списку не
+пускаются. Под gunicorn нужен PROMETHEUS_MULTIPROC_DIR (ставит
+gunicorn.conf.py) — тогда /metrics суммирует все воркеры.
+
+Время запроса пишется в teardown_request: туда попадают и ответы 500
+после необработанных исключений, а у потоковых ответов — вся отдача.
+"""
+import hmac
+import os
+import time
+from flask import Blueprint, Response, abort, current_app, g, has_request_context, request
+from prometheus_client import (CONTENT_TYPE_LATEST, CollectorRegistry, Counter, Gauge, Histogram,
+                               generate_latest, multiprocess)
+from sqlalchemy import event
+
+REQUEST_TIME = Histogram(
+    "wg_http_request_duration_seconds", "Время обработки запроса",
+    ["endpoint", "method", "status"],
+    buckets=(0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10),
+)
+DB_QUERIES = Histogram(
+    "wg_db_queries_per_request", "SQL-запросов на HTTP-запрос", ["endpoint"],
+    buckets=(0, 1, 2, 3, 5, 8, 13, 21, 34, 55, 89, 144),
+)
+DB_TIME = Histogram(
+    "wg_db_time_per_request_seconds", "Суммарное время SQL на HTTP-запрос", ["endpoint"],
+    buckets=(0.001, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5),
+)
+POOL_WAIT = Histogram(
+    "wg_db_pool_wait_seconds", "Ожидание соединения из пула",
+    buckets=(0.0005, 0.001, 0.005, 0.01, 0.05, 0.1, 0.5, 1, 5, 10),
+)
+POOL_IN_USE = Gauge(
+    "wg_db_connections_in_use", "Соединения, выданные из пула", multiprocess_mode="livesum",
+)
+JWT_REFRESH = Counter("wg_jwt_refresh_total", "Обновления access по refresh-токену", ["result"])
+
+bp = Blueprint("metrics", __name__)
+
+
+# --------- SQL ---------
+def _before_cursor(conn, cursor, statement, parameters, context, executemany):
+    # на контексте выполнения: упавший оператор не оставит метку в соединении
+    if context is not None:
+        context._wg_metrics_start = time.perf_counter()
+
+
+def _after_cursor(conn, cursor, statement, parameters, context, executemany):
+    started = getattr(context, "_wg_metrics_start", None)
+    if started is None:
+        return
+    elapsed = time.perf_counter() - started
+    if has_request_context():
+        stats = g.setdefault("wg_db", [0, 0.0])
+        stats[0] += 1
+        stats[1] += elapsed
+
+
+def _on_checkout(dbapi_conn, record, proxy):
+    POOL_IN_USE.inc()
+
+
+def _on_checkin(dbapi_conn, record):
+    POOL_IN_USE.dec()
+
+
+def _instrument_engine(engine):
+    if event.contains(engine, "before_cursor_execute", _before_cursor):
+        return
+    event.listen(engine, "before_cursor_execute", _before_cursor)
+    event.listen(engine, "after_cursor_execute", _after_cursor)
+    event.listen(engine, "checkout", _on_checkout)
+    event.listen(engine, "checkin", _on_checkin)
+
+    # событий «до выдачи из пула» нет — замеряем сам вызов raw_connection
+    raw_connection = engine.raw_connection
+
+    def timed_raw_connection():
+        t0 = time.perf_counter()
+        try:
+            return raw_connection()
+        finally:
+            POOL_WAIT.observe(time.perf_counter() - t0)
+
+    engine.raw_connection = timed_raw_connection
+
+
+# --------- HTTP ---------
+def _start_timer():
+    g.wg_started = time.perf_counter()
+
+
+def _status(resp):
+    g.wg_status = resp.status_code
+    return resp
+
+
+def _observe(exc=None):
+    started = g.pop("wg_started", None)
+    if started is None or request.endpoint == "metrics.metrics":
+        return
+    endpoint = request.endpoint or "unmatched"
+    # after_request не дошёл (исключение) — это 500
+    status = g.pop("wg_status", 500)
+    REQUEST_TIME.labels(endpoint, request.method, str(status)).observe(time.perf_counter() - started)
+    queries, db_time = g.pop("wg_db", (0, 0.0))
+    DB_QUERIES.labels(endpoint).observe(queries)
+    DB_TIME.labels(endpoint).observe(db_time)
+
+
+def jwt_refreshed(ok: bool):
+    JWT_REFRESH.labels("ok" if ok else "failed").inc()
+
+
+# --------- /metrics ---------
+_PROXY_HEADERS = ("X-Forwarded-For", "X-Real-IP", "Forwarded")
+
+
+def _authorized() -> bool:
+    token = current_app.config.get("METRICS_TOKEN")
+    if token:
+        return hmac.compare_digest(request.headers.get("Authorization", ""), f"Bearer {token}")
+    allowed = current_app.config.get("METRICS_ALLOW_IPS") or ()
+    if any(h in request.headers for h in _PROXY_HEADERS):
+        return False  # пришло через прокси — remote_addr не адрес клиента
+    return request.remote_addr in allowed
+
+
+@bp.get("/metrics")
+def metrics():
+    if not _authorized():
+        abort(403)
+    if os.getenv("PROMETHEUS_MULTIPROC_DIR"):
+        registry = CollectorRegistry()
+        multiprocess.MultiProcessCollector(registry)
+    else:
+        from prometheus_client import REGISTRY as registry
+    return Response(generate_latest(registry), mimetype=CONTENT_TYPE_LATEST)
+
+
+def init_metrics(app):
+    app.register_blueprint(bp)
+    app.before_request(_start_timer)
+    app.after_request(_status)
+    app.teardown_request(_observe)
+    with app.app_context():
+        from .db import db
+        _instrument_engine(db.engine)
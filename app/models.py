@@ -23,6 +23,13 @@ class Category(db.Model):
 
 class Product(db.Model):
     __tablename__ = "products"
+    __table_args__ = (
+        # постраничный каталог: keyset по (name, id), в т.ч. внутри категории
+        db.Index("ix_products_active_name", "is_active", "name", "id"),
+        db.Index("ix_products_category_active_name", "category_id", "is_active", "name", "id"),
+        # поиск (app/search.py); в SQLite вместо него FTS5
+        db.Index("ft_products_search", "name", "sku", "description", mysql_prefix="FULLTEXT").ddl_if(dialect="mysql"),
+    )
     id = db.Column(db.Integer, primary_key=True)
     category_id = db.Column(db.Integer, db.ForeignKey("categories.id"), index=True)
     name = db.Column(db.String(255), nullable=False)
@@ -37,6 +44,9 @@ class Product(db.Model):
 
 class Service(db.Model):
     __tablename__ = "services"
+    __table_args__ = (
+        db.Index("ft_services_search", "name", "description", mysql_prefix="FULLTEXT").ddl_if(dialect="mysql"),
+    )
     id = db.Column(db.Integer, primary_key=True)
     name = db.Column(db.String(255), nullable=False)
     description = db.Column(db.Text)
@@ -45,6 +55,15 @@ class Service(db.Model):
 
 class Order(db.Model):
     __tablename__ = "orders"
+    __table_args__ = (
+        # история заказов пользователя: keyset по (created_at, id)
+        db.Index("ix_orders_user_created", "user_id", "created_at", "id"),
+        # списки в админке: фильтр по статусу, сортировка по дате
+        db.Index("ix_orders_status_created", "status", "created_at"),
+        db.Index("ix_orders_created", "created_at"),
+        # инкрементальное обновление витрин продаж (app/analytics.py)
+        db.Index("ix_orders_updated", "updated_at"),
+    )
     id = db.Column(db.Integer, primary_key=True)
     user_id = db.Column(db.Integer, db.ForeignKey("users.id"), index=True)
     status = db.Column(db.String(16), default="new")
@@ -57,6 +76,10 @@ class Order(db.Model):
 
 class OrderItem(db.Model):
     __tablename__ = "order_items"
+    __table_args__ = (
+        # в каких заказах встречается товар/услуга
+        db.Index("ix_order_items_item", "item_type", "item_id"),
+    )
     id = db.Column(db.Integer, primary_key=True)
     order_id = db.Column(db.Integer, db.ForeignKey("orders.id"), index=True)
     item_type = db.Column(db.String(16)) # product|service
@@ -65,8 +88,56 @@ class OrderItem(db.Model):
     unit_price = db.Column(db.Numeric(12,2), default=0)
     total = db.Column(db.Numeric(12,2), default=0)
 
+class SalesDaily(db.Model):
+    """Продажи за день по статусу заказа (витрина app/analytics.py)."""
+    __tablename__ = "sales_daily"
+    day = db.Column(db.Date, primary_key=True)
+    status = db.Column(db.String(16), primary_key=True)
+    orders = db.Column(db.Integer, nullable=False, default=0)
+    items = db.Column(db.Integer, nullable=False, default=0)
+    revenue = db.Column(db.Numeric(14,2), nullable=False, default=0)  # сумма Order.total
+
+class SalesDailyItem(db.Model):
+    """Продажи за день по товару/услуге и статусу заказа."""
+    __tablename__ = "sales_daily_items"
+    __table_args__ = (
+        # топ позиций за период
+        db.Index("ix_sales_daily_items_type_day", "item_type", "day"),
+    )
+    day = db.Column(db.Date, primary_key=True)
+    status = db.Column(db.String(16), primary_key=True)
+    item_type = db.Column(db.String(16), primary_key=True)
+    item_id = db.Column(db.Integer, primary_key=True)
+    orders = db.Column(db.Integer, nullable=False, default=0)
+    qty = db.Column(db.Numeric(14,3), nullable=False, default=0)
+    revenue = db.Column(db.Numeric(14,2), nullable=False, default=0)  # сумма OrderItem.total
+
+class RollupWatermark(db.Model):
+    """До какого Order.updated_at витрина уже пересчитана."""
+    __tablename__ = "rollup_watermarks"
+    name = db.Column(db.String(32), primary_key=True)
+    watermark = db.Column(db.DateTime)
+    refreshed_at = db.Column(db.DateTime)
+
+class OrderRequest(db.Model):
+    """Idempotency-Key клиента → созданный заказ (повтор не плодит дубли)."""
+    __tablename__ = "order_requests"
+    __table_args__ = (db.UniqueConstraint("user_id", "key", name="uq_order_requests_user_key"),)
+    id = db.Column(db.Integer, primary_key=True)
+    user_id = db.Column(db.Integer, db.ForeignKey("users.id"), nullable=False)
+    key = db.Column(db.String(64), nullable=False)
+    order_id = db.Column(db.Integer, db.ForeignKey("orders.id"), nullable=False)
+    created_at = db.Column(db.DateTime, default=datetime.utcnow)
+
 class Review(db.Model):
     __tablename__ = "reviews"
+    __table_args__ = (
+        # отзывы конкретной карточки: агрегаты, последние отзывы
+        db.Index("ix_reviews_target_moderated", "target_type", "target_id", "is_moderated", "created_at"),
+        # очередь модерации в админке
+        db.Index("ix_reviews_moderated_created", "is_moderated", "created_at"),
+        db.Index("ix_reviews_created", "created_at"),
+    )
     id = db.Column(db.Integer, primary_key=True)
     user_id = db.Column(db.Integer, db.ForeignKey("users.id"), index=True)
     target_type = db.Column(db.String(16))
@@ -76,8 +147,22 @@ class Review(db.Model):
     is_moderated = db.Column(db.Boolean, default=False)
     created_at = db.Column(db.DateTime, default=datetime.utcnow)
 
+class ReviewAggregate(db.Model):
+    """Счётчики промодерированных отзывов по карточке (ведёт app/reviews.py)."""
+    __tablename__ = "review_aggregates"
+    target_type = db.Column(db.String(16), primary_key=True)
+    target_id = db.Column(db.Integer, primary_key=True)
+    review_count = db.Column(db.Integer, nullable=False, default=0)
+    rating_sum = db.Column(db.Integer, nullable=False, default=0)
+    recent_ids = db.Column(db.Text)  # JSON: id последних отзывов, новые первыми
+    updated_at = db.Column(db.DateTime, default=datetime.utcnow, onupdate=datetime.utcnow)
+
 class Feedback(db.Model):
     __tablename__ = "feedback"
+    __table_args__ = (
+        db.Index("ix_feedback_status_created", "status", "created_at"),
+        db.Index("ix_feedback_created", "created_at"),
+    )
     id = db.Column(db.Integer, primary_key=True)
     user_id = db.Column(db.Integer, db.ForeignKey("users.id"), nullable=True)
     name = db.Column(db.String(128))
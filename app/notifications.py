@@ -0,0 +1,88 @@
+"""События смены статуса заказа → Redis stream для бота.
+
+after_flush ловит изменения Order.status / Order.payment_status (из админки,
+API — откуда угодно через сессию), after_commit публикует их в stream
+NOTIFY_STREAM. Бот (telegram/notifications.py) читает stream группой
+потребителей, схлопывает события по заказу и шлёт сообщения с учётом
+лимитов Telegram. Без Redis уведомления не отправляются (заказ при этом
+сохраняется как обычно).
+"""
+import logging
+import time
+from sqlalchemy import event, inspect, select
+from flask import current_app
+from .cache import get_redis, redis_failed
+from .db import db
+from .models import Order, User
+
+log = logging.getLogger(__name__)
+
+NOTIFY_STREAM = "wg:notify:orders"
+STREAM_MAXLEN = 100000  # примерная обрезка (XADD MAXLEN ~)
+
+_users = User.__table__
+
+
+def _changed(obj, attr) -> bool:
+    hist = inspect(obj).attrs[attr].history
+    return bool(hist.added) and (not hist.deleted or hist.deleted[0] != hist.added[0])
+
+
+def _after_flush(session, flush_context):
+    changed = [obj for obj in session.dirty
+               if isinstance(obj, Order)
+               and (_changed(obj, "status") or _changed(obj, "payment_status"))]
+    if not changed:
+        return
+    user_ids = {o.user_id for o in changed if o.user_id}
+    chats = {}
+    if user_ids:
+        rows = session.connection().execute(
+            select(_users.c.id, _users.c.telegram_id).where(_users.c.id.in_(user_ids))
+        )
+        chats = {uid: tg for uid, tg in rows}
+    events = session.info.setdefault("order_events", [])
+    for o in changed:
+        chat_id = chats.get(o.user_id)
+        if not chat_id:
+            continue
+        events.append({
+            "order_id": str(o.id),
+            "chat_id": str(chat_id),
+            "status": o.status or "",
+            "payment_status": o.payment_status or "",
+            "total": str(o.total or 0),
+            "ts": str(int(time.time())),
+        })
+
+
+def _after_commit(session):
+    events = session.info.pop("order_events", None)
+    if events:
+        publish(events)
+
+
+def _after_rollback(session):
+    session.info.pop("order_events", None)
+
+
+def publish(events: list):
+    r = get_redis()
+    if r is None:
+        log.warning("redis unavailable, %s order notifications dropped", len(events))
+        return
+    stream = current_app.config.get("NOTIFY_STREAM", NOTIFY_STREAM)
+    try:
+        pipe = r.pipeline(transaction=False)
+        for ev in events:
+            pipe.xadd(stream, ev, maxlen=STREAM_MAXLEN, approximate=True)
+        pipe.execute()
+    except Exception as e:
+        redis_failed(e)
+
+
+def init_notifications(app):
+    if not event.contains(db.session, "after_flush", _after_flush):
+        event.listen(db.session, "after_flush", _after_flush)
+        event.listen(db.session, "after_commit", _after_commit)
+        event.listen(db.session, "after_rollback", _after_rollback)
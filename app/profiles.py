@@ -0,0 +1,132 @@
+"""Профили развёртывания: gunicorn + пул соединений SQLAlchemy одним набором.
+
+Профиль выбирается переменной WG_PROFILE (sync | gthread | gevent) и читается
+и gunicorn.conf.py, и Config. Отдельные параметры можно переопределить
+переменными окружения (WEB_WORKERS, WEB_THREADS, DB_POOL_SIZE, …).
+validate() проверяет, что пул соединений согласован с числом потоков/гринлетов
+воркера и что все воркеры вместе не превысят лимит соединений MySQL.
+"""
+import os
+from dataclasses import dataclass, replace, asdict
+from typing import List
+
+
+class ProfileError(ValueError):
+    pass
+
+
+@dataclass(frozen=True)
+class Profile:
+    name: str
+    worker_class: str
+    workers: int
+    threads: int = 1               # gthread: потоков на воркер
+    worker_connections: int = 0    # gevent: одновременных гринлетов на воркер
+    timeout: int = 60
+    graceful_timeout: int = 30
+    keepalive: int = 5
+    pool_size: int = 2
+    max_overflow: int = 0
+    pool_timeout: int = 10
+    pool_recycle: int = 280        # меньше wait_timeout MySQL на хостинге → без "gone away"
+
+    @property
+    def concurrency(self) -> int:
+        """Сколько запросов воркер может обрабатывать одновременно."""
+        if self.worker_class == "gthread":
+            return self.threads
+        if self.worker_class == "gevent":
+            return self.worker_connections
+        return 1
+
+    @property
+    def db_connections(self) -> int:
+        """Максимум соединений с БД от всех воркеров."""
+        return self.workers * (self.pool_size + self.max_overflow)
+
+
+PROFILES = {
+    # один запрос на воркер; медленный запрос блокирует воркер целиком
+    "sync": Profile("sync", "sync", workers=3, timeout=120, pool_size=1, max_overflow=1),
+    # потоки внутри воркера; пул ≥ потоков, иначе потоки ждут соединение
+    "gthread": Profile("gthread", "gthread", workers=3, threads=8, timeout=60,
+                       pool_size=8, max_overflow=2),
+    # гринлеты: много одновременных запросов, к БД — через ограниченный пул
+    "gevent": Profile("gevent", "gevent", workers=2, worker_connections=200, timeout=60,
+                      pool_size=20, max_overflow=10, pool_timeout=5),
+}
+
+_ENV_OVERRIDES = {
+    "WEB_WORKERS": "workers",
+    "WEB_THREADS": "threads",
+    "WEB_WORKER_CONNECTIONS": "worker_connections",
+    "WEB_TIMEOUT": "timeout",
+    "DB_POOL_SIZE": "pool_size",
+    "DB_MAX_OVERFLOW": "max_overflow",
+    "DB_POOL_TIMEOUT": "pool_timeout",
+    "DB_POOL_RECYCLE": "pool_recycle",
+}
+
+
+def validate(p: Profile, db_max_connections: int = None) -> List[str]:
+    """Список проблем профиля (пустой — всё согласовано)."""
+    errors = []
+    if db_max_connections is None:
+        db_max_connections = int(os.getenv("DB_MAX_CONNECTIONS", "150"))
+    if p.worker_class not in ("sync", "gthread", "gevent"):
+        errors.append(f"unknown worker_class {p.worker_class!r}")
+    if p.workers < 1:
+        errors.append("workers must be >= 1")
+    if p.worker_class == "gthread" and p.threads < 2:
+        errors.append("gthread needs threads >= 2 (иначе это sync)")
+    if p.worker_class != "gthread" and p.threads != 1:
+        errors.append(f"threads={p.threads} has no effect for {p.worker_class}")
+    if p.worker_class == "gevent" and p.worker_connections < 1:
+        errors.append("gevent needs worker_connections >= 1")
+    if p.pool_size < 1:
+        errors.append("pool_size must be >= 1")
+    # sync/gthread: каждый поток держит соединение весь запрос
+    if p.worker_class in ("sync", "gthread") and p.pool_size + p.max_overflow < p.concurrency:
+        errors.append(f"pool_size+max_overflow ({p.pool_size + p.max_overflow}) "
+                      f"< threads per worker ({p.concurrency})")
+    if p.db_connections > db_max_connections:
+        errors.append(f"workers*(pool_size+max_overflow) = {p.db_connections} "
+                      f"> DB_MAX_CONNECTIONS ({db_max_connections})")
+    if p.pool_timeout >= p.timeout:
+        errors.append("pool_timeout must be < worker timeout")
+    if p.pool_recycle <= 0:
+        errors.append("pool_recycle must be > 0")
+    if p.worker_class == "gevent":
+        try:
+            import gevent  # noqa
+        except ImportError:
+            errors.append("gevent profile requires `pip install gevent`")
+    return errors
+
+
+def load_profile(name: str = None, check: bool = True) -> Profile:
+    """Профиль из WG_PROFILE с переопределениями из окружения."""
+    name = name or os.getenv("WG_PROFILE", "sync")
+    if name not in PROFILES:
+        raise ProfileError(f"unknown WG_PROFILE {name!r}, expected one of {', '.join(PROFILES)}")
+    overrides = {field: int(os.environ[env]) for env, field in _ENV_OVERRIDES.items() if os.getenv(env)}
+    profile = replace(PROFILES[name], **overrides)
+    if check:
+        errors = validate(profile)
+        if errors:
+            raise ProfileError(f"profile {name!r} is inconsistent: " + "; ".join(errors))
+    return profile
+
+
+def engine_options(profile: Profile, database_uri: str = None) -> dict:
+    """SQLALCHEMY_ENGINE_OPTIONS для профиля."""
+    opts = {"pool_pre_ping": True, "pool_recycle": profile.pool_recycle}
+    # у SQLite свой пул (в т.ч. SingletonThreadPool для :memory:) — размеры не задаём
+    if database_uri and not database_uri.startswith("sqlite"):
+        opts.update(pool_size=profile.pool_size, max_overflow=profile.max_overflow,
+                    pool_timeout=profile.pool_timeout)
+    return opts
+
+
+def describe(profile: Profile) -> dict:
+    return dict(asdict(profile), concurrency=profile.concurrency, db_connections=profile.db_connections)
@@ -0,0 +1,93 @@
+"""Плагин pytest: бюджет SQL-запросов на endpoint.
+
+Подключение — в conftest.py: `pytest_plugins = ["app.pytest_plugin"]`;
+нужна фикстура `app` с Flask-приложением (create_app()).
+
+    @pytest.mark.query_budget(6, **{"webapp.orders": 4})
+    def test_catalog(client, query_budget):
+        client.get("/app/catalog")            # > 6 запросов — тест упадёт
+
+    def test_create_order(client, query_budget):
+        query_budget.limit("webapp.create_order", 8)
+        with query_budget.at_most(2):         # и для произвольного блока кода
+            load_cart()
+
+Позиционный аргумент маркера — бюджет по умолчанию для всех endpoint'ов,
+именованные — для конкретных. Превышения проверяются после теста, в
+сообщении — повторяющиеся запросы (app/querylog.py).
+"""
+import contextlib
+import pytest
+from flask import g, request_started, request_tearing_down
+from flask import request as http_request
+from .querylog import QueryRecorder, instrument
+
+N_PLUS_ONE_HINT = 3
+
+
+def _describe(rec: QueryRecorder) -> str:
+    lines = [f"    {n}× {sql[:200]}  at {'; '.join(sorted(sites)) or '?'}"
+             for sql, n, _, sites in rec.repeated(N_PLUS_ONE_HINT)]
+    return "\n".join(lines)
+
+
+class QueryBudget:
+    def __init__(self, default=None, limits=None):
+        self.default = default
+        self.limits = dict(limits or {})
+        self.violations = []
+
+    def limit(self, endpoint: str, max_queries: int):
+        self.limits[endpoint] = max_queries
+
+    def _budget(self, endpoint):
+        return self.limits.get(endpoint, self.default)
+
+    def _started(self, sender, **extra):
+        g.wg_budget_queries = QueryRecorder(with_callsites=True).start()
+
+    # teardown, а не request_finished: при исключении в обработчике ответа
+    # нет, и рекордер остался бы активным до конца теста
+    def _finished(self, sender, exc=None, **extra):
+        rec = g.pop("wg_budget_queries", None)
+        if rec is None:
+            return
+        rec.stop()
+        budget = self._budget(http_request.endpoint)
+        if budget is not None and rec.count > budget:
+            self.violations.append(
+                f"{http_request.method} {http_request.path} [{http_request.endpoint}]: "
+                f"{rec.count} queries, budget {budget}\n{_describe(rec)}"
+            )
+
+    @contextlib.contextmanager
+    def at_most(self, max_queries: int):
+        with QueryRecorder(with_callsites=True) as rec:
+            yield rec
+        if rec.count > max_queries:
+            self.violations.append(f"block: {rec.count} queries, budget {max_queries}\n{_describe(rec)}")
+
+
+def pytest_configure(config):
+    config.addinivalue_line(
+        "markers", "query_budget(default=None, **per_endpoint): максимум SQL-запросов на HTTP-запрос",
+    )
+
+
+@pytest.fixture
+def query_budget(request, app):
+    marker = request.node.get_closest_marker("query_budget")
+    default = marker.args[0] if marker and marker.args else None
+    budget = QueryBudget(default, marker.kwargs if marker else None)
+    with app.app_context():
+        from .db import db
+        instrument(db.engine)
+    request_started.connect(budget._started, app)
+    request_tearing_down.connect(budget._finished, app)
+    try:
+        yield budget
+    finally:
+        request_started.disconnect(budget._started, app)
+        request_tearing_down.disconnect(budget._finished, app)
+    if budget.violations:
+        pytest.fail("query budget exceeded:\n" + "\n".join(budget.violations), pytrace=False)
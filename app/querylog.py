@@ -0,0 +1,159 @@
+"""Диагностика SQL: лог медленных запросов и поиск N+1 в рамках HTTP-запроса.
+
+Слушатели before/after_cursor_execute на движке складывают выполненные
+операторы во все активные QueryRecorder (contextvar — свой набор у каждого
+потока/гринлета). На каждый HTTP-запрос заводится свой рекордер:
+
+- оператор дольше SLOW_QUERY_MS пишется в лог сразу — с endpoint и местом
+  вызова в нашем коде;
+- при QUERY_DIAGNOSTICS=1 после ответа операторы группируются по
+  нормализованному SQL (литералы и списки IN схлопнуты), группа из
+  N_PLUS_ONE_THRESHOLD и более одинаковых запросов — подозрение на N+1,
+  в лог уходят её размер, время и места вызова.
+
+Тот же QueryRecorder используют тесты (app/pytest_plugin.py).
+"""
+import contextvars
+import logging
+import os
+import re
+import time
+import traceback
+from collections import defaultdict
+from typing import List, Optional
+from flask import current_app, g, has_request_context, request
+from sqlalchemy import event
+
+log = logging.getLogger(__name__)
+
+_PKG_DIR = os.path.dirname(os.path.abspath(__file__)) + os.sep
+_SKIP_FILES = {os.path.abspath(__file__), os.path.join(_PKG_DIR, "metrics.py")}
+
+_recorders: contextvars.ContextVar = contextvars.ContextVar("wg_query_recorders", default=())
+
+_STRING_RE = re.compile(r"'(?:[^']|'')*'")
+_NUMBER_RE = re.compile(r"\b\d+(?:\.\d+)?\b")
+_IN_LIST_RE = re.compile(r"\(\s*(?:\?|%s|%\(\w+\)s|:\w+)(?:\s*,\s*(?:\?|%s|%\(\w+\)s|:\w+))*\s*\)")
+_SPACE_RE = re.compile(r"\s+")
+
+
+def normalize(sql: str) -> str:
+    """Форма запроса без значений: одинаковые по смыслу запросы дают одну строку."""
+    sql = _STRING_RE.sub("?", sql)
+    sql = _NUMBER_RE.sub("?", sql)
+    sql = _IN_LIST_RE.sub("(?)", sql)
+    return _SPACE_RE.sub(" ", sql).strip()
+
+
+def callsite() -> str:
+    """Ближайший кадр стека из пакета app (включая шаблоны), минуя SQLAlchemy и этот модуль."""
+    for frame in reversed(traceback.extract_stack()):
+        path = os.path.abspath(frame.filename)
+        if path.startswith(_PKG_DIR) and path not in _SKIP_FILES:
+            return f"{os.path.relpath(path, os.path.dirname(_PKG_DIR))}:{frame.lineno} in {frame.name}"
+    return "?"
+
+
+class QueryRecorder:
+    """Копит (sql, секунды, место вызова) выполненных операторов, пока активен."""
+
+    def __init__(self, with_callsites: bool = False):
+        self.with_callsites = with_callsites
+        self.queries: List[tuple] = []
+
+    def start(self):
+        _recorders.set(_recorders.get() + (self,))
+        return self
+
+    def stop(self):
+        # не reset(token): рекордеры запроса и тестов останавливаются в разном порядке
+        _recorders.set(tuple(r for r in _recorders.get() if r is not self))
+
+    __enter__ = start
+
+    def __exit__(self, *exc):
+        self.stop()
+
+    @property
+    def count(self) -> int:
+        return len(self.queries)
+
+    @property
+    def total_time(self) -> float:
+        return sum(q[1] for q in self.queries)
+
+    def repeated(self, threshold: int) -> list:
+        """[(normalized_sql, число, секунды, {места вызова})] для групп от threshold штук."""
+        groups = defaultdict(lambda: [0, 0.0, set()])
+        for sql, seconds, site in self.queries:
+            grp = groups[normalize(sql)]
+            grp[0] += 1
+            grp[1] += seconds
+            if site:
+                grp[2].add(site)
+        found = [(sql, n, secs, sites) for sql, (n, secs, sites) in groups.items() if n >= threshold]
+        return sorted(found, key=lambda x: -x[1])
+
+
+# --------- события движка ---------
+# время старта — на контексте выполнения, а не в conn.info: если оператор
+# упал, after_cursor_execute не придёт и метка умрёт вместе с контекстом
+def _before_cursor(conn, cursor, statement, parameters, context, executemany):
+    if context is not None and (_recorders.get() or _slow_threshold() is not None):
+        context._wg_querylog_start = time.perf_counter()
+
+
+def _after_cursor(conn, cursor, statement, parameters, context, executemany):
+    started = getattr(context, "_wg_querylog_start", None)
+    if started is None:
+        return
+    elapsed = time.perf_counter() - started
+    recorders = _recorders.get()
+    site = callsite() if any(r.with_callsites for r in recorders) else None
+    for rec in recorders:
+        rec.queries.append((statement, elapsed, site))
+    threshold = _slow_threshold()
+    if threshold is not None and elapsed >= threshold:
+        log.warning("slow query %.1f ms [%s] at %s: %s", elapsed * 1000,
+                    request.endpoint if has_request_context() else "-",
+                    site or callsite(), _SPACE_RE.sub(" ", statement)[:1000])
+
+
+def _slow_threshold() -> Optional[float]:
+    try:
+        ms = current_app.config.get("SLOW_QUERY_MS", 0)
+    except RuntimeError:  # вне контекста приложения
+        return None
+    return ms / 1000.0 if ms and ms > 0 else None
+
+
+def instrument(engine):
+    if not event.contains(engine, "before_cursor_execute", _before_cursor):
+        event.listen(engine, "before_cursor_execute", _before_cursor)
+        event.listen(engine, "after_cursor_execute", _after_cursor)
+
+
+# --------- HTTP ---------
+def _start_request():
+    g.wg_queries = QueryRecorder(with_callsites=True).start()
+
+
+def _finish_request(exc=None):
+    rec = g.pop("wg_queries", None)
+    if rec is None:
+        return
+    rec.stop()
+    threshold = current_app.config.get("N_PLUS_ONE_THRESHOLD", 5)
+    for sql, n, secs, sites in rec.repeated(threshold):
+        log.warning("possible N+1 [%s %s]: %s× (%.1f ms) %s — at %s",
+                    request.method, request.endpoint, n, secs * 1000, sql[:500],
+                    "; ".join(sorted(sites)) or "?")
+
+
+def init_querylog(app):
+    with app.app_context():
+        from .db import db
+        instrument(db.engine)
+    if app.config.get("QUERY_DIAGNOSTICS"):
+        app.before_request(_start_request)
+        app.teardown_request(_finish_request)
@@ -0,0 +1,199 @@
+"""Агрегаты рейтингов по карточкам (review_aggregates).
+
+Счётчики обновляются в той же транзакции, что и сами отзывы: after_flush
+смотрит, какие Review добавились/поменялись/удалились, и правит агрегаты
+через connection текущей сессии. Публикация отзыва (is_moderated → True)
+— инкремент; снятие с публикации, смена оценки или удаление — пересчёт
+одной карточки по индексу ix_reviews_target_moderated. Строка агрегата
+берётся SELECT … FOR UPDATE (первая — вставкой без конфликта), так что
+параллельные модерации одной карточки не теряют друг друга.
+"""
+import json
+from datetime import datetime
+from sqlalchemy import event, func, select, inspect
+from sqlalchemy.exc import IntegrityError
+from .db import db
+from .models import Review, ReviewAggregate
+
+RECENT_REVIEWS = 5  # сколько id последних отзывов храним в агрегате
+
+_reviews = Review.__table__
+_aggs = ReviewAggregate.__table__
+
+
+def _history(obj, attr):
+    """(изменилось ли, старое значение или None, если оно не было загружено)."""
+    hist = inspect(obj).attrs[attr].history
+    if not hist.added:
+        return False, getattr(obj, attr)
+    return True, (hist.deleted[0] if hist.deleted else None)
+
+
+def _old(obj, attr):
+    changed, old = _history(obj, attr)
+    return old if changed else getattr(obj, attr)
+
+
+def _insert_missing(conn, key):
+    """Пустая строка агрегата, если её нет; вторая такая же вставка — no-op, не IntegrityError."""
+    values = {"target_type": key[0], "target_id": key[1], "review_count": 0, "rating_sum": 0,
+              "recent_ids": "[]", "updated_at": datetime.utcnow()}
+    dialect = conn.dialect.name
+    if dialect in ("mysql", "mariadb"):
+        from sqlalchemy.dialects.mysql import insert
+        stmt = insert(_aggs).values(**values)
+        conn.execute(stmt.on_duplicate_key_update(target_id=stmt.inserted.target_id))
+    elif dialect in ("sqlite", "postgresql"):
+        if dialect == "sqlite":
+            from sqlalchemy.dialects.sqlite import insert
+        else:
+            from sqlalchemy.dialects.postgresql import insert
+        conn.execute(insert(_aggs).values(**values).on_conflict_do_nothing())
+    else:
+        try:
+            with conn.begin_nested():
+                conn.execute(_aggs.insert().values(**values))
+        except IntegrityError:
+            pass
+
+
+def _lock(conn, key):
+    """Строка агрегата под блокировкой до конца транзакции (создаётся при отсутствии).
+
+    Параллельные модерации одной карточки ждут здесь друг друга, а не
+    перезаписывают счётчики.
+    """
+    where = (_aggs.c.target_type == key[0], _aggs.c.target_id == key[1])
+    query = select(_aggs.c.recent_ids).where(*where).with_for_update()
+    row = conn.execute(query).first()
+    if row is None:
+        _insert_missing(conn, key)
+        row = conn.execute(query).one()
+    return where, json.loads(row[0] or "[]")
+
+
+def _increment(conn, key, review_id, rating):
+    where, recent = _lock(conn, key)
+    conn.execute(
+        _aggs.update().where(*where).values(
+            review_count=_aggs.c.review_count + 1,
+            rating_sum=_aggs.c.rating_sum + (rating or 0),
+            recent_ids=json.dumps(([review_id] + recent)[:RECENT_REVIEWS]),
+            updated_at=datetime.utcnow(),
+        )
+    )
+
+
+def recompute_target(conn, key):
+    """Полный пересчёт одной карточки (по индексу, без скана всей таблицы)."""
+    target_type, target_id = key
+    where, _ = _lock(conn, key)
+    cond = (_reviews.c.target_type == target_type, _reviews.c.target_id == target_id,
+            _reviews.c.is_moderated.is_(True))
+    count, total = conn.execute(
+        select(func.count(), func.coalesce(func.sum(_reviews.c.rating), 0)).where(*cond)
+    ).one()
+    recent = conn.execute(
+        select(_reviews.c.id).where(*cond)
+        .order_by(_reviews.c.created_at.desc(), _reviews.c.id.desc())
+        .limit(RECENT_REVIEWS)
+    ).scalars().all()
+    conn.execute(
+        _aggs.update().where(*where).values(
+            review_count=count, rating_sum=int(total),
+            recent_ids=json.dumps(list(recent)), updated_at=datetime.utcnow(),
+        )
+    )
+
+
+def _after_flush(session, flush_context):
+    added = []        # (key, review_id, rating)
+    recompute = set()
+
+    for obj in session.new:
+        if isinstance(obj, Review) and obj.is_moderated:
+            added.append(((obj.target_type, obj.target_id), obj.id, obj.rating))
+
+    for obj in session.dirty:
+        if not isinstance(obj, Review):
+            continue
+        changes = {attr: _history(obj, attr)
+                   for attr in ("target_type", "target_id", "is_moderated", "rating")}
+        if not any(changed for changed, _ in changes.values()):
+            continue  # правили только текст
+        new_key = (obj.target_type, obj.target_id)
+        mod_changed, old_mod = changes["is_moderated"]
+        only_published = (mod_changed and old_mod is False and obj.is_moderated
+                          and not any(changes[a][0] for a in ("target_type", "target_id", "rating")))
+        if only_published:
+            added.append((new_key, obj.id, obj.rating))
+            continue
+        # старое значение могло быть не загружено — тогда просто пересчитываем
+        recompute.add(new_key)
+        old_key = (_old(obj, "target_type"), _old(obj, "target_id"))
+        if old_key != new_key and None not in old_key:
+            recompute.add(old_key)
+
+    for obj in session.deleted:
+        if isinstance(obj, Review) and _old(obj, "is_moderated"):
+            recompute.add((_old(obj, "target_type"), _old(obj, "target_id")))
+
+    if not added and not recompute:
+        return
+    conn = session.connection()
+    # блокировки строк агрегатов — в одном порядке во всех транзакциях
+    for key, review_id, rating in sorted(added, key=lambda a: a[0]):
+        if key not in recompute:
+            _increment(conn, key, review_id, rating)
+    for key in sorted(recompute):
+        recompute_target(conn, key)
+    session.info["catalog_dirty"] = True
+
+
+def _after_commit(session):
+    if session.info.pop("catalog_dirty", False):
+        from .catalog import bump_version
+        bump_version()
+
+
+def _after_rollback(session):
+    session.info.pop("catalog_dirty", None)
+
+
+def rebuild_aggregates() -> int:
+    """Пересобрать review_aggregates с нуля. Возвращает число карточек."""
+    conn = db.session.connection()
+    rows = conn.execute(
+        select(_reviews.c.target_type, _reviews.c.target_id, _reviews.c.id, _reviews.c.rating)
+        .where(_reviews.c.is_moderated.is_(True))
+        .order_by(_reviews.c.target_type, _reviews.c.target_id,
+                  _reviews.c.created_at.desc(), _reviews.c.id.desc())
+        .execution_options(yield_per=5000)
+    )
+    # строк в агрегате столько же, сколько карточек — держим их в памяти,
+    # а отзывы читаем потоком
+    aggs = {}
+    for target_type, target_id, review_id, rating in rows:
+        agg = aggs.setdefault((target_type, target_id), [0, 0, []])
+        agg[0] += 1
+        agg[1] += rating or 0
+        if len(agg[2]) < RECENT_REVIEWS:
+            agg[2].append(review_id)
+
+    now = datetime.utcnow()
+    payload = [{"target_type": key[0], "target_id": key[1], "review_count": count,
+                "rating_sum": total, "recent_ids": json.dumps(recent), "updated_at": now}
+               for key, (count, total, recent) in aggs.items()]
+    conn.execute(_aggs.delete())
+    for i in range(0, len(payload), 1000):
+        conn.execute(_aggs.insert(), payload[i:i + 1000])
+    db.session.info["catalog_dirty"] = True
+    db.session.commit()
+    return len(payload)
+
+
+def init_reviews(app):
+    if not event.contains(db.session, "after_flush", _after_flush):
+        event.listen(db.session, "after_flush", _after_flush)
+        event.listen(db.session, "after_commit", _after_commit)
+        event.listen(db.session, "after_rollback", _after_rollback)
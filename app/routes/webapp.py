@@ -1,12 +1,23 @@
-from flask import Blueprint, render_template, request, jsonify, current_app, session
-from sqlalchemy import desc, or_
-from collections import defaultdict
+import json
+import base64
+import hashlib
+import hmac
+from flask import Blueprint, render_template, request, jsonify, current_app, session, make_response
+from sqlalchemy import desc, or_, and_, insert, func
+from sqlalchemy.exc import IntegrityError
+from datetime import datetime
 from decimal import Decimal, ROUND_HALF_UP
 from functools import wraps
 from ..db import db
-from ..models import User, Product, Service, Order, OrderItem, Review, Feedback
+from ..models import (User, Product, Service, Order, OrderItem, OrderRequest, Review,
+                      ReviewAggregate, Feedback)
 from ..utils.telegram_webapp import verify_webapp_init_data, user_from_verified
-from ..auth import create_tokens, set_auth_cookies, jwt_required
+from ..auth import create_tokens, set_auth_cookies, jwt_required, invalidate_user, get_principal, cookie_user
+from ..catalog import get_snapshot, current_version
+from ..users import upsert_telegram_user, upsert_telegram_users
+from ..search import search
+from ..http_cache import conditional
+from ..fragments import render_cards, group_pending
 
 
 bp = Blueprint("webapp", __name__)
@@ -14,30 +25,18 @@ bp = Blueprint("webapp", __name__)
 # --------- вспомогалки ---------
 def _session_user():
     uid = session.get("uid")
-    return User.query.get(uid) if uid else None
+    return get_principal(uid) if uid else None
 
 def _login_with_init(init_data: str):
+    # WebApp шлёт одну и ту же initData на каждый запрос (без cookies — тоже),
+    # поэтому здесь не одноразовая: проверка подписи — из кэша
     ok, data = verify_webapp_init_data(init_data, current_app.config["TELEGRAM_BOT_TOKEN"])
     if not ok:
         return None
     uinfo = user_from_verified(data)
-    if not uinfo.get("id"):
-        return None
-    user = User.query.filter_by(telegram_id=uinfo["id"]).first()
+    user = upsert_telegram_user(uinfo)
     if not user:
-        user = User(
-            telegram_id=uinfo["id"],
-            username=uinfo.get("username"),
-            first_name=uinfo.get("first_name"),
-            last_name=uinfo.get("last_name"),
-        )
-        db.session.add(user); db.session.commit()
-    else:
-        # легкое обновление профиля
-        user.username = uinfo.get("username") or user.username
-        user.first_name = uinfo.get("first_name") or user.first_name
-        user.last_name = uinfo.get("last_name") or user.last_name
-        db.session.commit()
+        return None
     session["uid"] = user.id
     return user
 
@@ -80,115 +79,282 @@ def auth_header():
 def api_telegram_auth():
     payload = request.get_json(silent=True) or {}
     init_data = payload.get("initData") or ""
-    ok, data = verify_webapp_init_data(init_data, current_app.config["TELEGRAM_BOT_TOKEN"])
+    token = current_app.config["TELEGRAM_BOT_TOKEN"]
+    # повторно предъявленная initData (replay) новых токенов не получает
+    ok, data = verify_webapp_init_data(init_data, token, single_use=True)
     if not ok:
-        return jsonify({"success": False, "error": "Invalid initData"}), 401
-
-    uinfo = user_from_verified(data)
-    if not uinfo.get("id"):
-        return jsonify({"success": False, "error": "No user in initData"}), 401
-
-    # найти/создать пользователя
-    user = User.query.filter_by(telegram_id=uinfo["id"]).first()
-    if not user:
-        user = User(telegram_id=uinfo["id"],
-                    username=uinfo.get("username"),
-                    first_name=uinfo.get("first_name"),
-                    last_name=uinfo.get("last_name"))
-        db.session.add(user); db.session.commit()
-    else:
-        # легкое обновление
-        user.username = uinfo.get("username") or user.username
-        user.first_name = uinfo.get("first_name") or user.first_name
-        user.last_name  = uinfo.get("last_name") or user.last_name
-        db.session.commit()
+        # перезагрузка страницы в том же запуске WebApp шлёт ту же initData —
+        # тому же пользователю с живой сессией отвечаем ею, без новых токенов
+        ok, data = verify_webapp_init_data(init_data, token)
+        current = (_session_user() or cookie_user()) if ok else None
+        tg_user = user_from_verified(data) if ok else {}
+        if current is None or str(current.telegram_id) != str(tg_user.get("id")):
+            return jsonify({"success": False, "error": "Invalid initData"}), 401
+        return jsonify({"success": True, "user": _user_json(current)})
+
+    # найти/создать пользователя (без записи, если ничего не поменялось)
+    user = upsert_telegram_user(user_from_verified(data))
+    if user is None:
+        return jsonify({"success": False, "error": "No user in initData"}), 400
 
     access, refresh = create_tokens(user.id, getattr(user, "role", "client"))
-    resp = jsonify({"success": True, "user": {
-        "id": user.id, "telegram_id": user.telegram_id, "username": user.username,
-        "first_name": user.first_name, "last_name": user.last_name
-    }})
+    resp = jsonify({"success": True, "user": _user_json(user)})
     set_auth_cookies(resp, access, refresh)
     return resp
 
+def _user_json(user) -> dict:
+    return {"id": user.id, "telegram_id": user.telegram_id, "username": user.username,
+            "first_name": user.first_name, "last_name": user.last_name}
+
+
+REGISTER_BULK_MAX = 1000
+
+def _bot_authorized() -> bool:
+    # если задан BOT_API_SECRET, бот обязан прислать его в X-Bot-Secret
+    secret = current_app.config.get("BOT_API_SECRET")
+    if not secret:
+        return True
+    return hmac.compare_digest(request.headers.get("X-Bot-Secret") or "", secret)
 
 # регистрация от бота /start (создать/обновить заранее)
 @bp.post("/api/telegram/register")
 def api_telegram_register():
-    data = request.get_json(force=True)
-    tg_id = data.get("telegram_id")
-    if not tg_id:
-        return jsonify({"success": False, "error":"telegram_id required"}), 400
-    user = User.query.filter_by(telegram_id=tg_id).first()
-    if not user:
-        user = User(
-            telegram_id=tg_id,
-            username=data.get("username"),
-            first_name=data.get("first_name"),
-            last_name=data.get("last_name"),
-        )
-        db.session.add(user)
-    else:
-        user.username = data.get("username") or user.username
-        user.first_name = data.get("first_name") or user.first_name
-        user.last_name  = data.get("last_name")  or user.last_name
-    db.session.commit()
+    if not _bot_authorized():
+        return jsonify({"success": False, "error": "forbidden"}), 403
+    data = request.get_json(silent=True)
+    user = upsert_telegram_user(data) if isinstance(data, dict) else None
+    if user is None:
+        return jsonify({"success": False, "error": "valid telegram_id required"}), 400
     return jsonify({"success": True, "user_id": user.id})
 
+# пачка регистраций от бота (очередь в telegram/registration.py)
+@bp.post("/api/telegram/register/bulk")
+def api_telegram_register_bulk():
+    if not _bot_authorized():
+        return jsonify({"success": False, "error": "forbidden"}), 403
+    data = request.get_json(silent=True)
+    users = data.get("users") if isinstance(data, dict) else None
+    if not isinstance(users, list):
+        return jsonify({"success": False, "error": "users required"}), 400
+    if len(users) > REGISTER_BULK_MAX:
+        return jsonify({"success": False, "error": f"max {REGISTER_BULK_MAX} users per request"}), 413
+    stats = upsert_telegram_users(users)
+    return jsonify({"success": True, **stats})
+
 # --------- webapp страницы ---------
+# --------- версии данных страниц (для ETag, см. app/http_cache.py) ---------
+def _catalog_tag():
+    version = current_version()
+    if not isinstance(version, int):
+        return None  # без Redis версия локальна для воркера — 304 не отдаём
+    uid = request.user.id
+    pending = db.session.query(func.count(Review.id), func.max(Review.id)) \
+        .filter(Review.user_id == uid, Review.is_moderated.is_(False)).one()
+    return ("catalog", version, request.user.to_json(), *pending)
+
+def _orders_tag():
+    uid = request.user.id
+    latest = db.session.query(func.count(Order.id), func.max(Order.id), func.max(Order.updated_at)) \
+        .filter(Order.user_id == uid).one()
+    return ("orders", request.user.to_json(), *latest)
+
+def _profile_tag():
+    return ("profile", request.user.to_json())
+
 @bp.get("/catalog")
 @jwt_required
+@conditional(_catalog_tag)
 def catalog():
     user = request.user
-    products = Product.query.filter_by(is_active=True).order_by(Product.name).all()
-    services = Service.query.filter_by(is_active=True).order_by(Service.name).all()
-
-    visible_reviews = Review.query.filter(
-        or_(Review.is_moderated.is_(True), Review.user_id == user.id)
-    ).order_by(desc(Review.created_at)).all()
-
-    reviews_map = {"product": defaultdict(list), "service": defaultdict(list)}
-    for rv in visible_reviews:
-        bucket = reviews_map.get(rv.target_type)
-        if bucket is not None:
-            bucket[rv.target_id].append(rv)
-
-    review_stats = {"product": {}, "service": {}}
-    for rtype, bucket in reviews_map.items():
-        for target_id, items in bucket.items():
-            avg = sum(item.rating for item in items) / max(len(items), 1)
-            review_stats[rtype][target_id] = {
-                "items": items,
-                "average": avg,
-                "count": len(items),
-            }
+    snap = get_snapshot()
+    stats = snap["review_stats"]
+
+    # карточки общие для всех (кэш фрагментов), свои отзывы на модерации — отдельно
+    own_pending = Review.query.filter_by(user_id=user.id, is_moderated=False) \
+        .order_by(desc(Review.created_at)).all()
+    pending = group_pending(own_pending)
 
     return render_template(
         "catalog.html",
-        products=products,
-        services=services,
-        review_stats=review_stats,
+        product_cards=render_cards("product", snap["products"], stats["product"], pending.get("product")),
+        service_cards=render_cards("service", snap["services"], stats["service"], pending.get("service")),
         user=user,
         is_admin=(getattr(user, "role", "client") == "admin"),
         nav_active="catalog",
     )
 
+# --------- JSON-каталог (постранично) ---------
+API_FIELDS = ("id", "name", "sku", "unit", "description", "price", "category_id", "images", "rating")
+API_DEFAULT_FIELDS = ("id", "name", "sku", "unit", "price", "category_id", "rating")
+API_PAGE_MAX = 200
+
+def _encode_cursor(*values) -> str:
+    raw = json.dumps(list(values), ensure_ascii=False).encode("utf-8")
+    return base64.urlsafe_b64encode(raw).decode("ascii").rstrip("=")
+
+def _decode_cursor(cursor: str, *types):
+    """Курсор keyset-пагинации → кортеж значений, приведённых к types (None, если битый)."""
+    try:
+        raw = base64.urlsafe_b64decode(cursor + "=" * (-len(cursor) % 4))
+        values = json.loads(raw)
+        if len(values) != len(types):
+            return None
+        return tuple(t(v) for t, v in zip(types, values))
+    except Exception:
+        return None
+
+def _not_modified(etag: str):
+    resp = make_response("", 304)
+    resp.set_etag(etag)
+    resp.headers["Cache-Control"] = "private, no-cache"
+    return resp
+
+@bp.get("/api/catalog")
+@jwt_required
+def api_catalog():
+    """Товары страницами по (name, id). Параметры: cursor, limit, category_id, fields."""
+    try:
+        limit = min(max(int(request.args.get("limit", 50)), 1), API_PAGE_MAX)
+        category_id = int(request.args["category_id"]) if request.args.get("category_id") else None
+    except ValueError:
+        return jsonify({"ok": False, "error": "invalid_params"}), 400
+    fields = tuple(f for f in (request.args.get("fields") or "").split(",") if f) or API_DEFAULT_FIELDS
+    if any(f not in API_FIELDS for f in fields):
+        return jsonify({"ok": False, "error": "invalid_fields"}), 400
+    cursor = request.args.get("cursor") or ""
+    after = _decode_cursor(cursor, str, int) if cursor else None
+    if cursor and after is None:
+        return jsonify({"ok": False, "error": "invalid_cursor"}), 400
+
+    # версия каталога из Redis однозначно определяет ответ — отвечаем 304 до запросов в БД
+    version = current_version()
+    etag = None
+    if isinstance(version, int):
+        key = f"{version}|{limit}|{category_id}|{','.join(fields)}|{cursor}"
+        etag = hashlib.sha1(key.encode("utf-8")).hexdigest()
+        if request.if_none_match.contains_weak(etag):
+            return _not_modified(etag)
+
+    q = Product.query.filter(Product.is_active.is_(True))
+    if category_id is not None:
+        q = q.filter(Product.category_id == category_id)
+    if after:
+        name, item_id = after
+        q = q.filter(or_(Product.name > name, and_(Product.name == name, Product.id > item_id)))
+    rows = q.order_by(Product.name, Product.id).limit(limit + 1).all()
+    has_more = len(rows) > limit
+    rows = rows[:limit]
+
+    ratings = {}
+    if "rating" in fields and rows:
+        aggs = ReviewAggregate.query.filter(
+            ReviewAggregate.target_type == "product",
+            ReviewAggregate.target_id.in_([p.id for p in rows]),
+        )
+        ratings = {a.target_id: a for a in aggs}
+
+    def serialize(p):
+        out = {}
+        for f in fields:
+            if f == "price":
+                out[f] = "%.2f" % (p.price or 0)
+            elif f == "images":
+                try:
+                    out[f] = json.loads(p.images_json) if p.images_json else []
+                except ValueError:
+                    out[f] = []
+            elif f == "rating":
+                agg = ratings.get(p.id)
+                out[f] = ({"average": round(agg.rating_sum / agg.review_count, 2), "count": agg.review_count}
+                          if agg and agg.review_count else None)
+            else:
+                out[f] = getattr(p, f)
+        return out
+
+    body = {
+        "ok": True,
+        "items": [serialize(p) for p in rows],
+        "next_cursor": _encode_cursor(rows[-1].name, rows[-1].id) if has_more else None,
+    }
+    resp = jsonify(body)
+    if etag is None:
+        # без Redis версия локальна для воркера — хэшируем сам ответ
+        etag = hashlib.sha1(resp.get_data()).hexdigest()
+        if request.if_none_match.contains_weak(etag):
+            return _not_modified(etag)
+    resp.set_etag(etag)
+    resp.headers["Cache-Control"] = "private, no-cache"
+    return resp
+
+@bp.get("/api/search")
+@jwt_required
+def api_search():
+    """Подсказки по мере ввода: ?q=кирп&limit=10."""
+    q = (request.args.get("q") or "").strip()
+    try:
+        limit = min(max(int(request.args.get("limit", 10)), 1), 50)
+    except ValueError:
+        return jsonify({"ok": False, "error": "invalid_params"}), 400
+    if len(q) < 2:
+        return jsonify({"ok": True, "products": [], "services": []})
+    products, services = search(q, limit)
+    return jsonify({
+        "ok": True,
+        "products": [{"id": p.id, "name": p.name, "sku": p.sku, "unit": p.unit,
+                      "price": "%.2f" % (p.price or 0)} for p in products],
+        "services": [{"id": s.id, "name": s.name,
+                      "price": "%.2f" % (s.base_price or 0)} for s in services],
+    })
+
+ORDERS_PAGE = 20
+
 @bp.get("/orders")
 @jwt_required
+@conditional(_orders_tag)
 def orders():
+    """История заказов: только заголовки, keyset по (created_at, id) от новых к старым.
+
+    Состав заказа подгружается отдельно (api_order_items). ?partial=1 отдаёт
+    только карточки следующей страницы — для кнопки «Показать ещё».
+    """
     user = request.user
-    orders = (
-        Order.query.filter_by(user_id=user.id)
-        .order_by(desc(Order.created_at))
-        .all()
+    cursor = request.args.get("cursor") or ""
+    before = _decode_cursor(cursor, datetime.fromisoformat, int) if cursor else None
+    if cursor and before is None:
+        # страница HTML: битый/устаревший курсор — просто первая страница;
+        # «Показать ещё» (partial) получает 400 и показывает ошибку сам
+        if request.args.get("partial"):
+            return "invalid cursor", 400, {"Content-Type": "text/plain; charset=utf-8"}
+
+    q = Order.query.filter(Order.user_id == user.id)
+    if before:
+        created_at, order_id = before
+        q = q.filter(or_(Order.created_at < created_at,
+                         and_(Order.created_at == created_at, Order.id < order_id)))
+    rows = q.order_by(desc(Order.created_at), desc(Order.id)).limit(ORDERS_PAGE + 1).all()
+    has_more = len(rows) > ORDERS_PAGE
+    orders = rows[:ORDERS_PAGE]
+    next_cursor = (_encode_cursor(orders[-1].created_at.isoformat(), orders[-1].id)
+                   if has_more else None)
+
+    if request.args.get("partial"):
+        return render_template("_order_cards.html", orders=orders, next_cursor=next_cursor)
+    return render_template(
+        "orders.html",
+        orders=orders,
+        next_cursor=next_cursor,
+        user=user,
+        is_admin=(getattr(user, "role", "client") == "admin"),
+        nav_active="orders",
     )
 
-    order_ids = [o.id for o in orders]
-    raw_items = (
-        OrderItem.query.filter(OrderItem.order_id.in_(order_ids)).all()
-        if order_ids
-        else []
-    )
+@bp.get("/api/orders/<int:order_id>/items")
+@jwt_required
+def api_order_items(order_id: int):
+    order = Order.query.filter_by(id=order_id, user_id=request.user.id).first()
+    if order is None:
+        return jsonify({"ok": False, "error": "not_found"}), 404
+    raw_items = OrderItem.query.filter_by(order_id=order.id).order_by(OrderItem.id).all()
 
     product_ids = {it.item_id for it in raw_items if it.item_type == "product"}
     service_ids = {it.item_id for it in raw_items if it.item_type == "service"}
@@ -203,13 +369,15 @@ def orders():
         else {}
     )
 
-    items_map = defaultdict(list)
+    items = []
     for it in raw_items:
         info = {
             "type": it.item_type,
-            "qty": it.qty,
-            "unit_price": it.unit_price,
-            "total": it.total,
+            "qty": float(it.qty or 0),
+            "unit_price": float(it.unit_price or 0),
+            "total": float(it.total or 0),
+            "name": None,
+            "unit": None,
         }
         if it.item_type == "product":
             prod = products.get(it.item_id)
@@ -221,18 +389,12 @@ def orders():
             if srv:
                 info["name"] = srv.name
                 info["unit"] = "услуга"
-        items_map[it.order_id].append(info)
-
-    items_map = dict(items_map)
+        items.append(info)
 
-    return render_template(
-        "orders.html",
-        orders=orders,
-        items_map=items_map,
-        user=user,
-        is_admin=(getattr(user, "role", "client") == "admin"),
-        nav_active="orders",
-    )
+    resp = jsonify({"ok": True, "order_id": order.id, "items": items})
+    # состав заказа после оформления не меняется
+    resp.headers["Cache-Control"] = "private, max-age=300"
+    return resp
 
 @bp.post("/order")
 @jwt_required
@@ -241,6 +403,16 @@ def create_order():
     items = payload.get("items") or []
     comment = (payload.get("comment") or "").strip()
     delivery_price = payload.get("delivery_price")
+    idem_key = (request.headers.get("Idempotency-Key") or "").strip() or None
+    user_id = request.user.id
+
+    if idem_key and len(idem_key) > 64:
+        return jsonify({"ok": False, "error": "invalid_idempotency_key"}), 400
+    if idem_key:
+        # повтор запроса клиентом (таймаут и т.п.) — отдаём уже созданный заказ
+        done = _order_for_key(user_id, idem_key)
+        if done is not None:
+            return done
 
     if not items:
         return jsonify({"ok": False, "error": "empty_order"}), 400
@@ -248,21 +420,14 @@ def create_order():
     def to_decimal(value) -> Decimal:
         return Decimal(str(value)).quantize(Decimal("0.01"), rounding=ROUND_HALF_UP)
 
-    order = Order(
-        user_id=request.user.id,
-        status="new",
-        comment=comment or None,
-        delivery_price=to_decimal(delivery_price or 0),
-        total=Decimal("0.00"),
-    )
-    db.session.add(order)
-    db.session.flush()
-
-    total = Decimal("0.00")
-    added = 0
+    # разбираем корзину без обращений к БД
+    lines = []
     for it in items:
         item_type = it.get("type")
-        item_id = int(it.get("id", 0))
+        try:
+            item_id = int(it.get("id", 0))
+        except (TypeError, ValueError):
+            return jsonify({"ok": False, "error": "invalid_item"}), 400
         qty_raw = it.get("qty", 1)
         try:
             qty = Decimal(str(qty_raw))
@@ -270,45 +435,83 @@ def create_order():
             return jsonify({"ok": False, "error": "invalid_qty"}), 400
         if qty <= 0:
             return jsonify({"ok": False, "error": "invalid_qty"}), 400
-
-        if item_type == "product":
-            obj = Product.query.get(item_id)
-            if not obj or not obj.is_active:
-                return jsonify({"ok": False, "error": "unknown_product"}), 400
-            unit_price = to_decimal(obj.price)
-        elif item_type == "service":
-            obj = Service.query.get(item_id)
-            if not obj or not obj.is_active:
-                return jsonify({"ok": False, "error": "unknown_service"}), 400
-            unit_price = to_decimal(obj.base_price)
-        else:
+        if item_type not in ("product", "service"):
             return jsonify({"ok": False, "error": "invalid_type"}), 400
+        lines.append((item_type, item_id, qty))
+
+    # цены — максимум двумя IN-запросами
+    product_ids = {item_id for t, item_id, _ in lines if t == "product"}
+    service_ids = {item_id for t, item_id, _ in lines if t == "service"}
+    prices = {"product": {}, "service": {}}
+    if product_ids:
+        rows = db.session.query(Product.id, Product.price).filter(
+            Product.id.in_(product_ids), Product.is_active.is_(True))
+        prices["product"] = {pid: price for pid, price in rows}
+    if service_ids:
+        rows = db.session.query(Service.id, Service.base_price).filter(
+            Service.id.in_(service_ids), Service.is_active.is_(True))
+        prices["service"] = {sid: price for sid, price in rows}
 
+    total = Decimal("0.00")
+    rows = []
+    for item_type, item_id, qty in lines:
+        price = prices[item_type].get(item_id)
+        if price is None:
+            return jsonify({"ok": False, "error": f"unknown_{item_type}"}), 400
+        unit_price = to_decimal(price)
         line_total = (unit_price * qty).quantize(Decimal("0.01"), rounding=ROUND_HALF_UP)
-        db.session.add(
-            OrderItem(
-                order_id=order.id,
-                item_type=item_type,
-                item_id=item_id,
-                qty=qty,
-                unit_price=unit_price,
-                total=line_total,
-            )
-        )
-        added += 1
+        rows.append({
+            "item_type": item_type,
+            "item_id": item_id,
+            "qty": qty,
+            "unit_price": unit_price,
+            "total": line_total,
+        })
         total += line_total
 
-    if not added:
-        return jsonify({"ok": False, "error": "empty_order"}), 400
-
+    order = Order(
+        user_id=user_id,
+        status="new",
+        comment=comment or None,
+        delivery_price=to_decimal(delivery_price or 0),
+        total=Decimal("0.00"),
+    )
     order.total = (total + (order.delivery_price or Decimal("0.00"))).quantize(
         Decimal("0.01"), rounding=ROUND_HALF_UP
     )
-    db.session.commit()
+    db.session.add(order)
+    db.session.flush()
+
+    for row in rows:
+        row["order_id"] = order.id
+    db.session.execute(insert(OrderItem), rows)  # один executemany на все строки
+    if idem_key:
+        db.session.add(OrderRequest(user_id=user_id, key=idem_key, order_id=order.id))
+    try:
+        db.session.commit()
+    except IntegrityError:
+        # параллельный повтор с тем же ключом успел раньше
+        db.session.rollback()
+        done = _order_for_key(user_id, idem_key) if idem_key else None
+        if done is not None:
+            return done
+        raise
     return jsonify({"ok": True, "order_id": order.id, "total": float(order.total)})
 
+def _order_for_key(user_id: int, key: str):
+    row = (
+        db.session.query(Order.id, Order.total)
+        .join(OrderRequest, OrderRequest.order_id == Order.id)
+        .filter(OrderRequest.user_id == user_id, OrderRequest.key == key)
+        .first()
+    )
+    if row is None:
+        return None
+    return jsonify({"ok": True, "order_id": row.id, "total": float(row.total or 0), "replayed": True})
+
 @bp.get("/profile")
 @jwt_required
+@conditional(_profile_tag)
 def profile_get():
     user = request.user
     return render_template(
@@ -321,7 +524,7 @@ def profile_get():
 @bp.post("/profile")
 @jwt_required
 def profile_post():
-    u = request.user
+    u = request.user.load()
     data = request.get_json(force=True)
     email = (data.get("email") or "").strip()
     phone = (data.get("phone") or "").strip()
@@ -330,6 +533,7 @@ def profile_post():
     if phone and len(phone) < 6:   return jsonify({"ok": False, "error":"Некорректный телефон"}), 400
     u.email = email or None; u.phone = phone or None; u.delivery_address = addr or None
     db.session.commit()
+    invalidate_user(u.id)
     return jsonify({
         "ok": True,
         "user": {
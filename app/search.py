@@ -0,0 +1,198 @@
+"""Полнотекстовый поиск по товарам и услугам (typeahead).
+
+MySQL: FULLTEXT-индексы прямо на products/services (см. models), InnoDB
+поддерживает их сам, запрос — MATCH … AGAINST в BOOLEAN MODE с префиксами.
+Слова короче innodb_ft_min_token_size (SEARCH_FT_MIN_TOKEN_SIZE, по
+умолчанию 3) и стоп-слова InnoDB не индексируются: обязательный +слово*
+с ними не нашёл бы ничего, поэтому такие слова выкидываются, а если не
+осталось ни одного — поиск идёт префиксным LIKE.
+
+SQLite (тесты, локальная разработка): FTS5-таблицы products_fts/services_fts,
+rowid = id записи. Синхронизируются mapper-событиями Product/Service;
+после массовых Core-операций нужно вызвать reindex().
+
+Прочие СУБД: префиксный LIKE 'q%' по name (использует обычный индекс).
+"""
+import re
+from flask import current_app
+from sqlalchemy import event, text
+from .db import db
+from .models import Product, Service
+
+MAX_TERMS = 8
+_word_re = re.compile(r"\w+", re.UNICODE)
+# INFORMATION_SCHEMA.INNODB_FT_DEFAULT_STOPWORD
+INNODB_STOPWORDS = frozenset((
+    "a about an are as at be by com de en for from how i in is it la of on or "
+    "that the this to was what when where who will with und www"
+).split())
+
+_FTS_DDL = (
+    "CREATE VIRTUAL TABLE IF NOT EXISTS products_fts USING fts5("
+    "name, sku, description, tokenize='unicode61 remove_diacritics 2', prefix='2 3')",
+    "CREATE VIRTUAL TABLE IF NOT EXISTS services_fts USING fts5("
+    "name, description, tokenize='unicode61 remove_diacritics 2', prefix='2 3')",
+)
+
+
+def _terms(q: str):
+    return _word_re.findall((q or "").lower())[:MAX_TERMS]
+
+
+def _dialect() -> str:
+    return db.engine.dialect.name
+
+
+# --------- синхронизация FTS5 (только SQLite) ---------
+def _sync_product(connection, p):
+    connection.execute(text("DELETE FROM products_fts WHERE rowid = :id"), {"id": p.id})
+    if p.is_active:
+        connection.execute(
+            text("INSERT INTO products_fts (rowid, name, sku, description) VALUES (:id, :name, :sku, :description)"),
+            {"id": p.id, "name": p.name or "", "sku": p.sku or "", "description": p.description or ""},
+        )
+
+def _sync_service(connection, s):
+    connection.execute(text("DELETE FROM services_fts WHERE rowid = :id"), {"id": s.id})
+    if s.is_active:
+        connection.execute(
+            text("INSERT INTO services_fts (rowid, name, description) VALUES (:id, :name, :description)"),
+            {"id": s.id, "name": s.name or "", "description": s.description or ""},
+        )
+
+def _on_product_change(mapper, connection, target):
+    if connection.dialect.name == "sqlite":
+        _sync_product(connection, target)
+
+def _on_product_delete(mapper, connection, target):
+    if connection.dialect.name == "sqlite":
+        connection.execute(text("DELETE FROM products_fts WHERE rowid = :id"), {"id": target.id})
+
+def _on_service_change(mapper, connection, target):
+    if connection.dialect.name == "sqlite":
+        _sync_service(connection, target)
+
+def _on_service_delete(mapper, connection, target):
+    if connection.dialect.name == "sqlite":
+        connection.execute(text("DELETE FROM services_fts WHERE rowid = :id"), {"id": target.id})
+
+
+def ensure_search_index():
+    """Создать FTS5-таблицы для SQLite (MySQL-индексы создаются со схемой)."""
+    if _dialect() != "sqlite":
+        return
+    with db.engine.begin() as conn:
+        for ddl in _FTS_DDL:
+            conn.execute(text(ddl))
+
+
+def reindex(product_ids=None) -> int:
+    """Пересобрать FTS5 целиком или для указанных товаров. Для MySQL — no-op."""
+    if _dialect() != "sqlite":
+        return 0
+    conn = db.session.connection()
+    n = 0
+    if product_ids is None:
+        conn.execute(text("DELETE FROM products_fts"))
+        conn.execute(text("DELETE FROM services_fts"))
+        for s in Service.query.yield_per(1000):
+            _sync_service(conn, s)
+            n += 1
+        products = Product.query
+    else:
+        products = Product.query.filter(Product.id.in_(list(product_ids)))
+    for p in products.yield_per(1000):
+        _sync_product(conn, p)
+        n += 1
+    db.session.commit()
+    return n
+
+
+# --------- поиск ---------
+def _ids_sqlite(table, weights, terms, limit):
+    match = " AND ".join('"{}"*'.format(t.replace('"', "")) for t in terms)
+    rows = db.session.execute(
+        text(f"SELECT rowid FROM {table} WHERE {table} MATCH :q "
+             f"ORDER BY bm25({table}, {weights}) LIMIT :n"),
+        {"q": match, "n": limit},
+    )
+    return [r[0] for r in rows]
+
+
+def _mysql_terms(terms):
+    """Слова, которые есть в FULLTEXT-индексе InnoDB."""
+    min_size = current_app.config.get("SEARCH_FT_MIN_TOKEN_SIZE", 3)
+    return [t for t in terms if len(t) >= min_size and t not in INNODB_STOPWORDS]
+
+
+def _ids_mysql(table, columns, terms, limit):
+    against = " ".join(f"+{t}*" for t in terms)
+    rows = db.session.execute(
+        text(f"SELECT id FROM {table} WHERE is_active = 1 "
+             f"AND MATCH({columns}) AGAINST (:q IN BOOLEAN MODE) "
+             f"ORDER BY MATCH({columns}) AGAINST (:q IN BOOLEAN MODE) DESC LIMIT :n"),
+        {"q": against, "n": limit},
+    )
+    return [r[0] for r in rows]
+
+
+def _load(model, ids):
+    if not ids:
+        return []
+    by_id = {o.id: o for o in model.query.filter(model.id.in_(ids), model.is_active.is_(True))}
+    return [by_id[i] for i in ids if i in by_id]
+
+
+def _name_prefix(column, terms, dialect):
+    """name LIKE 'q%' с экранированными % и _. В MySQL (collation *_ci) и SQLite
+       LIKE и так без учёта регистра, а lower(name) не дал бы взять индекс
+       ix_products_active_name; прочим СУБД — ILIKE.
+    """
+    prefix = " ".join(terms)
+    if dialect in ("mysql", "mariadb", "sqlite"):
+        return column.startswith(prefix, autoescape=True)
+    return column.istartswith(prefix, autoescape=True)
+
+
+def _search_like(terms, limit):
+    dialect = _dialect()
+    products = Product.query.filter(Product.is_active.is_(True), _name_prefix(Product.name, terms, dialect)) \
+        .order_by(Product.name).limit(limit).all()
+    services = Service.query.filter(Service.is_active.is_(True), _name_prefix(Service.name, terms, dialect)) \
+        .order_by(Service.name).limit(limit).all()
+    return products, services
+
+
+def search(q: str, limit: int = 10):
+    """Возвращает (products, services), отсортированные по релевантности."""
+    terms = _terms(q)
+    if not terms:
+        return [], []
+    dialect = _dialect()
+    ft_terms = _mysql_terms(terms) if dialect in ("mysql", "mariadb") else ()
+    if dialect == "sqlite":
+        product_ids = _ids_sqlite("products_fts", "10.0, 5.0, 1.0", terms, limit)
+        service_ids = _ids_sqlite("services_fts", "10.0, 1.0", terms, limit)
+    elif ft_terms:
+        product_ids = _ids_mysql("products", "name, sku, description", ft_terms, limit)
+        service_ids = _ids_mysql("services", "name, description", ft_terms, limit)
+    else:
+        return _search_like(terms, limit)
+
+    # точное совпадение артикула — всегда первым (уникальный индекс по sku)
+    exact = Product.query.filter(Product.sku == q.strip(), Product.is_active.is_(True)).first()
+    if exact is not None:
+        product_ids = [exact.id] + [i for i in product_ids if i != exact.id][:limit - 1]
+    return _load(Product, product_ids), _load(Service, service_ids)
+
+
+def init_search(app):
+    if not event.contains(Product, "after_insert", _on_product_change):
+        event.listen(Product, "after_insert", _on_product_change)
+        event.listen(Product, "after_update", _on_product_change)
+        event.listen(Product, "after_delete", _on_product_delete)
+        event.listen(Service, "after_insert", _on_service_change)
+        event.listen(Service, "after_update", _on_service_change)
+        event.listen(Service, "after_delete", _on_service_delete)
+    with app.app_context():
+        ensure_search_index()
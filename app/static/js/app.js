@@ -285,6 +285,59 @@
     });
   }
 
+  async function loadOrderItems(details){
+    if (details.dataset.loaded) return;
+    details.dataset.loaded = '1';
+    const tbody = details.querySelector('tbody');
+    try{
+      const resp = await fetch(`/app/api/orders/${details.dataset.orderItems}/items`, {credentials: 'include'});
+      const data = await resp.json();
+      if (!resp.ok) throw new Error(data.error || resp.statusText);
+      tbody.innerHTML = '';
+      data.items.forEach(item => {
+        const tr = document.createElement('tr');
+        tr.innerHTML = `
+          <td><div class="item-name"></div><div class="small text-secondary item-meta"></div></td>
+          <td class="text-center">${formatMoney(item.qty)}</td>
+          <td class="text-end">${formatMoney(item.unit_price)}</td>
+          <td class="text-end">${formatMoney(item.total)}</td>`;
+        tr.querySelector('.item-name').textContent = item.name || 'Позиция удалена';
+        tr.querySelector('.item-meta').textContent =
+          `Тип: ${item.type === 'product' ? 'Товар' : 'Услуга'}${item.unit ? ' · ' + item.unit : ''}`;
+        tbody.appendChild(tr);
+      });
+      if (!data.items.length){
+        tbody.innerHTML = '<tr><td colspan="4" class="text-secondary small">Позиции не найдены</td></tr>';
+      }
+    }catch(err){
+      delete details.dataset.loaded;
+      tbody.innerHTML = '<tr><td colspan="4" class="text-danger small">Не удалось загрузить состав заказа</td></tr>';
+    }
+  }
+
+  function handleOrderItemsToggle(event){
+    const details = event.target.closest?.('[data-order-items]');
+    if (details && details.open) loadOrderItems(details);
+  }
+
+  async function handleOrdersMore(event){
+    const link = event.target.closest('[data-orders-more] a');
+    if (!link) return;
+    event.preventDefault();
+    const wrap = link.closest('[data-orders-more]');
+    const list = document.getElementById('ordersList');
+    link.classList.add('disabled');
+    try{
+      const resp = await fetch(`/app/orders?partial=1&cursor=${encodeURIComponent(link.dataset.cursor)}`, {credentials: 'include'});
+      if (!resp.ok) throw new Error(resp.statusText);
+      wrap.remove();
+      list.insertAdjacentHTML('beforeend', await resp.text());
+    }catch(err){
+      link.classList.remove('disabled');
+      flash('Не удалось загрузить заказы.', 'danger');
+    }
+  }
+
   function initAdminLinks(){
     document.querySelectorAll('[data-admin-link]').forEach(link => {
       link.addEventListener('click', (ev)=>{
@@ -301,6 +354,9 @@
   document.addEventListener('submit', handleProfileSubmit);
   document.addEventListener('submit', handleFeedbackSubmit);
   document.addEventListener('click', handleProfileRefresh);
+  document.addEventListener('click', handleOrdersMore);
+  // toggle не всплывает — ловим на фазе перехвата
+  document.addEventListener('toggle', handleOrderItemsToggle, true);
   const submitOrderBtn = document.getElementById('submitOrder');
   if (submitOrderBtn){
     submitOrderBtn.addEventListener('click', submitOrder);
@@ -0,0 +1,156 @@
+"""Создание/обновление пользователя по данным Telegram одним запросом.
+
+Обычный вход (данные не менялись) — один SELECT по уникальному telegram_id
+и никаких записей. Иначе — нативный upsert: INSERT … ON DUPLICATE KEY UPDATE
+в MySQL, INSERT … ON CONFLICT DO UPDATE в SQLite/PostgreSQL. Гонку двух
+одновременных первых входов разруливает уникальный индекс, а не код.
+Пустые значения из Telegram не затирают уже сохранённые.
+"""
+from typing import Optional
+from sqlalchemy import select, func, or_
+from sqlalchemy.exc import IntegrityError
+from .db import db
+from .models import User
+from .auth import AuthUser, PRINCIPAL_FIELDS, invalidate_user
+
+PROFILE_FIELDS = ("username", "first_name", "last_name")
+TELEGRAM_ID_MAX = 2 ** 63 - 1  # BigInteger
+
+_users = User.__table__
+
+
+def telegram_id_of(info: dict) -> Optional[int]:
+    """telegram_id из данных бота/initData или None, если его нет или он не число."""
+    value = info.get("telegram_id") or info.get("id")
+    if isinstance(value, bool) or not isinstance(value, (int, str)):
+        return None
+    try:
+        telegram_id = int(value)
+    except ValueError:
+        return None
+    return telegram_id if 0 < telegram_id <= TELEGRAM_ID_MAX else None
+
+
+def _profile(info: dict) -> dict:
+    # в колонки идут только строки, длиннее колонки — обрезаем
+    return {f: (info[f][:64] if isinstance(info.get(f), str) else None) for f in PROFILE_FIELDS}
+
+
+def _select_principal(telegram_id: int):
+    cols = [_users.c[name] for name in PRINCIPAL_FIELDS]
+    return db.session.execute(select(*cols).where(_users.c.telegram_id == telegram_id)).first()
+
+
+def _changed(row, values: dict) -> bool:
+    return any(values.get(f) and values[f] != getattr(row, f) for f in PROFILE_FIELDS)
+
+
+def _keep_old(new_value, column):
+    # новое значение, если оно непустое, иначе то, что уже в строке
+    return func.coalesce(func.nullif(new_value, ""), column)
+
+
+def _upsert_stmt(rows: list):
+    dialect = db.engine.dialect.name
+    if dialect in ("mysql", "mariadb"):
+        from sqlalchemy.dialects.mysql import insert
+        stmt = insert(_users).values(rows)
+        # MySQL не пишет строку, если значения не изменились (affected rows = 0)
+        return stmt.on_duplicate_key_update(
+            **{f: _keep_old(stmt.inserted[f], _users.c[f]) for f in PROFILE_FIELDS}
+        )
+    if dialect in ("sqlite", "postgresql"):
+        if dialect == "sqlite":
+            from sqlalchemy.dialects.sqlite import insert
+        else:
+            from sqlalchemy.dialects.postgresql import insert
+        stmt = insert(_users).values(rows)
+        return stmt.on_conflict_do_update(
+            index_elements=[_users.c.telegram_id],
+            set_={f: _keep_old(stmt.excluded[f], _users.c[f]) for f in PROFILE_FIELDS},
+            # пишем, только если что-то реально поменялось
+            where=or_(*[
+                func.nullif(stmt.excluded[f], "").is_not(None)
+                & (func.nullif(stmt.excluded[f], "") != func.coalesce(_users.c[f], ""))
+                for f in PROFILE_FIELDS
+            ]),
+        )
+    return None
+
+
+def _generic_upsert(values: dict):
+    """Для прочих СУБД: INSERT, при конфликте — UPDATE."""
+    try:
+        with db.session.begin_nested():
+            db.session.execute(_users.insert().values(**values))
+    except IntegrityError:
+        update = {f: values[f] for f in PROFILE_FIELDS if values.get(f)}
+        if update:
+            db.session.execute(
+                _users.update().where(_users.c.telegram_id == values["telegram_id"]).values(**update)
+            )
+
+
+def upsert_telegram_user(info: dict) -> Optional[AuthUser]:
+    """info: {"id" | "telegram_id", "username", "first_name", "last_name"}.
+       Возвращает снимок пользователя (AuthUser) или None без корректного telegram id.
+    """
+    telegram_id = telegram_id_of(info)
+    if telegram_id is None:
+        return None
+    values = {"telegram_id": telegram_id, **_profile(info)}
+
+    row = _select_principal(telegram_id)
+    if row is not None and not _changed(row, values):
+        return AuthUser(**row._asdict())
+
+    stmt = _upsert_stmt([values])
+    if stmt is not None:
+        db.session.execute(stmt)
+    else:
+        _generic_upsert(values)
+    db.session.commit()
+
+    row = _select_principal(telegram_id)
+    invalidate_user(row.id)
+    return AuthUser(**row._asdict())
+
+
+def upsert_telegram_users(items: list) -> dict:
+    """Пакетная регистрация (бот): один SELECT … IN по пачке и один upsert
+       на все новые/изменившиеся строки. Возвращает счётчики; строки без
+       корректного telegram_id пропускаются и считаются в invalid.
+    """
+    by_tg, invalid = {}, 0
+    for info in items:
+        telegram_id = telegram_id_of(info) if isinstance(info, dict) else None
+        if telegram_id is None:
+            invalid += 1
+            continue
+        # повторы внутри пачки схлопываем — побеждает последний
+        by_tg[telegram_id] = {"telegram_id": telegram_id, **_profile(info)}
+    if not by_tg:
+        return {"received": len(items), "written": 0, "invalid": invalid}
+
+    existing = {
+        row.telegram_id: row
+        for row in db.session.execute(
+            select(_users.c.id, _users.c.telegram_id, *[_users.c[f] for f in PROFILE_FIELDS])
+            .where(_users.c.telegram_id.in_(list(by_tg)))
+        )
+    }
+    rows = [values for tg, values in by_tg.items()
+            if tg not in existing or _changed(existing[tg], values)]
+    if rows:
+        stmt = _upsert_stmt(rows)
+        if stmt is not None:
+            db.session.execute(stmt)
+        else:
+            for values in rows:
+                _generic_upsert(values)
+        db.session.commit()
+        for values in rows:
+            row = existing.get(values["telegram_id"])
+            if row is not None:
+                invalidate_user(row.id)
+    return {"received": len(items), "written": len(rows), "invalid": invalid}
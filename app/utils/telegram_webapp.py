@@ -4,14 +4,26 @@ import hashlib
 import urllib.parse
 import json
 import time
+from functools import lru_cache
 from typing import Tuple, Optional, Dict, Any
+from flask import has_app_context
+from ..cache import TTLCache, get_redis, redis_failed
+
+INIT_DATA_MAX_AGE = 86400  # initData старше суток не принимаем
+USED_KEY = "wg:tg:initdata:{}"
+
+# проверенные initData: (token, initData) → разобранные данные, до истечения auth_date
+_verified = TTLCache(maxsize=20000, ttl=INIT_DATA_MAX_AGE)
+# hash initData, уже обменянных на токены (single_use), когда Redis недоступен
+_seen_hashes = TTLCache(maxsize=50000, ttl=INIT_DATA_MAX_AGE)
 
 def parse_init_data(init_data: str) -> Dict[str, str]:
     # безопасный парсинг строки initData
     return dict(urllib.parse.parse_qsl(init_data or "", keep_blank_values=True))
 
+@lru_cache(maxsize=8)
 def _secret_key(bot_token: str) -> bytes:
-    # secret = HMAC_SHA256("WebAppData", bot_token)
+    # secret = HMAC_SHA256("WebAppData", bot_token); считаем один раз на токен
     return hmac.new(b"WebAppData", bot_token.encode("utf-8"), hashlib.sha256).digest()
 
 def _calc_hash(check_string: str, bot_token: str) -> str:
@@ -19,7 +31,7 @@ def _calc_hash(check_string: str, bot_token: str) -> str:
     secret = _secret_key(bot_token)
     return hmac.new(secret, check_string.encode("utf-8"), hashlib.sha256).hexdigest()
 
-def _verify(init_data: str, bot_token: str) -> Tuple[bool, Optional[Dict[str, Any]]]:
+def _verify_uncached(init_data: str, bot_token: str) -> Tuple[bool, Optional[Dict[str, Any]]]:
     try:
         data = parse_init_data(init_data)
         received_hash = data.pop("hash", None)
@@ -33,7 +45,7 @@ def _verify(init_data: str, bot_token: str) -> Tuple[bool, Optional[Dict[str, An
 
         # не старше 24 часов
         auth_date = int(data.get("auth_date", "0") or "0")
-        if auth_date and (time.time() - auth_date > 86400):
+        if auth_date and (time.time() - auth_date > INIT_DATA_MAX_AGE):
             return False, None
 
         # user обязателен
@@ -41,13 +53,66 @@ def _verify(init_data: str, bot_token: str) -> Tuple[bool, Optional[Dict[str, An
         if not user_raw:
             return False, None
         data["user"] = json.loads(user_raw) if isinstance(user_raw, str) else user_raw
+        data["hash"] = received_hash
         return True, data
     except Exception:
         return False, None
 
+def _copy(data: Dict[str, Any]) -> Dict[str, Any]:
+    out = dict(data)
+    out.pop("hash", None)
+    if isinstance(out.get("user"), dict):
+        out["user"] = dict(out["user"])
+    return out
+
+def _claim(received_hash: str, ttl: float) -> bool:
+    """True, если hash предъявлен впервые. В Redis — SET NX EX, общий для всех
+       воркеров; без Redis — только в пределах процесса.
+    """
+    r = get_redis() if has_app_context() else None
+    if r is not None:
+        try:
+            return bool(r.set(USED_KEY.format(received_hash), 1, nx=True, ex=max(1, int(ttl))))
+        except Exception as e:
+            redis_failed(e)
+    if _seen_hashes.get(received_hash):
+        return False
+    _seen_hashes.set(received_hash, True, ttl=ttl)
+    return True
+
+def _verify(init_data: str, bot_token: str, single_use: bool = False) -> Tuple[bool, Optional[Dict[str, Any]]]:
+    """Проверка initData с кэшем: одна и та же строка (WebApp шлёт её на каждый
+       запрос) проверяется один раз и помнится до истечения auth_date.
+       single_use=True — для выдачи токенов (/api/telegram/auth): повторно
+       предъявленный hash (replay) отклоняется, пока initData не истекла.
+       Ключ кэша — вся строка целиком, а не hash: иначе подмена полей
+       при известном hash прошла бы без проверки подписи.
+    """
+    if not init_data or not bot_token:
+        return False, None
+    key = (bot_token, init_data)
+    data = _verified.get(key)
+    if data is None:
+        ok, data = _verify_uncached(init_data, bot_token)
+        if not ok:
+            return False, None
+        auth_date = int(data.get("auth_date", "0") or "0")
+        ttl = (auth_date + INIT_DATA_MAX_AGE - time.time()) if auth_date else None
+        _verified.set(key, data, ttl=ttl)
+    elif data.get("auth_date") and time.time() - int(data["auth_date"]) > INIT_DATA_MAX_AGE:
+        return False, None
+
+    if single_use:
+        auth_date = int(data.get("auth_date", "0") or "0")
+        ttl = (auth_date + INIT_DATA_MAX_AGE - time.time()) if auth_date else INIT_DATA_MAX_AGE
+        if not _claim(data["hash"], ttl):
+            return False, None
+    return True, _copy(data)
+
 # — экспортируем ДВА имени для совместимости —
-def verify_webapp_init_data(init_data: str, bot_token: str) -> Tuple[bool, Optional[Dict[str, Any]]]:
-    return _verify(init_data, bot_token)
+def verify_webapp_init_data(init_data: str, bot_token: str,
+                            single_use: bool = False) -> Tuple[bool, Optional[Dict[str, Any]]]:
+    return _verify(init_data, bot_token, single_use=single_use)
 
 def verify_init_data(init_data: str, bot_token: str) -> Tuple[bool, Optional[Dict[str, Any]]]:
     # alias (некоторые версии кода импортируют это имя)
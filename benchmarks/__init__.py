@@ -0,0 +1 @@
+"""Локальные бенчмарки Winst-Grad (запуск: python -m benchmarks.<модуль>)."""
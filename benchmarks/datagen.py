@@ -0,0 +1,214 @@
+"""Синтетический «большой» каталог для бенчмарков: воспроизводимо по --seed.
+
+    python -m benchmarks.datagen --db sqlite:////tmp/wg-bench.db
+    python -m benchmarks.datagen --db mysql+pymysql://wg:wg@127.0.0.1/wg_bench --scale 0.1
+
+По умолчанию: 100k товаров в 60 категориях, 200 услуг, 50k пользователей
+с историей заказов (в среднем 4 заказа, 1–6 позиций), 1M отзывов (90%
+промодерированы). Пишется пачками через Core executemany с явными id —
+без ORM-событий; агрегаты отзывов, поисковый индекс и версия каталога
+пересобираются в конце. Пользователь id=1 — администратор
+(telegram_id=BENCH_ADMIN_TG), его заказы и JWT используют сценарии
+(benchmarks/scenarios.py). Если в базе уже есть товары, генерация
+пропускается — одну базу можно гонять много раз.
+"""
+import argparse
+import os
+import random
+import sys
+import time
+from datetime import datetime, timedelta
+from decimal import Decimal
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+BENCH_TG_BASE = 7_000_000_000  # telegram_id пользователя i = BENCH_TG_BASE + i
+BENCH_ADMIN_TG = BENCH_TG_BASE + 1
+EPOCH = datetime(2024, 1, 1)
+HISTORY_DAYS = 730
+CHUNK = 5000
+
+DEFAULTS = {"products": 100_000, "services": 200, "categories": 60,
+            "users": 50_000, "orders_per_user": 4, "reviews": 1_000_000}
+
+_NOUNS = ("Кирпич", "Цемент", "Брус", "Доска", "Профлист", "Утеплитель", "Саморез", "Гипсокартон",
+          "Плитка", "Краска", "Грунтовка", "Арматура", "Песок", "Щебень", "Труба", "Кабель")
+_ADJS = ("облицовочный", "рядовой", "сухой", "строганый", "оцинкованный", "влагостойкий",
+         "фасадный", "усиленный", "лёгкий", "морозостойкий")
+_STATUSES = (("new", 10), ("processing", 10), ("shipped", 15), ("done", 55), ("cancelled", 10))
+_REVIEW_TEXTS = ("Всё отлично", "Доставили вовремя", "Качество среднее", "Рекомендую",
+                 "Цена завышена", "Буду заказывать ещё", "Упаковка помята", "")
+
+
+def _chunks(rows, size=CHUNK):
+    batch = []
+    for row in rows:
+        batch.append(row)
+        if len(batch) >= size:
+            yield batch
+            batch = []
+    if batch:
+        yield batch
+
+
+def _ts(rnd: random.Random) -> datetime:
+    return EPOCH + timedelta(seconds=rnd.randrange(HISTORY_DAYS * 86400))
+
+
+def generate(sizes: dict, seed: int = 42, log=print) -> dict:
+    """Заполнить пустую базу текущего приложения. Возвращает число строк по таблицам."""
+    from sqlalchemy import insert
+    from app.db import db
+    from app.models import Category, Product, Service, User, Order, OrderItem, Review
+    from app.reviews import rebuild_aggregates
+    from app.search import reindex
+    from app.catalog import bump_version
+
+    rnd = random.Random(seed)
+    conn = db.session.connection()
+    if conn.dialect.name == "sqlite":
+        conn.exec_driver_sql("PRAGMA synchronous=OFF")
+    counts = {}
+
+    def write(model, rows):
+        n = 0
+        for batch in _chunks(rows):
+            db.session.execute(insert(model.__table__), batch)
+            db.session.commit()
+            n += len(batch)
+        counts[model.__tablename__] = n
+        log(f"  {model.__tablename__}: {n}")
+
+    t0 = time.perf_counter()
+    write(Category, ({"id": i, "name": f"{_NOUNS[i % len(_NOUNS)]} — группа {i}", "slug": f"bench-{i}"}
+                     for i in range(1, sizes["categories"] + 1)))
+
+    prices = [Decimal(0)]  # prices[product_id]
+    def products():
+        for i in range(1, sizes["products"] + 1):
+            price = Decimal(rnd.randrange(50, 500_000)) / 100
+            prices.append(price)
+            created = _ts(rnd)
+            yield {"id": i, "category_id": rnd.randint(1, sizes["categories"]),
+                   "name": f"{rnd.choice(_NOUNS)} {rnd.choice(_ADJS)} {i:06d}",
+                   "sku": f"BN-{i:07d}", "unit": "шт", "price": price,
+                   "description": f"{rnd.choice(_NOUNS)} для строительства, партия {rnd.randrange(1000)}",
+                   "is_active": rnd.random() < 0.95, "created_at": created, "updated_at": created}
+    write(Product, products())
+
+    service_prices = [Decimal(0)] + [Decimal(rnd.randrange(1000, 100_000)) for _ in range(sizes["services"])]
+    write(Service, ({"id": i, "name": f"Услуга {i}: монтаж", "description": "Выезд мастера",
+                     "base_price": service_prices[i], "is_active": True}
+                    for i in range(1, sizes["services"] + 1)))
+
+    write(User, ({"id": i, "telegram_id": BENCH_TG_BASE + i, "username": f"bench{i}",
+                  "first_name": f"Клиент{i}", "role": "admin" if i == 1 else "client",
+                  "created_at": _ts(rnd)}
+                 for i in range(1, sizes["users"] + 1)))
+
+    # заказы и позиции — одним проходом, чтобы сумма заказа сходилась с позициями
+    order_rows, item_rows = [], []
+    order_id = item_id = 0
+    n_orders = n_items = 0
+
+    def flush_orders():
+        nonlocal order_rows, item_rows, n_orders, n_items
+        if order_rows:
+            db.session.execute(insert(Order.__table__), order_rows)
+            db.session.execute(insert(OrderItem.__table__), item_rows)
+            db.session.commit()
+            n_orders += len(order_rows)
+            n_items += len(item_rows)
+        order_rows, item_rows = [], []
+
+    for user_id in range(1, sizes["users"] + 1):
+        n = sizes["orders_per_user"] * 10 if user_id == 1 else rnd.randint(0, sizes["orders_per_user"] * 2)
+        for _ in range(n):
+            order_id += 1
+            total = Decimal(0)
+            for _ in range(rnd.randint(1, 6)):
+                item_id += 1
+                if rnd.random() < 0.9:
+                    kind, target = "product", rnd.randint(1, sizes["products"])
+                    unit_price = prices[target]
+                else:
+                    kind, target = "service", rnd.randint(1, sizes["services"])
+                    unit_price = service_prices[target]
+                qty = rnd.randint(1, 20)
+                line = unit_price * qty
+                total += line
+                item_rows.append({"id": item_id, "order_id": order_id, "item_type": kind, "item_id": target,
+                                  "qty": qty, "unit_price": unit_price, "total": line})
+            created = _ts(rnd)
+            status = rnd.choices([s for s, _ in _STATUSES], [w for _, w in _STATUSES])[0]
+            order_rows.append({"id": order_id, "user_id": user_id, "status": status, "total": total,
+                               "delivery_price": 0, "created_at": created,
+                               "payment_status": "paid" if status in ("shipped", "done") else "unpaid",
+                               "updated_at": created + timedelta(hours=rnd.randrange(1, 240))})
+        if len(order_rows) >= CHUNK:
+            flush_orders()
+    flush_orders()
+    counts["orders"], counts["order_items"] = n_orders, n_items
+    log(f"  orders: {n_orders}, order_items: {n_items}")
+
+    # отзывы: распределение по товарам с «длинным хвостом» — часть карточек популярна
+    def reviews():
+        for i in range(1, sizes["reviews"] + 1):
+            if rnd.random() < 0.9:
+                target_type = "product"
+                target = min(int(rnd.paretovariate(1.2)), sizes["products"]) if rnd.random() < 0.5 \
+                    else rnd.randint(1, sizes["products"])
+            else:
+                target_type, target = "service", rnd.randint(1, sizes["services"])
+            yield {"id": i, "user_id": rnd.randint(1, sizes["users"]), "target_type": target_type,
+                   "target_id": target, "rating": rnd.choices((1, 2, 3, 4, 5), (5, 5, 10, 30, 50))[0],
+                   "text": rnd.choice(_REVIEW_TEXTS), "is_moderated": rnd.random() < 0.9,
+                   "created_at": _ts(rnd)}
+    write(Review, reviews())
+
+    log("  review aggregates: %s" % rebuild_aggregates())
+    log("  search index: %s" % reindex())
+    bump_version()
+    log(f"generated in {time.perf_counter() - t0:.1f}s")
+    return counts
+
+
+def main():
+    ap = argparse.ArgumentParser(description="Seeded synthetic dataset for benchmarks")
+    ap.add_argument("--db", required=True, help="SQLAlchemy URI (SQLite или MySQL)")
+    ap.add_argument("--seed", type=int, default=42)
+    ap.add_argument("--scale", type=float, default=1.0, help="множитель размеров по умолчанию")
+    for key, value in DEFAULTS.items():
+        ap.add_argument(f"--{key.replace('_', '-')}", type=int, default=None, help=f"по умолчанию {value}")
+    args = ap.parse_args()
+
+    sizes = {key: getattr(args, key) if getattr(args, key) is not None
+             else max(1, int(value * (1 if key in ("orders_per_user", "categories") else args.scale)))
+             for key, value in DEFAULTS.items()}
+    prepare(args.db)
+    from app import create_app
+    from app.db import db
+    from app.models import Product
+
+    app = create_app()
+    with app.app_context():
+        if db.session.query(Product.id).limit(1).first() is not None:
+            print("database already has products, skipping generation")
+            return
+        print(f"generating {sizes} (seed={args.seed})")
+        generate(sizes, args.seed)
+
+
+def prepare(uri: str):
+    """Окружение до импорта app (Config читает его при импорте) и схема."""
+    os.environ["SQLALCHEMY_DATABASE_URI"] = uri
+    os.environ.setdefault("REDIS_URL", "")
+    sys.path.insert(0, ROOT)
+    if not uri.startswith("sqlite"):
+        from app import create_app
+        from app.db import upgrade
+        with create_app().app_context():
+            upgrade()  # SQLite создаётся через DB_AUTO_CREATE
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,170 @@
+"""Офлайн-бенчмарк webhook-режима бота: фейковый Telegram + генератор апдейтов.
+
+    python -m benchmarks.fake_updates --updates 5000 --concurrency 100
+    python -m benchmarks.fake_updates --no-spawn --webhook http://127.0.0.1:8081/tg/webhook
+
+Поднимает фейковый Bot API (отвечает ok на sendMessage/setWebhook/…) и
+фейковый /app/api/telegram/register/bulk, запускает telegram/bot.py в режиме
+webhook против них и шлёт синтетические апдейты /start. Меряет, сколько
+апдейтов в секунду принимает webhook и сколько ответов бот успевает отправить.
+"""
+import argparse
+import asyncio
+import os
+import subprocess
+import sys
+import time
+
+import aiohttp
+from aiohttp import web
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+SECRET = "bench-secret"
+TOKEN = "123456:fake-bench-token"
+
+
+class FakeTelegram:
+    """Минимальный Bot API: считает вызовы и отдаёт правдоподобные ответы."""
+
+    def __init__(self):
+        self.calls = {}
+        self.registered = 0
+        self.first_reply = None
+        self.last_reply = None
+
+    def app(self) -> web.Application:
+        app = web.Application()
+        app.router.add_post("/bot{token}/{method}", self.method)
+        app.router.add_post("/app/api/telegram/register/bulk", self.register_bulk)
+        return app
+
+    async def method(self, request: web.Request) -> web.Response:
+        name = request.match_info["method"]
+        self.calls[name] = self.calls.get(name, 0) + 1
+        form = await request.post()
+        if name == "sendMessage":
+            now = time.perf_counter()
+            self.first_reply = self.first_reply or now
+            self.last_reply = now
+            chat_id = int(form.get("chat_id", 0))
+            result = {"message_id": self.calls[name], "date": int(time.time()),
+                      "chat": {"id": chat_id, "type": "private"}, "text": form.get("text", "")}
+        elif name == "getMe":
+            result = {"id": 123456, "is_bot": True, "first_name": "Bench", "username": "bench_bot"}
+        else:
+            result = True
+        return web.json_response({"ok": True, "result": result})
+
+    async def register_bulk(self, request: web.Request) -> web.Response:
+        data = await request.json()
+        self.registered += len(data.get("users", []))
+        return web.json_response({"success": True, "received": len(data.get("users", []))})
+
+
+def make_update(i: int) -> dict:
+    uid = 10_000 + i
+    return {
+        "update_id": i,
+        "message": {
+            "message_id": i,
+            "date": int(time.time()),
+            "chat": {"id": uid, "type": "private"},
+            "from": {"id": uid, "is_bot": False, "first_name": f"User{i}", "username": f"user{i}"},
+            "text": "/start",
+            "entities": [{"type": "bot_command", "offset": 0, "length": 6}],
+        },
+    }
+
+
+async def send_updates(url: str, total: int, concurrency: int):
+    statuses = {}
+    queue = asyncio.Queue()
+    for i in range(1, total + 1):
+        queue.put_nowait(i)
+
+    async def worker(session):
+        while True:
+            try:
+                i = queue.get_nowait()
+            except asyncio.QueueEmpty:
+                return
+            try:
+                async with session.post(url, json=make_update(i),
+                                        headers={"X-Telegram-Bot-Api-Secret-Token": SECRET}) as r:
+                    statuses[r.status] = statuses.get(r.status, 0) + 1
+            except aiohttp.ClientError:
+                statuses["error"] = statuses.get("error", 0) + 1
+
+    t0 = time.perf_counter()
+    async with aiohttp.ClientSession(connector=aiohttp.TCPConnector(limit=concurrency)) as session:
+        await asyncio.gather(*(worker(session) for _ in range(concurrency)))
+    return time.perf_counter() - t0, statuses
+
+
+async def wait_http(url: str, timeout: float = 20.0):
+    t0 = time.perf_counter()
+    async with aiohttp.ClientSession() as s:
+        while time.perf_counter() - t0 < timeout:
+            try:
+                async with s.get(url) as r:
+                    if r.status < 500:
+                        return
+            except aiohttp.ClientError:
+                pass
+            await asyncio.sleep(0.2)
+    raise RuntimeError(f"{url} is not up")
+
+
+async def main():
+    ap = argparse.ArgumentParser(description="Webhook throughput benchmark with a fake Telegram")
+    ap.add_argument("--updates", type=int, default=2000)
+    ap.add_argument("--concurrency", type=int, default=50)
+    ap.add_argument("--fake-port", type=int, default=8790)
+    ap.add_argument("--webhook-port", type=int, default=8791)
+    ap.add_argument("--max-concurrency", type=int, default=64, help="WEBHOOK_MAX_CONCURRENCY бота")
+    ap.add_argument("--no-spawn", action="store_true", help="бот уже запущен, только слать апдейты")
+    ap.add_argument("--webhook", help="URL webhook (по умолчанию локальный бот)")
+    args = ap.parse_args()
+
+    fake = FakeTelegram()
+    runner = web.AppRunner(fake.app())
+    await runner.setup()
+    await web.TCPSite(runner, "127.0.0.1", args.fake_port).start()
+    fake_base = f"http://127.0.0.1:{args.fake_port}"
+
+    proc = None
+    url = args.webhook or f"http://127.0.0.1:{args.webhook_port}/tg/webhook"
+    if not args.no_spawn:
+        env = dict(os.environ, TELEGRAM_BOT_TOKEN=TOKEN, WEBAPP_URL=fake_base, BOT_MODE="webhook",
+                   WEBHOOK_SECRET=SECRET, WEBHOOK_PORT=str(args.webhook_port), WEBHOOK_REGISTER="0",
+                   WEBHOOK_MAX_CONCURRENCY=str(args.max_concurrency), TELEGRAM_API_SERVER=fake_base)
+        proc = subprocess.Popen([sys.executable, os.path.join(ROOT, "telegram", "bot.py")], env=env)
+        await wait_http(f"http://127.0.0.1:{args.webhook_port}/healthz")
+
+    try:
+        elapsed, statuses = await send_updates(url, args.updates, args.concurrency)
+        # даём боту доработать фоновые апдейты
+        for _ in range(100):
+            if fake.calls.get("sendMessage", 0) >= statuses.get(200, 0):
+                break
+            await asyncio.sleep(0.1)
+        replies = fake.calls.get("sendMessage", 0)
+        print(f"updates sent:      {args.updates} in {elapsed:.2f}s "
+              f"({args.updates / elapsed:,.0f} updates/s accepted), statuses={statuses}")
+        if fake.first_reply and fake.last_reply and replies > 1:
+            span = fake.last_reply - fake.first_reply
+            print(f"replies sent:      {replies} ({replies / span:,.0f} replies/s)")
+        else:
+            print(f"replies sent:      {replies}")
+        if proc is not None:
+            proc.terminate()
+            proc.wait(timeout=30)
+        print(f"users registered:  {fake.registered} (bulk endpoint)")
+    finally:
+        if proc is not None and proc.poll() is None:
+            proc.kill()
+        await runner.cleanup()
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
@@ -0,0 +1,78 @@
+"""Микробенчмарк проверки Telegram initData: проверок в секунду.
+
+    python -m benchmarks.initdata_verify [--n 20000]
+
+before — исходный алгоритм (ключ HMAC и разбор строки на каждый вызов),
+cold   — новые initData каждый раз (работает только мемоизация ключа),
+warm   — одна и та же initData, как её шлёт WebApp на каждый запрос.
+"""
+import argparse
+import hashlib
+import hmac
+import json
+import time
+import urllib.parse
+
+from app.utils import telegram_webapp as tw
+
+BOT_TOKEN = "123456:bench-token"
+
+
+def sign_init_data(user: dict, bot_token: str = BOT_TOKEN, auth_date: int = None, **extra) -> str:
+    """Подписанная строка initData, как её формирует Telegram."""
+    fields = {"auth_date": str(auth_date or int(time.time())),
+              "query_id": "AAF-bench",
+              "user": json.dumps(user, ensure_ascii=False, separators=(",", ":"))}
+    fields.update({k: str(v) for k, v in extra.items()})
+    check_string = "\n".join(f"{k}={v}" for k, v in sorted(fields.items()))
+    secret = hmac.new(b"WebAppData", bot_token.encode("utf-8"), hashlib.sha256).digest()
+    fields["hash"] = hmac.new(secret, check_string.encode("utf-8"), hashlib.sha256).hexdigest()
+    return urllib.parse.urlencode(fields)
+
+
+def verify_before(init_data: str, bot_token: str):
+    """Копия исходного _verify (до мемоизации) — точка отсчёта."""
+    data = dict(urllib.parse.parse_qsl(init_data or "", keep_blank_values=True))
+    received_hash = data.pop("hash", None)
+    if not received_hash:
+        return False, None
+    check_string = "\n".join(f"{k}={v}" for k, v in sorted(data.items()))
+    secret = hmac.new(b"WebAppData", bot_token.encode("utf-8"), hashlib.sha256).digest()
+    calc = hmac.new(secret, check_string.encode("utf-8"), hashlib.sha256).hexdigest()
+    if not hmac.compare_digest(calc, received_hash):
+        return False, None
+    auth_date = int(data.get("auth_date", "0") or "0")
+    if auth_date and (time.time() - auth_date > 86400):
+        return False, None
+    data["user"] = json.loads(data["user"])
+    return True, data
+
+
+def _rate(fn, payloads) -> float:
+    t0 = time.perf_counter()
+    for init_data in payloads:
+        ok, _ = fn(init_data, BOT_TOKEN)
+        assert ok
+    return len(payloads) / (time.perf_counter() - t0)
+
+
+def main():
+    ap = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    ap.add_argument("--n", type=int, default=20000)
+    args = ap.parse_args()
+
+    user = {"id": 1001, "first_name": "Иван", "username": "ivan", "language_code": "ru"}
+    same = [sign_init_data(user)] * args.n
+    distinct = [sign_init_data(dict(user, id=1000 + i)) for i in range(args.n)]
+
+    results = {
+        "before": _rate(verify_before, same),
+        "cold": _rate(tw.verify_webapp_init_data, distinct),
+        "warm": _rate(tw.verify_webapp_init_data, same),
+    }
+    for name, rate in results.items():
+        print(f"{name:>6}: {rate:12,.0f} verifications/s  (x{rate / results['before']:.1f})")
+
+
+if __name__ == "__main__":
+    main()
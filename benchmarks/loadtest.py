@@ -0,0 +1,204 @@
+"""Нагрузочный прогон профилей развёртывания (app/profiles.py) на локальной БД.
+
+    python -m benchmarks.loadtest --profiles sync,gthread --duration 15 --concurrency 32
+    python -m benchmarks.loadtest --db mysql+pymysql://wg:wg@127.0.0.1/wg_bench
+
+Для каждого профиля поднимается gunicorn с gunicorn.conf.py и WG_PROFILE,
+клиенты в потоках крутят смесь запросов (каталог, JSON-каталог, /me, healthz),
+в конце — p50/p99 и RPS по профилю. Без --db используется временная SQLite.
+"""
+import argparse
+import json
+import os
+import socket
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+from collections import defaultdict
+
+import requests
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+JWT_SECRET = "loadtest-secret"
+
+DEFAULT_MIX = (
+    ("/app/catalog", 4),
+    ("/app/api/catalog?limit=50", 3),
+    ("/app/me", 2),
+    ("/app/healthz", 1),
+)
+
+
+def _free_port() -> int:
+    with socket.socket() as s:
+        s.bind(("127.0.0.1", 0))
+        return s.getsockname()[1]
+
+
+def _percentile(values, pct):
+    if not values:
+        return 0.0
+    values = sorted(values)
+    k = min(len(values) - 1, max(0, int(round(pct / 100.0 * (len(values) - 1)))))
+    return values[k]
+
+
+def prepare_db(uri: str, products: int) -> str:
+    """Схема + немного данных; возвращает access JWT тестового пользователя."""
+    from app import create_app
+    from app.db import db, upgrade
+    from app.models import User, Product, Service, Category
+    from app.auth import create_tokens
+
+    app = create_app()
+    with app.app_context():
+        if not uri.startswith("sqlite"):
+            upgrade()  # SQLite создаётся через DB_AUTO_CREATE
+        user = User.query.filter_by(telegram_id=10 ** 9).first()
+        if user is None:
+            user = User(telegram_id=10 ** 9, username="loadtest", first_name="Load")
+            db.session.add(user)
+            cat = Category(name="Нагрузка", slug="loadtest")
+            db.session.add(cat)
+            db.session.flush()
+            db.session.add_all(
+                Product(name=f"Товар {i:05d}", sku=f"LT-{i:05d}", price=100 + i % 900,
+                        category_id=cat.id, description="Строительный материал")
+                for i in range(products)
+            )
+            db.session.add_all(Service(name=f"Услуга {i}", base_price=1000 + i) for i in range(20))
+            db.session.commit()
+        access, _ = create_tokens(user.id, user.role or "client")
+    return access
+
+
+def _wait_ready(base: str, proc, timeout: float = 30.0):
+    t0 = time.time()
+    while time.time() - t0 < timeout:
+        if proc.poll() is not None:
+            raise RuntimeError(f"gunicorn exited with code {proc.returncode}")
+        try:
+            if requests.get(base + "/app/healthz", timeout=1).ok:
+                return
+        except requests.RequestException:
+            time.sleep(0.2)
+    raise RuntimeError("gunicorn did not become ready")
+
+
+def run_profile(profile: str, uri: str, access: str, duration: float, concurrency: int, mix) -> dict:
+    port = _free_port()
+    env = dict(os.environ, WG_PROFILE=profile, SQLALCHEMY_DATABASE_URI=uri, JWT_SECRET=JWT_SECRET,
+               WEB_BIND=f"127.0.0.1:{port}", WEB_ACCESSLOG="", REDIS_URL=os.getenv("REDIS_URL", ""))
+    log = tempfile.TemporaryFile()
+    proc = subprocess.Popen(
+        [sys.executable, "-m", "gunicorn", "-c", "gunicorn.conf.py", "wsgi:app"],
+        cwd=ROOT, env=env, stdout=subprocess.DEVNULL, stderr=log,
+    )
+    base = f"http://127.0.0.1:{port}"
+    try:
+        try:
+            _wait_ready(base, proc)
+        except RuntimeError:
+            log.seek(0)
+            sys.stderr.write(log.read()[-4000:].decode("utf-8", "replace"))
+            raise
+        weighted = [path for path, weight in mix for _ in range(weight)]
+        latencies = defaultdict(list)
+        errors = defaultdict(int)
+        lock = threading.Lock()
+        stop_at = time.perf_counter() + duration
+
+        def client(n):
+            s = requests.Session()
+            s.headers["Cookie"] = f"wg_at={access}"
+            s.headers["Accept"] = "text/html,application/json"
+            i = n
+            while time.perf_counter() < stop_at:
+                path = weighted[i % len(weighted)]
+                i += 1
+                t0 = time.perf_counter()
+                try:
+                    ok = s.get(base + path, timeout=30).status_code < 400
+                except requests.RequestException:
+                    ok = False
+                dt = time.perf_counter() - t0
+                with lock:
+                    latencies[path].append(dt)
+                    if not ok:
+                        errors[path] += 1
+
+        started = time.perf_counter()
+        threads = [threading.Thread(target=client, args=(n,)) for n in range(concurrency)]
+        for t in threads:
+            t.start()
+        for t in threads:
+            t.join()
+        elapsed = time.perf_counter() - started
+    finally:
+        proc.terminate()
+        try:
+            proc.wait(timeout=15)
+        except subprocess.TimeoutExpired:
+            proc.kill()
+        log.close()
+
+    every = [v for vals in latencies.values() for v in vals]
+    return {
+        "profile": profile,
+        "requests": len(every),
+        "errors": sum(errors.values()),
+        "rps": len(every) / elapsed if elapsed else 0.0,
+        "p50_ms": _percentile(every, 50) * 1000,
+        "p99_ms": _percentile(every, 99) * 1000,
+        "routes": {path: {"n": len(vals), "errors": errors[path],
+                          "p50_ms": _percentile(vals, 50) * 1000,
+                          "p99_ms": _percentile(vals, 99) * 1000}
+                   for path, vals in latencies.items()},
+    }
+
+
+def main():
+    ap = argparse.ArgumentParser(description="Load test of WG_PROFILE deployment profiles")
+    ap.add_argument("--profiles", default="sync,gthread,gevent")
+    ap.add_argument("--db", help="SQLAlchemy URI (по умолчанию временная SQLite)")
+    ap.add_argument("--duration", type=float, default=15.0)
+    ap.add_argument("--concurrency", type=int, default=32)
+    ap.add_argument("--products", type=int, default=2000)
+    ap.add_argument("--json", help="сохранить результаты в файл")
+    args = ap.parse_args()
+
+    uri = args.db
+    if not uri:
+        tmpdir = tempfile.mkdtemp(prefix="wg-loadtest-")
+        uri = f"sqlite:///{os.path.join(tmpdir, 'loadtest.db')}"
+    # Config читает окружение при импорте app — выставляем до него
+    os.environ["SQLALCHEMY_DATABASE_URI"] = uri
+    os.environ["JWT_SECRET"] = JWT_SECRET
+    sys.path.insert(0, ROOT)
+    from app.profiles import load_profile, ProfileError, describe
+
+    access = prepare_db(uri, args.products)
+
+    results = []
+    for name in [p.strip() for p in args.profiles.split(",") if p.strip()]:
+        try:
+            profile = load_profile(name)
+        except ProfileError as e:
+            print(f"skip {name}: {e}")
+            continue
+        print(f"running {name}: {describe(profile)}")
+        res = run_profile(name, uri, access, args.duration, args.concurrency, DEFAULT_MIX)
+        results.append(res)
+
+    print(f"\n{'profile':<10}{'rps':>10}{'p50 ms':>10}{'p99 ms':>10}{'errors':>8}")
+    for r in results:
+        print(f"{r['profile']:<10}{r['rps']:>10.1f}{r['p50_ms']:>10.1f}{r['p99_ms']:>10.1f}{r['errors']:>8}")
+    if args.json:
+        with open(args.json, "w", encoding="utf-8") as f:
+            json.dump(results, f, ensure_ascii=False, indent=2)
+
+
+if __name__ == "__main__":
+    main()
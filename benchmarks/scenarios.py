@@ -0,0 +1,243 @@
+"""Сценарии на большом наборе данных (benchmarks/datagen.py) через test client.
+
+    python -m benchmarks.datagen --db sqlite:////tmp/wg-bench.db
+    python -m benchmarks.scenarios --db sqlite:////tmp/wg-bench.db --out baseline.json
+    python -m benchmarks.scenarios --db sqlite:////tmp/wg-bench.db --compare baseline.json
+
+create_app() в этом же процессе, без gunicorn и сети: меряется код
+приложения и SQL. Клиент — пользователь id=1 (администратор) с JWT в
+cookie; вход через Telegram — с подписанной initData случайного
+пользователя. На сценарий: прогрев, затем --n запросов; в отчёте
+p50/p90/p99 задержки, число SQL на запрос (app/querylog.py) и память:
+прирост текущего RSS за сценарий (/proc/self/statm) — он и сравнивается —
+и пиковый RSS процесса (ru_maxrss — максимум за всю жизнь процесса, после
+самого тяжёлого сценария он у всех одинаковый, поэтому только для справки).
+--compare сравнивает с сохранённым baseline и завершается с кодом 1 при
+регрессии (задержка/прирост RSS хуже на --tolerance, SQL-запросов больше).
+"""
+import argparse
+import json
+import os
+import platform
+import random
+import resource
+import subprocess
+import sys
+import time
+
+from benchmarks.datagen import BENCH_ADMIN_TG, BENCH_TG_BASE, ROOT, prepare
+from benchmarks.loadtest import _percentile
+
+JWT_SECRET = "bench-secret"
+BOT_TOKEN = "123456:bench-token"
+LATENCY_NOISE_MS = 1.0  # разница меньше — шум, не регрессия
+RSS_NOISE_MB = 2.0
+
+
+def _rss_peak_mb() -> float:
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    return peak / (1024 * 1024) if sys.platform == "darwin" else peak / 1024  # macOS — байты, Linux — КБ
+
+
+def _rss_mb():
+    """Текущий RSS процесса или None, если /proc недоступен (не Linux)."""
+    try:
+        with open("/proc/self/statm") as f:
+            pages = int(f.read().split()[1])
+    except (OSError, ValueError, IndexError):
+        return None
+    return pages * os.sysconf("SC_PAGE_SIZE") / (1024 * 1024)
+
+
+def build_scenarios(users: int, products: list, services: int):
+    """[(имя, функция(client, rnd) → response)]."""
+    from benchmarks.initdata_verify import sign_init_data  # импортирует app — только после prepare()
+
+    def catalog(c, rnd):
+        return c.get("/app/catalog", headers={"Accept": "text/html"})
+
+    def api_catalog(c, rnd):
+        return c.get("/app/api/catalog?limit=50")
+
+    def api_search(c, rnd):
+        return c.get("/app/api/search?q=" + rnd.choice(("кирпич", "цемент", "доска", "кабель")))
+
+    def orders(c, rnd):
+        return c.get("/app/orders", headers={"Accept": "text/html"})
+
+    def create_order(c, rnd):
+        items = [{"type": "product", "id": rnd.choice(products), "qty": rnd.randint(1, 5)}
+                 for _ in range(3)]
+        items.append({"type": "service", "id": rnd.randint(1, services), "qty": 1})
+        return c.post("/app/order", json={"items": items, "comment": "bench"})
+
+    def api_telegram_auth(c, rnd):
+        uid = rnd.randint(1, users)
+        # вход по initData одноразовый — у каждого запроса свой query_id
+        init_data = sign_init_data({"id": BENCH_TG_BASE + uid, "first_name": f"Клиент{uid}",
+                                    "username": f"bench{uid}"}, bot_token=BOT_TOKEN,
+                                   query_id=f"bench-{time.time_ns()}")
+        return c.post("/app/api/telegram/auth", json={"initData": init_data})
+
+    admin = {"X-Telegram-Admin": str(BENCH_ADMIN_TG)}
+
+    def admin_orders(c, rnd):
+        return c.get("/admin/order/", headers=admin)
+
+    def admin_orders_filtered(c, rnd):
+        return c.get("/admin/order/?flt0_status_equals=new", headers=admin)
+
+    def admin_reviews(c, rnd):
+        return c.get("/admin/review/?flt0_is_moderated_equals=0", headers=admin)
+
+    def admin_products(c, rnd):
+        return c.get("/admin/product/", headers=admin)
+
+    return [(fn.__name__, fn) for fn in (
+        catalog, api_catalog, api_search, orders, create_order, api_telegram_auth,
+        admin_orders, admin_orders_filtered, admin_reviews, admin_products,
+    )]
+
+
+def run(app, names, n: int, warmup: int, seed: int) -> dict:
+    from sqlalchemy import func
+    from app.auth import create_tokens
+    from app.db import db
+    from app.models import Product, Service, User
+    from app.querylog import QueryRecorder
+
+    with app.app_context():
+        users = db.session.query(func.max(User.id)).scalar() or 0
+        products = [pid for pid, in db.session.query(Product.id).filter(Product.is_active.is_(True))]
+        services = db.session.query(func.max(Service.id)).scalar() or 0
+        access, _ = create_tokens(1, "admin")
+    if not (users and products and services):
+        raise SystemExit("empty database: run python -m benchmarks.datagen first")
+
+    results = {}
+    for name, fn in build_scenarios(users, products, services):
+        if names and name not in names:
+            continue
+        rnd = random.Random(seed)
+        rss_before = _rss_mb()
+        client = app.test_client()
+        client.set_cookie("wg_at", access)
+        for _ in range(warmup):
+            fn(client, rnd)
+        latencies, queries, errors = [], [], 0
+        for _ in range(n):
+            with QueryRecorder() as rec:
+                t0 = time.perf_counter()
+                resp = fn(client, rnd)
+                latencies.append(time.perf_counter() - t0)
+            queries.append(rec.count)
+            errors += resp.status_code >= 400
+        results[name] = {
+            "n": n, "errors": errors,
+            "p50_ms": _percentile(latencies, 50) * 1000,
+            "p90_ms": _percentile(latencies, 90) * 1000,
+            "p99_ms": _percentile(latencies, 99) * 1000,
+            "max_ms": max(latencies) * 1000,
+            "queries_p50": _percentile(queries, 50),
+            "queries_max": max(queries),
+            "rss_mb": None, "rss_delta_mb": None,
+            "rss_peak_mb": round(_rss_peak_mb(), 1),
+        }
+        r = results[name]
+        rss_after = _rss_mb()
+        if rss_before is not None and rss_after is not None:
+            r.update(rss_mb=round(rss_after, 1), rss_delta_mb=round(rss_after - rss_before, 1))
+        delta = "-" if r["rss_delta_mb"] is None else f"{r['rss_delta_mb']:+.1f}"
+        print(f"{name:<24}{r['p50_ms']:>9.1f}{r['p90_ms']:>9.1f}{r['p99_ms']:>9.1f}"
+              f"{r['queries_p50']:>7}{r['queries_max']:>7}{delta:>9}{r['rss_peak_mb']:>9.1f}{errors:>7}")
+    return results
+
+
+def _meta(app) -> dict:
+    from sqlalchemy import func
+    from app.db import db
+    from app.models import Order, OrderItem, Product, Review, User
+
+    with app.app_context():
+        rows = {m.__tablename__: db.session.query(func.count()).select_from(m).scalar()
+                for m in (Product, User, Order, OrderItem, Review)}
+        dialect = db.engine.dialect.name
+    try:
+        rev = subprocess.run(["git", "rev-parse", "--short", "HEAD"], cwd=ROOT,
+                             capture_output=True, text=True).stdout.strip()
+    except OSError:
+        rev = ""
+    return {"git": rev, "dialect": dialect, "rows": rows, "python": platform.python_version(),
+            "time": time.strftime("%Y-%m-%dT%H:%M:%S")}
+
+
+def compare(current: dict, baseline: dict, tolerance: float) -> list:
+    """Список регрессий сценариев относительно baseline."""
+    problems = []
+    for name, cur in current.items():
+        base = baseline.get(name)
+        if not base:
+            continue
+        for key in ("p50_ms", "p90_ms"):
+            if cur[key] > base[key] * (1 + tolerance) and cur[key] - base[key] > LATENCY_NOISE_MS:
+                problems.append(f"{name}: {key} {base[key]:.1f} → {cur[key]:.1f}")
+        if cur["queries_max"] > base["queries_max"]:
+            problems.append(f"{name}: queries_max {base['queries_max']} → {cur['queries_max']}")
+        # пиковый RSS не сравниваем: он общий для процесса, а не для сценария
+        cur_rss, base_rss = cur.get("rss_delta_mb"), base.get("rss_delta_mb")
+        if (cur_rss is not None and base_rss is not None and cur_rss - base_rss > RSS_NOISE_MB
+                and cur_rss > max(base_rss, 0) * (1 + tolerance)):
+            problems.append(f"{name}: rss_delta_mb {base_rss} → {cur_rss}")
+        if cur["errors"] > base["errors"]:
+            problems.append(f"{name}: errors {base['errors']} → {cur['errors']}")
+    return problems
+
+
+def main():
+    ap = argparse.ArgumentParser(description="Benchmark scenarios against a generated dataset")
+    ap.add_argument("--db", required=True, help="SQLAlchemy URI базы из benchmarks.datagen")
+    ap.add_argument("--scenarios", default="", help="через запятую (по умолчанию все)")
+    ap.add_argument("--n", type=int, default=200, help="запросов на сценарий")
+    ap.add_argument("--warmup", type=int, default=20)
+    ap.add_argument("--seed", type=int, default=1)
+    ap.add_argument("--out", help="сохранить результаты (baseline) в JSON")
+    ap.add_argument("--compare", help="baseline JSON для сравнения")
+    ap.add_argument("--tolerance", type=float, default=0.25, help="допустимое ухудшение, доля")
+    args = ap.parse_args()
+
+    # Config читает окружение при импорте app — выставляем до него
+    os.environ["JWT_SECRET"] = JWT_SECRET
+    os.environ["TELEGRAM_BOT_TOKEN"] = BOT_TOKEN
+    os.environ["TELEGRAM_ADMIN_ID"] = str(BENCH_ADMIN_TG)
+    os.environ["SLOW_QUERY_MS"] = "0"
+    prepare(args.db)
+    from app import create_app
+
+    app = create_app()
+    names = {s.strip() for s in args.scenarios.split(",") if s.strip()}
+
+    print(f"{'scenario':<24}{'p50 ms':>9}{'p90 ms':>9}{'p99 ms':>9}{'q p50':>7}{'q max':>7}{'ΔRSS MB':>9}{'peak MB':>9}{'errs':>7}")
+    meta = _meta(app)  # до прогона: create_order добавляет заказы
+    results = run(app, names, args.n, args.warmup, args.seed)
+    report = {"meta": meta, "scenarios": results}
+    if args.out:
+        with open(args.out, "w", encoding="utf-8") as f:
+            json.dump(report, f, ensure_ascii=False, indent=2)
+    if args.compare:
+        with open(args.compare, encoding="utf-8") as f:
+            baseline = json.load(f)
+        # заказы растут от create_order — сверяем только то, что пишет datagen
+        same = ("products", "users", "reviews")
+        base_rows = baseline.get("meta", {}).get("rows", {})
+        if any(base_rows.get(k) != meta["rows"][k] for k in same):
+            print("warning: baseline was recorded on a different dataset")
+        problems = compare(results, baseline.get("scenarios", {}), args.tolerance)
+        for p in problems:
+            print("REGRESSION", p)
+        if problems:
+            sys.exit(1)
+        print("no regressions")
+
+
+if __name__ == "__main__":
+    main()
@@ -1,6 +1,44 @@
-bind = "127.0.0.1:8000"
-workers = 3
-worker_class = "sync"
-timeout = 120
-accesslog = "-"
+import os
+
+# метрики Prometheus из всех воркеров (app/metrics.py): общий каталог для файлов значений.
+# До любого импорта app: prometheus_client выбирает хранилище значений при импорте,
+# а app.profiles тянет за собой весь пакет app (и app.metrics).
+if not os.getenv("PROMETHEUS_MULTIPROC_DIR"):
+    os.environ["PROMETHEUS_MULTIPROC_DIR"] = os.path.join(os.getenv("TMPDIR", "/tmp"), f"wg-prometheus-{os.getpid()}")
+os.makedirs(os.environ["PROMETHEUS_MULTIPROC_DIR"], exist_ok=True)  # метрики создаются уже при импорте
+
+from app.profiles import load_profile  # noqa: E402
+
+# WG_PROFILE=sync|gthread|gevent — воркеры, потоки и пул БД одним набором (app/profiles.py)
+_profile = load_profile()
+
+bind = os.getenv("WEB_BIND", "127.0.0.1:8000")
+workers = _profile.workers
+worker_class = _profile.worker_class
+threads = _profile.threads
+if _profile.worker_connections:
+    worker_connections = _profile.worker_connections
+timeout = _profile.timeout
+graceful_timeout = _profile.graceful_timeout
+keepalive = _profile.keepalive
+accesslog = os.getenv("WEB_ACCESSLOG", "-") or None
 errorlog = "-"
+
+
+def on_starting(server):
+    path = os.getenv("PROMETHEUS_MULTIPROC_DIR")
+    if path:
+        # значения прошлого запуска не должны попасть в суммы; удаляем только
+        # файлы prometheus_client — каталог может оказаться общим (/tmp, том)
+        from glob import glob
+        for name in glob(os.path.join(path, "*.db")):
+            try:
+                os.remove(name)
+            except FileNotFoundError:
+                pass
+
+
+def child_exit(server, worker):
+    if os.getenv("PROMETHEUS_MULTIPROC_DIR"):
+        from prometheus_client import multiprocess
+        multiprocess.mark_process_dead(worker.pid)
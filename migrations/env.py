@@ -0,0 +1,61 @@
+"""Alembic-окружение: метаданные и движок берутся из Flask-приложения.
+
+Запускается из `flask db ...` (app/cli.py) внутри app context, поэтому
+строка подключения и пул — те же, что у приложения (Config/WG_PROFILE).
+"""
+import logging
+from alembic import context
+from flask import current_app
+
+from app.db import db
+from app import models  # noqa: F401  — регистрирует таблицы в db.metadata
+
+log = logging.getLogger("alembic.env")
+
+config = context.config
+target_metadata = db.metadata
+
+
+def _include_object(dialect_name: str):
+    def include_object(obj, name, type_, reflected, compare_to):
+        # FTS5-таблицы поиска (app/search.py) создаются вне миграций
+        if type_ == "table" and reflected and compare_to is None and "_fts" in name:
+            return False
+        # FULLTEXT-индексы есть только в MySQL (ddl_if в models.py)
+        if type_ == "index" and not reflected and dialect_name != "mysql" \
+                and obj.dialect_options["mysql"].get("prefix") == "FULLTEXT":
+            return False
+        return True
+    return include_object
+
+
+def _options(dialect_name: str) -> dict:
+    return dict(
+        target_metadata=target_metadata,
+        compare_type=True,
+        include_object=_include_object(dialect_name),
+        # SQLite не умеет ALTER большинства вещей — пересоздание таблицы
+        render_as_batch=dialect_name == "sqlite",
+    )
+
+
+def run_migrations_offline():
+    url = db.engine.url
+    context.configure(url=url.render_as_string(hide_password=False), literal_binds=True,
+                      **_options(url.get_backend_name()))
+    with context.begin_transaction():
+        context.run_migrations()
+
+
+def run_migrations_online():
+    with db.engine.connect() as connection:
+        context.configure(connection=connection, **_options(connection.dialect.name))
+        with context.begin_transaction():
+            context.run_migrations()
+
+
+log.info("migrating %s", current_app.config.get("SQLALCHEMY_DATABASE_URI", "").split("@")[-1])
+if context.is_offline_mode():
+    run_migrations_offline()
+else:
+    run_migrations_online()
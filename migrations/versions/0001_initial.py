@@ -0,0 +1,124 @@
+"""initial schema (как создавал db.create_all до миграций)
+
+Существующую базу, созданную через create_all, не пересоздаём:
+`flask db stamp 0001_initial`, затем `flask db upgrade`.
+
+Revision ID: 0001_initial
+Revises:
+Create Date: 2026-10-18
+"""
+from alembic import op
+import sqlalchemy as sa
+
+revision = "0001_initial"
+down_revision = None
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    op.create_table(
+        "users",
+        sa.Column("id", sa.Integer(), primary_key=True),
+        sa.Column("telegram_id", sa.BigInteger(), nullable=False),
+        sa.Column("username", sa.String(64)),
+        sa.Column("first_name", sa.String(64)),
+        sa.Column("last_name", sa.String(64)),
+        sa.Column("role", sa.String(16)),
+        sa.Column("phone", sa.String(32)),
+        sa.Column("email", sa.String(120)),
+        sa.Column("delivery_address", sa.Text()),
+        sa.Column("created_at", sa.DateTime()),
+    )
+    op.create_index("ix_users_telegram_id", "users", ["telegram_id"], unique=True)
+
+    op.create_table(
+        "categories",
+        sa.Column("id", sa.Integer(), primary_key=True),
+        sa.Column("name", sa.String(255), nullable=False),
+        sa.Column("slug", sa.String(255), unique=True),
+        sa.Column("parent_id", sa.Integer(), sa.ForeignKey("categories.id"), nullable=True),
+    )
+
+    op.create_table(
+        "products",
+        sa.Column("id", sa.Integer(), primary_key=True),
+        sa.Column("category_id", sa.Integer(), sa.ForeignKey("categories.id")),
+        sa.Column("name", sa.String(255), nullable=False),
+        sa.Column("sku", sa.String(64), unique=True),
+        sa.Column("unit", sa.String(16)),
+        sa.Column("description", sa.Text()),
+        sa.Column("price", sa.Numeric(12, 2), nullable=False),
+        sa.Column("is_active", sa.Boolean()),
+        sa.Column("images_json", sa.Text()),
+        sa.Column("created_at", sa.DateTime()),
+        sa.Column("updated_at", sa.DateTime()),
+    )
+    op.create_index("ix_products_category_id", "products", ["category_id"])
+
+    op.create_table(
+        "services",
+        sa.Column("id", sa.Integer(), primary_key=True),
+        sa.Column("name", sa.String(255), nullable=False),
+        sa.Column("description", sa.Text()),
+        sa.Column("base_price", sa.Numeric(12, 2), nullable=False),
+        sa.Column("is_active", sa.Boolean()),
+    )
+
+    op.create_table(
+        "orders",
+        sa.Column("id", sa.Integer(), primary_key=True),
+        sa.Column("user_id", sa.Integer(), sa.ForeignKey("users.id")),
+        sa.Column("status", sa.String(16)),
+        sa.Column("total", sa.Numeric(12, 2)),
+        sa.Column("delivery_price", sa.Numeric(12, 2)),
+        sa.Column("payment_status", sa.String(16)),
+        sa.Column("comment", sa.Text()),
+        sa.Column("created_at", sa.DateTime()),
+        sa.Column("updated_at", sa.DateTime()),
+    )
+    op.create_index("ix_orders_user_id", "orders", ["user_id"])
+
+    op.create_table(
+        "order_items",
+        sa.Column("id", sa.Integer(), primary_key=True),
+        sa.Column("order_id", sa.Integer(), sa.ForeignKey("orders.id")),
+        sa.Column("item_type", sa.String(16)),
+        sa.Column("item_id", sa.Integer()),
+        sa.Column("qty", sa.Numeric(12, 3)),
+        sa.Column("unit_price", sa.Numeric(12, 2)),
+        sa.Column("total", sa.Numeric(12, 2)),
+    )
+    op.create_index("ix_order_items_order_id", "order_items", ["order_id"])
+
+    op.create_table(
+        "reviews",
+        sa.Column("id", sa.Integer(), primary_key=True),
+        sa.Column("user_id", sa.Integer(), sa.ForeignKey("users.id")),
+        sa.Column("target_type", sa.String(16)),
+        sa.Column("target_id", sa.Integer()),
+        sa.Column("rating", sa.Integer()),
+        sa.Column("text", sa.Text()),
+        sa.Column("is_moderated", sa.Boolean()),
+        sa.Column("created_at", sa.DateTime()),
+    )
+    op.create_index("ix_reviews_user_id", "reviews", ["user_id"])
+
+    op.create_table(
+        "feedback",
+        sa.Column("id", sa.Integer(), primary_key=True),
+        sa.Column("user_id", sa.Integer(), sa.ForeignKey("users.id"), nullable=True),
+        sa.Column("name", sa.String(128)),
+        sa.Column("phone", sa.String(32)),
+        sa.Column("email", sa.String(120)),
+        sa.Column("subject", sa.String(255)),
+        sa.Column("message", sa.Text()),
+        sa.Column("status", sa.String(16)),
+        sa.Column("created_at", sa.DateTime()),
+    )
+
+
+def downgrade():
+    for table in ("feedback", "reviews", "order_items", "orders", "services",
+                  "products", "categories", "users"):
+        op.drop_table(table)
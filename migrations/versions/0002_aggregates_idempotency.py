@@ -0,0 +1,50 @@
+"""review_aggregates и order_requests
+
+После upgrade заполнить агрегаты: `flask reviews rebuild-aggregates`.
+Таблицы, уже созданные через create_all, пропускаются.
+
+Revision ID: 0002_aggregates_idempotency
+Revises: 0001_initial
+Create Date: 2026-10-18
+"""
+from alembic import context, op
+import sqlalchemy as sa
+
+revision = "0002_aggregates_idempotency"
+down_revision = "0001_initial"
+branch_labels = None
+depends_on = None
+
+
+def _has_table(name: str) -> bool:
+    if context.is_offline_mode():  # --sql: базы нет, генерируем всё
+        return False
+    return sa.inspect(op.get_bind()).has_table(name)
+
+
+def upgrade():
+    if not _has_table("review_aggregates"):
+        op.create_table(
+            "review_aggregates",
+            sa.Column("target_type", sa.String(16), primary_key=True),
+            sa.Column("target_id", sa.Integer(), primary_key=True),
+            sa.Column("review_count", sa.Integer(), nullable=False, server_default="0"),
+            sa.Column("rating_sum", sa.Integer(), nullable=False, server_default="0"),
+            sa.Column("recent_ids", sa.Text()),
+            sa.Column("updated_at", sa.DateTime()),
+        )
+    if not _has_table("order_requests"):
+        op.create_table(
+            "order_requests",
+            sa.Column("id", sa.Integer(), primary_key=True),
+            sa.Column("user_id", sa.Integer(), sa.ForeignKey("users.id"), nullable=False),
+            sa.Column("key", sa.String(64), nullable=False),
+            sa.Column("order_id", sa.Integer(), sa.ForeignKey("orders.id"), nullable=False),
+            sa.Column("created_at", sa.DateTime()),
+            sa.UniqueConstraint("user_id", "key", name="uq_order_requests_user_key"),
+        )
+
+
+def downgrade():
+    op.drop_table("order_requests")
+    op.drop_table("review_aggregates")
@@ -0,0 +1,65 @@
+"""индексы под горячие запросы
+
+products  — keyset-пагинация каталога, FULLTEXT-поиск (MySQL);
+orders    — история заказов пользователя, списки админки;
+order_items — позиции по товару/услуге;
+reviews, feedback — карточки и очереди модерации в админке.
+
+На MySQL 8 InnoDB строит вторичные индексы online (ALGORITHM=INPLACE,
+LOCK=NONE), но на больших таблицах миграцию лучше гонять вне пика.
+Индексы, уже созданные через create_all, пропускаются.
+
+Revision ID: 0003_perf_indexes
+Revises: 0002_aggregates_idempotency
+Create Date: 2026-10-18
+"""
+from alembic import context, op
+import sqlalchemy as sa
+
+revision = "0003_perf_indexes"
+down_revision = "0002_aggregates_idempotency"
+branch_labels = None
+depends_on = None
+
+INDEXES = (
+    ("ix_products_active_name", "products", ["is_active", "name", "id"]),
+    ("ix_products_category_active_name", "products", ["category_id", "is_active", "name", "id"]),
+    ("ix_orders_user_created", "orders", ["user_id", "created_at", "id"]),
+    ("ix_orders_status_created", "orders", ["status", "created_at"]),
+    ("ix_orders_created", "orders", ["created_at"]),
+    ("ix_order_items_item", "order_items", ["item_type", "item_id"]),
+    ("ix_reviews_target_moderated", "reviews", ["target_type", "target_id", "is_moderated", "created_at"]),
+    ("ix_reviews_moderated_created", "reviews", ["is_moderated", "created_at"]),
+    ("ix_reviews_created", "reviews", ["created_at"]),
+    ("ix_feedback_status_created", "feedback", ["status", "created_at"]),
+    ("ix_feedback_created", "feedback", ["created_at"]),
+)
+
+FULLTEXT = (
+    ("ft_products_search", "products", ["name", "sku", "description"]),
+    ("ft_services_search", "services", ["name", "description"]),
+)
+
+
+def _existing(table: str) -> set:
+    if context.is_offline_mode():  # --sql: базы нет, генерируем всё
+        return set()
+    return {ix["name"] for ix in sa.inspect(op.get_bind()).get_indexes(table)}
+
+
+def upgrade():
+    for name, table, cols in INDEXES:
+        if name not in _existing(table):
+            op.create_index(name, table, cols)
+    if op.get_bind().dialect.name == "mysql":
+        for name, table, cols in FULLTEXT:
+            if name not in _existing(table):
+                op.create_index(name, table, cols, mysql_prefix="FULLTEXT")
+
+
+def downgrade():
+    if op.get_bind().dialect.name == "mysql":
+        for name, table, _ in FULLTEXT:
+            op.drop_index(name, table_name=table)
+    for name, table, _ in reversed(INDEXES):
+        op.drop_index(name, table_name=table)
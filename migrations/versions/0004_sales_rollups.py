@@ -0,0 +1,65 @@
+"""витрины продаж: sales_daily, sales_daily_items, rollup_watermarks
+
++ индекс orders.updated_at для инкрементального пересчёта.
+После upgrade заполнить витрины: `flask analytics refresh --full`.
+Таблицы и индексы, уже созданные через create_all, пропускаются.
+
+Revision ID: 0004_sales_rollups
+Revises: 0003_perf_indexes
+Create Date: 2026-10-18
+"""
+from alembic import context, op
+import sqlalchemy as sa
+
+revision = "0004_sales_rollups"
+down_revision = "0003_perf_indexes"
+branch_labels = None
+depends_on = None
+
+
+def _inspector():
+    if context.is_offline_mode():  # --sql: базы нет, генерируем всё
+        return None
+    return sa.inspect(op.get_bind())
+
+
+def upgrade():
+    insp = _inspector()
+    if insp is None or not insp.has_table("sales_daily"):
+        op.create_table(
+            "sales_daily",
+            sa.Column("day", sa.Date(), primary_key=True),
+            sa.Column("status", sa.String(16), primary_key=True),
+            sa.Column("orders", sa.Integer(), nullable=False, server_default="0"),
+            sa.Column("items", sa.Integer(), nullable=False, server_default="0"),
+            sa.Column("revenue", sa.Numeric(14, 2), nullable=False, server_default="0"),
+        )
+    if insp is None or not insp.has_table("sales_daily_items"):
+        op.create_table(
+            "sales_daily_items",
+            sa.Column("day", sa.Date(), primary_key=True),
+            sa.Column("status", sa.String(16), primary_key=True),
+            sa.Column("item_type", sa.String(16), primary_key=True),
+            sa.Column("item_id", sa.Integer(), primary_key=True),
+            sa.Column("orders", sa.Integer(), nullable=False, server_default="0"),
+            sa.Column("qty", sa.Numeric(14, 3), nullable=False, server_default="0"),
+            sa.Column("revenue", sa.Numeric(14, 2), nullable=False, server_default="0"),
+        )
+        op.create_index("ix_sales_daily_items_type_day", "sales_daily_items", ["item_type", "day"])
+    if insp is None or not insp.has_table("rollup_watermarks"):
+        op.create_table(
+            "rollup_watermarks",
+            sa.Column("name", sa.String(32), primary_key=True),
+            sa.Column("watermark", sa.DateTime()),
+            sa.Column("refreshed_at", sa.DateTime()),
+        )
+    if insp is None or "ix_orders_updated" not in {ix["name"] for ix in insp.get_indexes("orders")}:
+        op.create_index("ix_orders_updated", "orders", ["updated_at"])
+
+
+def downgrade():
+    op.drop_index("ix_orders_updated", table_name="orders")
+    op.drop_table("rollup_watermarks")
+    op.drop_index("ix_sales_daily_items_type_day", table_name="sales_daily_items")
+    op.drop_table("sales_daily_items")
+    op.drop_table("sales_daily")
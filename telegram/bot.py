@@ -1,19 +1,48 @@
 import os
 import asyncio
 import logging
-import aiohttp
 from aiogram import Bot, Dispatcher
 from aiogram.client.default import DefaultBotProperties
+from aiogram.client.session.aiohttp import AiohttpSession
+from aiogram.client.telegram import TelegramAPIServer
 from aiogram.filters import CommandStart, Command
 from aiogram.types import (
     Message, WebAppInfo,
     InlineKeyboardMarkup, InlineKeyboardButton,
     KeyboardButton, ReplyKeyboardMarkup
 )
+from registration import RegistrationQueue
+from notifications import NotificationWorker
+from webhook import run_webhook
 
 BOT_TOKEN = os.getenv("TELEGRAM_BOT_TOKEN")
 WEBAPP_URL = os.getenv("WEBAPP_URL")
 ADMIN_ID = int(os.getenv("TELEGRAM_ADMIN_ID", "0") or 0)
+BOT_API_SECRET = os.getenv("BOT_API_SECRET")
+REGISTER_BATCH_SIZE = int(os.getenv("REGISTER_BATCH_SIZE", "200"))
+REGISTER_FLUSH_INTERVAL = float(os.getenv("REGISTER_FLUSH_INTERVAL", "1.0"))
+REGISTER_QUEUE_MAX = int(os.getenv("REGISTER_QUEUE_MAX", "10000"))
+# уведомления о заказах из Redis stream (app/notifications.py)
+REDIS_URL = os.getenv("REDIS_URL")
+NOTIFY_ENABLED = os.getenv("NOTIFY_ENABLED", "1") == "1"
+NOTIFY_STREAM = os.getenv("NOTIFY_STREAM", "wg:notify:orders")
+NOTIFY_GLOBAL_RATE = float(os.getenv("NOTIFY_GLOBAL_RATE", "25"))   # сообщений/с на бота (лимит ~30)
+NOTIFY_CHAT_RATE = float(os.getenv("NOTIFY_CHAT_RATE", "1"))        # сообщений/с в один чат
+NOTIFY_CONSUMER = os.getenv("NOTIFY_CONSUMER")                      # постоянное имя в группе (иначе hostname-pid)
+NOTIFY_CLAIM_IDLE = float(os.getenv("NOTIFY_CLAIM_IDLE", "300"))    # сек: чужие неподтверждённые записи — забрать
+
+# polling | webhook
+BOT_MODE = os.getenv("BOT_MODE", "polling")
+WEBHOOK_URL = os.getenv("WEBHOOK_URL")            # публичный https-адрес, куда шлёт Telegram
+WEBHOOK_PATH = os.getenv("WEBHOOK_PATH", "/tg/webhook")
+WEBHOOK_SECRET = os.getenv("WEBHOOK_SECRET")
+WEBHOOK_HOST = os.getenv("WEBHOOK_HOST", "127.0.0.1")
+WEBHOOK_PORT = int(os.getenv("WEBHOOK_PORT", "8081"))
+WEBHOOK_REGISTER = os.getenv("WEBHOOK_REGISTER", "1") == "1"
+WEBHOOK_MAX_CONCURRENCY = int(os.getenv("WEBHOOK_MAX_CONCURRENCY", "64"))
+WEBHOOK_DRAIN_TIMEOUT = float(os.getenv("WEBHOOK_DRAIN_TIMEOUT", "25"))
+# свой Bot API сервер (локальный telegram-bot-api или фейк для бенчмарка)
+TELEGRAM_API_SERVER = os.getenv("TELEGRAM_API_SERVER")
 
 logging.basicConfig(level=logging.INFO, format="%(levelname)s: %(message)s")
 log = logging.getLogger("winstgrad.bot")
@@ -22,41 +51,37 @@ def _require_env():
     missing = []
     if not BOT_TOKEN:   missing.append("TELEGRAM_BOT_TOKEN")
     if not WEBAPP_URL:  missing.append("WEBAPP_URL")
+    if BOT_MODE == "webhook" and not WEBHOOK_SECRET:
+        missing.append("WEBHOOK_SECRET")
+    if BOT_MODE not in ("polling", "webhook"):
+        raise SystemExit(f"unknown BOT_MODE: {BOT_MODE}")
     if missing:
         raise SystemExit(f"env missing: {', '.join(missing)}")
 
-async def register_user(user):
-    """Регистрируем пользователя в веб-приложении (молча, без падений)."""
-    if not WEBAPP_URL:
-        return
-    payload = {
-        "telegram_id": user.id,
-        "username": user.username,
-        "first_name": user.first_name,
-        "last_name": user.last_name,
-        "language_code": getattr(user, "language_code", None),
-        "is_premium": getattr(user, "is_premium", False),
-    }
-    try:
-        async with aiohttp.ClientSession() as s:
-            async with s.post(f"{WEBAPP_URL}/app/api/telegram/register",
-                              json=payload, timeout=10) as r:
-                # бывают HTML-ответы, читаем аккуратно
-                try:
-                    j = await r.json(content_type=None)
-                    if not j.get("success"):
-                        log.warning("register failed: %s", j)
-                except Exception:
-                    txt = (await r.text())[:300].replace("\n", " ")
-                    log.warning("register non-json [%s]: %s", r.status, txt)
-    except Exception as e:
-        log.error("register error: %s", e)
-
 async def main():
     _require_env()
-    bot = Bot(token=BOT_TOKEN, default=DefaultBotProperties(parse_mode="HTML"))
+    session = AiohttpSession(api=TelegramAPIServer.from_base(TELEGRAM_API_SERVER)) if TELEGRAM_API_SERVER else None
+    bot = Bot(token=BOT_TOKEN, session=session, default=DefaultBotProperties(parse_mode="HTML"))
     dp = Dispatcher()
 
+    # регистрации копятся в очереди и уходят пачками через одну сессию
+    registrations = RegistrationQueue(
+        WEBAPP_URL, secret=BOT_API_SECRET, batch_size=REGISTER_BATCH_SIZE,
+        flush_interval=REGISTER_FLUSH_INTERVAL, max_queue=REGISTER_QUEUE_MAX,
+    )
+    dp.startup.register(registrations.start)
+    dp.shutdown.register(registrations.close)
+
+    # несколько экземпляров бота делят stream через группу потребителей
+    if REDIS_URL and NOTIFY_ENABLED:
+        notifier = NotificationWorker(
+            bot, REDIS_URL, stream=NOTIFY_STREAM,
+            global_rate=NOTIFY_GLOBAL_RATE, per_chat_rate=NOTIFY_CHAT_RATE,
+            consumer=NOTIFY_CONSUMER, claim_idle=NOTIFY_CLAIM_IDLE,
+        )
+        dp.startup.register(notifier.start)
+        dp.shutdown.register(notifier.close)
+
     # команды в меню
     try:
         await bot.set_my_commands([
@@ -77,7 +102,7 @@ async def main():
                 "https://t.me/WinstGradBot?start=app"
             )
             return
-        await register_user(m.from_user)
+        registrations.enqueue(m.from_user)
         kb = ReplyKeyboardMarkup(
             keyboard=[[KeyboardButton(
                 text="🏗️ Открыть приложение",
@@ -127,7 +152,16 @@ async def main():
     async def my_id(m: Message):
         await m.answer(f"Ваш Telegram ID: <code>{m.from_user.id}</code>")
 
-    await dp.start_polling(bot)
+    if BOT_MODE == "webhook":
+        await run_webhook(
+            bot, dp, host=WEBHOOK_HOST, port=WEBHOOK_PORT, path=WEBHOOK_PATH,
+            secret=WEBHOOK_SECRET, public_url=WEBHOOK_URL, register=WEBHOOK_REGISTER,
+            max_concurrency=WEBHOOK_MAX_CONCURRENCY, drain_timeout=WEBHOOK_DRAIN_TIMEOUT,
+        )
+    else:
+        # getUpdates не работает, пока установлен webhook
+        await bot.delete_webhook()
+        await dp.start_polling(bot)
 
 if __name__ == "__main__":
     asyncio.run(main())
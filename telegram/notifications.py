@@ -0,0 +1,235 @@
+"""Исходящие уведомления о заказах: Redis stream → Telegram с учётом лимитов.
+
+Веб-приложение (app/notifications.py) кладёт смены статуса заказа в stream.
+Здесь воркер читает его группой потребителей (несколько экземпляров бота
+делят поток), схлопывает несколько событий одного заказа в одно сообщение
+и отправляет через два token bucket: общий (~30 сообщений/с на бота) и
+на чат (~1 сообщение/с). Сообщения одного чата уходят по очереди одной
+задачей, слот параллельности берётся только на саму отправку — чат с
+десятком заказов не занимает слоты остальных. На 429 ждёт retry_after и
+повторяет, весь поток при этом тоже притормаживает.
+
+Запись подтверждается (XACK) после отправки или окончательной ошибки.
+Имя потребителя — NOTIFY_CONSUMER (по умолчанию hostname-pid): после
+перезапуска с тем же именем воркер сначала дочитывает свои
+неподтверждённые записи. Чужие — упавшего экземпляра или старого pid —
+забирает XAUTOCLAIM, если они висят дольше claim_idle; запись, которую
+доставляли больше max_deliveries раз, подтверждается без отправки.
+"""
+import asyncio
+import logging
+import os
+import socket
+import time
+from typing import Dict, Optional
+
+from aiogram import Bot
+from aiogram.exceptions import TelegramRetryAfter, TelegramForbiddenError, TelegramBadRequest
+
+log = logging.getLogger("winstgrad.bot.notifications")
+
+STATUS_LABELS = {
+    "new": "Новый",
+    "processing": "В работе",
+    "approved": "Подтверждён",
+    "done": "Выполнен",
+    "cancelled": "Отменён",
+}
+
+
+class TokenBucket:
+    def __init__(self, rate: float, capacity: float):
+        self.rate = rate
+        self.capacity = capacity
+        self.tokens = capacity
+        self.updated = time.monotonic()
+        self.paused_until = 0.0
+        self._lock = asyncio.Lock()
+
+    def _refill(self, now: float):
+        self.tokens = min(self.capacity, self.tokens + (now - self.updated) * self.rate)
+        self.updated = now
+
+    async def acquire(self):
+        async with self._lock:
+            while True:
+                now = time.monotonic()
+                if now < self.paused_until:
+                    await asyncio.sleep(self.paused_until - now)
+                    continue
+                self._refill(now)
+                if self.tokens >= 1:
+                    self.tokens -= 1
+                    return
+                await asyncio.sleep((1 - self.tokens) / self.rate)
+
+    def pause(self, seconds: float):
+        self.paused_until = max(self.paused_until, time.monotonic() + seconds)
+
+
+def format_message(ev: dict) -> str:
+    status = STATUS_LABELS.get(ev.get("status"), ev.get("status") or "—")
+    paid = "оплачен" if ev.get("payment_status") == "paid" else "не оплачен"
+    return (f"Заказ № {ev['order_id']}: статус «{status}», {paid}.\n"
+            f"Сумма: {float(ev.get('total') or 0):.2f} ₽")
+
+
+class NotificationWorker:
+    def __init__(self, bot: Bot, redis_url: str, stream: str = "wg:notify:orders",
+                 group: str = "bot", global_rate: float = 25.0, per_chat_rate: float = 1.0,
+                 batch_size: int = 200, coalesce_window: float = 1.0, max_attempts: int = 5,
+                 concurrency: int = 30, consumer: Optional[str] = None, claim_idle: float = 300.0,
+                 claim_interval: float = 60.0, max_deliveries: int = 5):
+        self.bot = bot
+        self.redis_url = redis_url
+        self.stream = stream
+        self.group = group
+        self.consumer = consumer or f"{socket.gethostname()}-{os.getpid()}"
+        self.claim_idle = claim_idle
+        self.claim_interval = claim_interval
+        self.max_deliveries = max_deliveries
+        self.batch_size = batch_size
+        self.coalesce_window = coalesce_window
+        self.max_attempts = max_attempts
+        self.per_chat_rate = per_chat_rate
+        self.global_bucket = TokenBucket(global_rate, capacity=global_rate)
+        self._chat_buckets: Dict[int, TokenBucket] = {}
+        self._slots = asyncio.Semaphore(concurrency)
+        self._redis = None
+        self._task: Optional[asyncio.Task] = None
+        self._stopping = False
+        self.sent = 0
+
+    async def start(self):
+        if self._redis is None:
+            import redis.asyncio as aioredis
+            self._redis = aioredis.Redis.from_url(self.redis_url, decode_responses=True)
+        try:
+            await self._redis.xgroup_create(self.stream, self.group, id="0", mkstream=True)
+        except Exception as e:
+            if "BUSYGROUP" not in str(e):
+                raise
+        self._task = asyncio.create_task(self._run(), name="order-notifications")
+
+    async def close(self, timeout: float = 15.0):
+        self._stopping = True
+        if self._task:
+            try:
+                await asyncio.wait_for(self._task, timeout=timeout)
+            except asyncio.TimeoutError:
+                pass
+        if self._redis is not None:
+            await self._redis.aclose()
+
+    def _chat_bucket(self, chat_id: int) -> TokenBucket:
+        bucket = self._chat_buckets.get(chat_id)
+        if bucket is None:
+            if len(self._chat_buckets) > 10000:
+                # выбрасываем давно простаивающие чаты
+                cutoff = time.monotonic() - 60
+                self._chat_buckets = {k: b for k, b in self._chat_buckets.items() if b.updated > cutoff}
+            bucket = self._chat_buckets[chat_id] = TokenBucket(self.per_chat_rate, capacity=1)
+        return bucket
+
+    async def _read(self, start_id: str, block: Optional[int]):
+        resp = await self._redis.xreadgroup(self.group, self.consumer, {self.stream: start_id},
+                                            count=self.batch_size, block=block)
+        return resp[0][1] if resp else []
+
+    async def _drop_poison(self, entries):
+        """Записи, которые доставляли слишком часто, — подтвердить и не слать."""
+        pending = await self._redis.xpending_range(self.stream, self.group, min=entries[0][0],
+                                                   max=entries[-1][0], count=len(entries),
+                                                   consumername=self.consumer)
+        dead = {p["message_id"] for p in pending if p["times_delivered"] > self.max_deliveries}
+        if not dead:
+            return entries
+        log.error("dropping %s notifications after %s deliveries", len(dead), self.max_deliveries)
+        await self._redis.xack(self.stream, self.group, *dead)
+        return [e for e in entries if e[0] not in dead]
+
+    async def _reclaim(self):
+        """Забрать зависшие записи других потребителей группы и доставить их."""
+        start = "0-0"
+        while not self._stopping:
+            start, entries = (await self._redis.xautoclaim(
+                self.stream, self.group, self.consumer, min_idle_time=int(self.claim_idle * 1000),
+                start_id=start, count=self.batch_size))[:2]
+            if entries:
+                log.info("claimed %s stale notifications", len(entries))
+                entries = await self._drop_poison(entries)
+                if entries:
+                    await self._deliver(entries)
+            if start == "0-0":
+                break
+
+    async def _run(self):
+        # сначала — то, что мы прочитали, но не подтвердили до перезапуска
+        backlog = True
+        claimed_at = 0.0
+        while not self._stopping:
+            try:
+                if time.monotonic() - claimed_at >= self.claim_interval:
+                    await self._reclaim()
+                    claimed_at = time.monotonic()
+                if backlog:
+                    entries = await self._read("0", None)
+                    backlog = bool(entries)
+                else:
+                    entries = await self._read(">", 2000)
+                    if entries and len(entries) < self.batch_size and self.coalesce_window:
+                        # даём накопиться соседним событиям тех же заказов
+                        await asyncio.sleep(self.coalesce_window)
+                        entries += await self._read(">", None)
+                if entries:
+                    await self._deliver(entries)
+            except asyncio.CancelledError:
+                raise
+            except Exception:
+                log.exception("notification loop error")
+                await asyncio.sleep(2)
+
+    async def _deliver(self, entries):
+        latest: Dict[str, dict] = {}
+        ids = []
+        for entry_id, fields in entries:
+            ids.append(entry_id)
+            if fields.get("order_id"):
+                latest[fields["order_id"]] = fields  # более позднее событие заказа побеждает
+        by_chat: Dict[int, list] = {}
+        for ev in latest.values():
+            by_chat.setdefault(int(ev["chat_id"]), []).append(ev)
+        results = await asyncio.gather(*(self._send_chat(chat_id, evs) for chat_id, evs in by_chat.items()))
+        self.sent += sum(results)
+        await self._redis.xack(self.stream, self.group, *ids)
+        if len(entries) > len(latest):
+            log.info("coalesced %s events into %s messages", len(entries), len(latest))
+
+    async def _send_chat(self, chat_id: int, events: list) -> int:
+        sent = 0
+        for ev in events:
+            sent += await self._send(chat_id, ev)
+        return sent
+
+    async def _send(self, chat_id: int, ev: dict) -> bool:
+        for attempt in range(1, self.max_attempts + 1):
+            # лимит чата ждём без слота: пока чат «остывает», слот нужен другим
+            await self._chat_bucket(chat_id).acquire()
+            async with self._slots:
+                await self.global_bucket.acquire()
+                try:
+                    await self.bot.send_message(chat_id, format_message(ev))
+                    return True
+                except TelegramRetryAfter as e:
+                    log.warning("429 for chat %s, retry after %ss", chat_id, e.retry_after)
+                    self.global_bucket.pause(e.retry_after)
+                    delay = e.retry_after
+                except (TelegramForbiddenError, TelegramBadRequest) as e:
+                    # пользователь заблокировал бота / чат не найден — повтор не поможет
+                    log.info("notification to %s dropped: %s", chat_id, e)
+                    return False
+                except Exception as e:
+                    log.warning("notification to %s failed (attempt %s): %s", chat_id, attempt, e)
+                    delay = min(30, 2 ** attempt)
+            await asyncio.sleep(delay)
+        return False
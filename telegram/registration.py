@@ -0,0 +1,150 @@
+"""Очередь регистраций пользователей из бота.
+
+/start не ходит в веб-приложение сам: пользователь кладётся в очередь
+(повторы по telegram_id схлопываются), фоновая задача отправляет пачки
+на /app/api/telegram/register/bulk через одну долгоживущую aiohttp-сессию.
+Очередь ограничена, при ошибках — повтор с экспоненциальной задержкой,
+при остановке бота — финальный сброс. 401/403 (неверный или сменённый
+BOT_API_SECRET), 429 и 5xx — повторяемые: пачка остаётся в очереди.
+Выбрасывается только пачка, которую сервер отверг как некорректную
+(400/413/422), — с ошибкой в логе и в счётчике dropped.
+"""
+import asyncio
+import logging
+import random
+from collections import OrderedDict
+from typing import Optional
+
+import aiohttp
+
+log = logging.getLogger("winstgrad.bot.registration")
+
+# ответы, которые повтором той же пачки не исправить
+BAD_PAYLOAD = (400, 413, 422)
+
+
+class RegistrationQueue:
+    def __init__(self, base_url: str, secret: Optional[str] = None, batch_size: int = 200,
+                 flush_interval: float = 1.0, max_queue: int = 10000, max_retries: int = 5):
+        self.url = f"{base_url.rstrip('/')}/app/api/telegram/register/bulk"
+        self.secret = secret
+        self.batch_size = batch_size
+        self.flush_interval = flush_interval
+        self.max_queue = max_queue
+        self.max_retries = max_retries
+        self._pending: "OrderedDict[int, dict]" = OrderedDict()
+        self._wakeup = asyncio.Event()
+        self._session: Optional[aiohttp.ClientSession] = None
+        self._task: Optional[asyncio.Task] = None
+        self._closing = False
+        self.dropped = 0
+
+    async def start(self):
+        connector = aiohttp.TCPConnector(limit=4, keepalive_timeout=60)
+        headers = {"X-Bot-Secret": self.secret} if self.secret else None
+        self._session = aiohttp.ClientSession(
+            connector=connector, headers=headers, timeout=aiohttp.ClientTimeout(total=15)
+        )
+        self._task = asyncio.create_task(self._run(), name="registration-queue")
+
+    def enqueue(self, user) -> bool:
+        """Поставить пользователя в очередь. False — очередь переполнена."""
+        if user.id not in self._pending and len(self._pending) >= self.max_queue:
+            log.warning("registration queue full (%s), dropping %s", self.max_queue, user.id)
+            return False
+        self._pending[user.id] = {
+            "telegram_id": user.id,
+            "username": user.username,
+            "first_name": user.first_name,
+            "last_name": user.last_name,
+        }
+        self._pending.move_to_end(user.id)
+        if len(self._pending) >= self.batch_size:
+            self._wakeup.set()
+        return True
+
+    def _take(self) -> list:
+        batch = []
+        while self._pending and len(batch) < self.batch_size:
+            _, payload = self._pending.popitem(last=False)
+            batch.append(payload)
+        return batch
+
+    def _requeue(self, batch: list):
+        # вернуть в начало очереди, не затирая более свежие данные
+        for payload in reversed(batch):
+            tg_id = payload["telegram_id"]
+            if tg_id not in self._pending and len(self._pending) < self.max_queue:
+                self._pending[tg_id] = payload
+                self._pending.move_to_end(tg_id, last=False)
+
+    async def _send(self, batch: list) -> bool:
+        try:
+            async with self._session.post(self.url, json={"users": batch}) as r:
+                if r.status == 200:
+                    data = await r.json(content_type=None)
+                    log.debug("registered batch: %s", data)
+                    return True
+                txt = (await r.text())[:300].replace("\n", " ")
+                if r.status in BAD_PAYLOAD:
+                    self.dropped += len(batch)
+                    log.error("bulk register [%s]: %s users dropped: %s", r.status, len(batch), txt)
+                    return True
+                log.warning("bulk register [%s]: %s", r.status, txt)
+                return False
+        except (aiohttp.ClientError, asyncio.TimeoutError) as e:
+            log.warning("bulk register error: %s", e)
+            return False
+
+    async def _flush_batch(self, batch: list, retries: int) -> bool:
+        for attempt in range(retries + 1):
+            if await self._send(batch):
+                return True
+            if attempt < retries:
+                delay = min(30.0, 0.5 * 2 ** attempt) * (0.5 + random.random())
+                await asyncio.sleep(delay)
+        return False
+
+    async def _run(self):
+        while not self._closing:
+            try:
+                await asyncio.wait_for(self._wakeup.wait(), timeout=self.flush_interval)
+            except asyncio.TimeoutError:
+                pass
+            self._wakeup.clear()
+            while self._pending and not self._closing:
+                batch = self._take()
+                try:
+                    ok = await self._flush_batch(batch, self.max_retries)
+                except asyncio.CancelledError:
+                    self._requeue(batch)  # остановка посреди повторов — отдадим при drain
+                    raise
+                if not ok:
+                    log.error("bulk register failed after %s retries, requeue %s users",
+                              self.max_retries, len(batch))
+                    self._requeue(batch)
+                    break
+
+    async def close(self, timeout: float = 10.0):
+        """Остановить фоновую задачу и отправить то, что осталось в очереди."""
+        self._closing = True
+        self._wakeup.set()
+        if self._task:
+            try:
+                await asyncio.wait_for(self._task, timeout=timeout)
+            except asyncio.TimeoutError:
+                self._task.cancel()
+        try:
+            async def drain():
+                while self._pending:
+                    batch = self._take()
+                    if not await self._flush_batch(batch, retries=1):
+                        self._requeue(batch)
+                        break
+            await asyncio.wait_for(drain(), timeout=timeout)
+        except asyncio.TimeoutError:
+            pass
+        if self._pending:
+            log.error("registration queue: %s users not sent on shutdown", len(self._pending))
+        if self._session:
+            await self._session.close()
@@ -0,0 +1,127 @@
+"""Webhook-режим бота (альтернатива long polling).
+
+aiohttp-сервер принимает апдейты от Telegram, проверяет секрет из заголовка
+X-Telegram-Bot-Api-Secret-Token, сразу отвечает 200 и обрабатывает апдейт
+в фоне. Число одновременно обрабатываемых апдейтов ограничено семафором:
+если все слоты заняты дольше acquire_timeout, отвечаем 503 и Telegram
+повторит доставку позже. При SIGTERM/SIGINT новые апдейты не принимаются,
+уже принятые дорабатываются (не дольше drain_timeout).
+
+Несколько экземпляров за балансировщиком: setWebhook должен делать только
+один из них (WEBHOOK_REGISTER=1), остальные — с WEBHOOK_REGISTER=0.
+"""
+import asyncio
+import hmac
+import logging
+import signal
+from typing import Optional, Set
+
+from aiohttp import web
+from aiogram import Bot, Dispatcher
+from aiogram.types import Update
+
+log = logging.getLogger("winstgrad.bot.webhook")
+
+SECRET_HEADER = "X-Telegram-Bot-Api-Secret-Token"
+
+
+class WebhookServer:
+    def __init__(self, bot: Bot, dp: Dispatcher, *, path: str, secret: str,
+                 max_concurrency: int = 64, acquire_timeout: float = 5.0, drain_timeout: float = 25.0):
+        self.bot = bot
+        self.dp = dp
+        self.path = path
+        self.secret = secret
+        self.acquire_timeout = acquire_timeout
+        self.drain_timeout = drain_timeout
+        self._slots = asyncio.Semaphore(max_concurrency)
+        self._tasks: Set[asyncio.Task] = set()
+        self._draining = False
+        self.handled = 0
+
+    def app(self) -> web.Application:
+        app = web.Application()
+        app.router.add_post(self.path, self.handle)
+        app.router.add_get("/healthz", self.healthz)
+        return app
+
+    async def healthz(self, request: web.Request) -> web.Response:
+        return web.json_response({"ok": not self._draining, "in_flight": len(self._tasks),
+                                  "handled": self.handled})
+
+    async def handle(self, request: web.Request) -> web.Response:
+        if not hmac.compare_digest(request.headers.get(SECRET_HEADER, ""), self.secret):
+            return web.Response(status=401)
+        if self._draining:
+            return web.Response(status=503)
+        try:
+            update = Update.model_validate(await request.json(), context={"bot": self.bot})
+        except Exception as e:
+            log.warning("bad update: %s", e)
+            return web.Response(status=400)
+        try:
+            await asyncio.wait_for(self._slots.acquire(), timeout=self.acquire_timeout)
+        except asyncio.TimeoutError:
+            return web.Response(status=503)
+        task = asyncio.create_task(self._process(update))
+        self._tasks.add(task)
+        task.add_done_callback(self._tasks.discard)
+        return web.Response(status=200)
+
+    async def _process(self, update: Update):
+        try:
+            await self.dp.feed_update(self.bot, update)
+        except Exception:
+            log.exception("update %s failed", update.update_id)
+        finally:
+            self.handled += 1
+            self._slots.release()
+
+    async def drain(self):
+        """Перестать принимать апдейты и дождаться уже принятых."""
+        self._draining = True
+        if not self._tasks:
+            return
+        log.info("draining %s in-flight updates", len(self._tasks))
+        done, pending = await asyncio.wait(set(self._tasks), timeout=self.drain_timeout)
+        for task in pending:
+            task.cancel()
+        if pending:
+            log.warning("drain timeout: %s updates cancelled", len(pending))
+
+
+async def run_webhook(bot: Bot, dp: Dispatcher, *, host: str, port: int, path: str, secret: str,
+                      public_url: Optional[str] = None, register: bool = True,
+                      max_concurrency: int = 64, drain_timeout: float = 25.0):
+    server = WebhookServer(bot, dp, path=path, secret=secret,
+                           max_concurrency=max_concurrency, drain_timeout=drain_timeout)
+    runner = web.AppRunner(server.app(), handle_signals=False)
+    await runner.setup()
+    site = web.TCPSite(runner, host, port)
+
+    await dp.emit_startup(bot=bot, dispatcher=dp)
+    await site.start()
+    log.info("webhook listening on %s:%s%s (max_concurrency=%s)", host, port, path, max_concurrency)
+    if register and public_url:
+        await bot.set_webhook(
+            url=public_url.rstrip("/") + path,
+            secret_token=secret,
+            max_connections=min(max_concurrency, 100),
+            allowed_updates=dp.resolve_used_update_types(),
+        )
+
+    stop = asyncio.Event()
+    loop = asyncio.get_running_loop()
+    for sig in (signal.SIGTERM, signal.SIGINT):
+        try:
+            loop.add_signal_handler(sig, stop.set)
+        except NotImplementedError:  # Windows
+            pass
+    try:
+        await stop.wait()
+    finally:
+        log.info("shutting down webhook server")
+        await server.drain()
+        await runner.cleanup()
+        await dp.emit_shutdown(bot=bot, dispatcher=dp)
+        await bot.session.close()
@@ -0,0 +1,79 @@
+"""Общие фикстуры: приложение на временной SQLite без Redis, чистая база на тест.
+
+Config читает окружение при импорте app — переменные выставляются до него.
+"""
+import os
+import tempfile
+
+_tmp = tempfile.mkdtemp(prefix="wg-tests-")
+os.environ.update({
+    "SQLALCHEMY_DATABASE_URI": "sqlite:///" + os.path.join(_tmp, "test.db"),
+    "REDIS_URL": "",  # get_redis() → None: кэши и очереди работают без Redis
+    "JWT_SECRET": "test-secret",
+    "TELEGRAM_BOT_TOKEN": "123456:test-token",
+    "TELEGRAM_ADMIN_ID": "1000",
+    "BOT_API_SECRET": "bot-secret",
+    "MEDIA_ROOT": os.path.join(_tmp, "media"),
+    "IMPORT_DIR": os.path.join(_tmp, "imports"),
+    "SLOW_QUERY_MS": "0",
+})
+
+import pytest  # noqa: E402
+from sqlalchemy import text  # noqa: E402
+
+pytest_plugins = ["app.pytest_plugin"]
+
+ADMIN_TG = 1000
+
+
+@pytest.fixture(scope="session")
+def app():
+    from app import create_app
+    app = create_app()
+    app.config.update(TESTING=True, COOKIE_DOMAIN=None, COOKIE_SECURE=False)
+    return app
+
+
+def _clear_caches():
+    from app import analytics, auth, fragments
+    from app.admin import counts
+    from app.catalog import _local
+    from app.utils import telegram_webapp
+    for cache in (auth._principals, fragments._local, analytics._reports, counts._estimates,
+                  telegram_webapp._verified, telegram_webapp._seen_hashes):
+        cache.clear()
+    _local.update(version=None, snapshot=None, built_at=0.0)
+
+
+@pytest.fixture(autouse=True)
+def db(app):
+    """Пустые таблицы (и FTS5-индексы) перед каждым тестом."""
+    from app.db import db
+    with app.app_context():
+        with db.engine.begin() as conn:
+            for table in reversed(db.metadata.sorted_tables):
+                conn.execute(table.delete())
+            conn.execute(text("DELETE FROM products_fts"))
+            conn.execute(text("DELETE FROM services_fts"))
+        _clear_caches()
+        yield db
+        db.session.remove()
+
+
+@pytest.fixture
+def client(app):
+    return app.test_client()
+
+
+@pytest.fixture
+def admin_client(app, db):
+    """Клиент с JWT администратора в cookie."""
+    from app.auth import ACCESS_COOKIE, create_tokens
+    from app.models import User
+    admin = User(telegram_id=ADMIN_TG, first_name="Admin", role="admin")
+    db.session.add(admin)
+    db.session.commit()
+    access, _ = create_tokens(admin.id, "admin")
+    c = app.test_client()
+    c.set_cookie(ACCESS_COOKIE, access)
+    return c
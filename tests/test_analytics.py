@@ -0,0 +1,75 @@
+import random
+from datetime import date, datetime, timedelta
+from decimal import Decimal
+from sqlalchemy import func, update
+from app import analytics
+from app.models import Order, OrderItem, SalesDaily, SalesDailyItem
+
+START = datetime(2026, 3, 1, 8, 0)
+
+
+def _seed(db, n=60, seed=1):
+    rnd = random.Random(seed)
+    for i in range(n):
+        created = START + timedelta(days=rnd.randrange(10), minutes=rnd.randrange(900))
+        order = Order(user_id=None, status=rnd.choice(("new", "done", "cancelled")),
+                      created_at=created, updated_at=created)
+        db.session.add(order)
+        db.session.flush()
+        total = Decimal("0")
+        for _ in range(rnd.randint(0, 3)):
+            qty, price = rnd.randint(1, 4), Decimal(rnd.randint(10, 500))
+            db.session.add(OrderItem(order_id=order.id, item_type=rnd.choice(("product", "service")),
+                                     item_id=rnd.randint(1, 5), qty=qty, unit_price=price, total=qty * price))
+            total += qty * price
+        order.total = total
+    # заказы «старые»: updated_at = created_at (onupdate поставил бы «сейчас»)
+    db.session.execute(update(Order).values(updated_at=Order.created_at))
+    db.session.commit()
+
+
+def _assert_matches_raw(db):
+    raw = {(d, st): (n, Decimal(str(rev or 0))) for d, st, n, rev in db.session.query(
+        func.date(Order.created_at), Order.status, func.count(Order.id), func.sum(Order.total)
+    ).group_by(func.date(Order.created_at), Order.status)}
+    rolled = {(d.isoformat(), st): (n, Decimal(str(rev))) for d, st, n, rev in db.session.query(
+        SalesDaily.day, SalesDaily.status, SalesDaily.orders, SalesDaily.revenue)}
+    assert rolled == raw
+    raw_items = db.session.query(func.sum(OrderItem.total), func.sum(OrderItem.qty)).one()
+    rolled_items = db.session.query(func.sum(SalesDailyItem.revenue), func.sum(SalesDailyItem.qty)).one()
+    assert [Decimal(str(v or 0)) for v in rolled_items] == [Decimal(str(v or 0)) for v in raw_items]
+
+
+def test_full_refresh_matches_raw_totals(db):
+    _seed(db)
+    result = analytics.refresh(full=True)
+    assert result["days"] == 10
+    _assert_matches_raw(db)
+
+
+def test_incremental_refresh_picks_up_changes(db):
+    _seed(db)
+    analytics.refresh()
+    order = db.session.query(Order).filter_by(status="new").first()
+    order.status = "done"  # updated_at — onupdate
+    late = START + timedelta(days=20)
+    db.session.add(Order(status="new", total=Decimal("99.50"), created_at=late, updated_at=datetime.utcnow()))
+    db.session.commit()
+    result = analytics.refresh()
+    # день изменённого заказа, день нового и день прошлой метки (запас REFRESH_OVERLAP)
+    assert 2 <= result["days"] <= 3
+    _assert_matches_raw(db)
+    assert analytics.refresh()["days"] <= 2  # повторный прогон только в пределах запаса REFRESH_OVERLAP
+    _assert_matches_raw(db)
+
+
+def test_report_excludes_cancelled(app, db):
+    _seed(db)
+    analytics.refresh(full=True)
+    with app.test_request_context():
+        rep = analytics.report(date(2026, 3, 1), date(2026, 3, 31))
+    counted = db.session.query(func.count(Order.id), func.sum(Order.total)) \
+        .filter(Order.status != "cancelled").one()
+    assert rep["summary"]["orders"] == counted[0]
+    assert rep["summary"]["revenue"] == round(float(counted[1]), 2)
+    assert "cancelled" in rep["by_status"]
@@ -0,0 +1,20 @@
+from benchmarks.scenarios import compare
+
+
+def _row(**kw):
+    row = {"p50_ms": 10.0, "p90_ms": 20.0, "queries_max": 3, "errors": 0,
+           "rss_delta_mb": 1.0, "rss_peak_mb": 100.0}
+    row.update(kw)
+    return row
+
+
+def test_compare_uses_rss_delta_not_process_peak():
+    base = {"catalog": _row()}
+    assert compare({"catalog": _row(rss_peak_mb=400.0)}, base, 0.25) == []
+    problems = compare({"catalog": _row(rss_delta_mb=30.0)}, base, 0.25)
+    assert problems == ["catalog: rss_delta_mb 1.0 → 30.0"]
+
+
+def test_compare_flags_latency_and_queries():
+    problems = compare({"catalog": _row(p50_ms=50.0, queries_max=4)}, {"catalog": _row()}, 0.25)
+    assert len(problems) == 2
@@ -0,0 +1,116 @@
+import json
+from datetime import datetime, timedelta
+from decimal import Decimal
+import pytest
+from app import catalog_import
+from app.catalog_import import import_file
+from app.models import Product
+
+
+def _csv(tmp_path, text, name="price.csv"):
+    path = tmp_path / name
+    path.write_text(text, encoding="utf-8")
+    return str(path)
+
+
+def _seed(db):
+    db.session.add_all([
+        Product(name="Шланг", sku="A-1", price=Decimal("10.00"), unit="шт", is_active=True),
+        Product(name="Кран", sku="A-2", price=Decimal("20.00"), unit="шт", is_active=True),
+        Product(name="Фитинг", sku="A-3", price=Decimal("30.00"), unit="шт", is_active=True),
+    ])
+    db.session.commit()
+
+
+def _active(db):
+    return {p.sku: p.is_active for p in db.session.query(Product)}
+
+
+def test_upsert_counts_and_rerun_is_noop(db, tmp_path):
+    _seed(db)
+    path = _csv(tmp_path, "артикул;наименование;цена\nA-1;Шланг;10\nA-2;Кран;25,50\nB-1;Муфта;5\n")
+    stats = import_file(path)
+    assert (stats["inserted"], stats["updated"], stats["unchanged"], stats["errors"]) == (1, 1, 1, 0)
+    assert db.session.query(Product).filter_by(sku="A-2").one().price == Decimal("25.50")
+    again = import_file(path)
+    assert (again["inserted"], again["updated"], again["unchanged"]) == (0, 0, 3)
+
+
+def test_bad_row_is_not_deactivated_and_errors_block_deactivation(db, tmp_path):
+    _seed(db)
+    path = _csv(tmp_path, "sku;name;price\nA-1;Шланг;10\nA-2;Кран;по запросу\n")
+    stats = import_file(path, deactivate_missing=True)
+    assert stats["errors"] == 1 and stats["deactivated"] == 0
+    assert stats["deactivate_skipped"]
+    assert _active(db) == {"A-1": True, "A-2": True, "A-3": True}
+
+    stats = import_file(path, deactivate_missing=True, force=True)
+    # A-2 в файле есть (строка битая) — снимается только A-3
+    assert stats["deactivated"] == 1
+    assert _active(db) == {"A-1": True, "A-2": True, "A-3": False}
+
+
+def test_file_without_valid_rows_does_not_deactivate(db, tmp_path):
+    _seed(db)
+    path = _csv(tmp_path, "sku;name;price\n;Без артикула;1\n")
+    stats = import_file(path, deactivate_missing=True, force=False)
+    assert stats["deactivated"] == 0 and stats["deactivate_skipped"]
+    assert all(_active(db).values())
+
+
+def test_clean_file_deactivates_missing(db, tmp_path):
+    _seed(db)
+    stats = import_file(_csv(tmp_path, "sku;price\nA-1;10\nA-2;20\n"), deactivate_missing=True)
+    assert stats["deactivated"] == 1 and stats["deactivate_skipped"] is None
+    assert _active(db)["A-3"] is False
+
+
+def _job(r, tmp_path, **fields):
+    job_id = "job1"
+    path = _csv(tmp_path, "sku;name;price\nC-1;Новый;7\n", name="job.csv")
+    r.hset(catalog_import.JOB_KEY.format(job_id),
+           mapping=dict({"status": "queued", "path": path, "filename": "job.csv", "options": "{}",
+                         "created_at": datetime.utcnow().isoformat()}, **fields))
+    r.lpush(catalog_import.JOB_QUEUE, job_id)
+    return job_id
+
+
+def test_queue_job_stays_in_processing_until_done(db, tmp_path):
+    fakeredis = pytest.importorskip("fakeredis")
+    r = fakeredis.FakeRedis()
+    job_id = _job(r, tmp_path)
+    assert catalog_import.claim(r, timeout=1) == job_id
+    assert r.lrange(catalog_import.JOB_PROCESSING, 0, -1) == [job_id.encode()]
+    # свежее задание в работе — не трогаем
+    assert catalog_import.requeue_stale(r, stale_after=3600) == 0
+
+    catalog_import.run_job(job_id, r)
+    catalog_import.done(r, job_id)
+    job = {k.decode(): v.decode() for k, v in r.hgetall(catalog_import.JOB_KEY.format(job_id)).items()}
+    assert job["status"] == "done" and json.loads(job["result"])["inserted"] == 1
+    assert r.llen(catalog_import.JOB_PROCESSING) == 0
+
+
+def test_stale_job_of_dead_worker_is_requeued(db, tmp_path):
+    fakeredis = pytest.importorskip("fakeredis")
+    r = fakeredis.FakeRedis()
+    old = (datetime.utcnow() - timedelta(hours=2)).isoformat()
+    job_id = _job(r, tmp_path, status="running", started_at=old)
+    catalog_import.claim(r, timeout=1)  # воркер взял задание и умер
+    assert catalog_import.requeue_stale(r, stale_after=3600) == 1
+    assert r.lrange(catalog_import.JOB_QUEUE, 0, -1) == [job_id.encode()]
+    assert r.llen(catalog_import.JOB_PROCESSING) == 0
+    assert r.hget(catalog_import.JOB_KEY.format(job_id), "status") == b"queued"
+
+
+def test_job_status_write_failure_does_not_kill_worker(db, tmp_path, monkeypatch):
+    fakeredis = pytest.importorskip("fakeredis")
+    r = fakeredis.FakeRedis()
+    job_id = _job(r, tmp_path)
+
+    def broken_hset(*args, **kwargs):
+        raise ConnectionError("redis went away")
+
+    monkeypatch.setattr(r, "hset", broken_hset)
+    catalog_import.run_job(job_id, r)
+    assert db.session.query(Product).filter_by(sku="C-1").count() == 1
@@ -0,0 +1,47 @@
+import csv
+import io
+import json
+from datetime import datetime
+from decimal import Decimal
+from app.exports import export_orders
+from app.models import Order, OrderItem, Product
+
+
+def _seed(db):
+    product = Product(name="Шланг", sku="H-1", price=Decimal("10"), is_active=True)
+    db.session.add(product)
+    db.session.flush()
+    first = Order(status="new", total=Decimal("20"), comment="=HYPERLINK(\"http://x\")",
+                  created_at=datetime(2026, 3, 1, 10), updated_at=datetime(2026, 3, 1, 10))
+    second = Order(status="done", total=Decimal("-5"), comment="обычный текст",
+                   created_at=datetime(2026, 3, 2, 10), updated_at=datetime(2026, 3, 2, 10))
+    db.session.add_all([first, second])
+    db.session.flush()
+    db.session.add_all([
+        OrderItem(order_id=first.id, item_type="product", item_id=product.id, qty=1,
+                  unit_price=Decimal("10"), total=Decimal("10")),
+        OrderItem(order_id=first.id, item_type="product", item_id=product.id, qty=1,
+                  unit_price=Decimal("10"), total=Decimal("10")),
+    ])
+    db.session.commit()
+    return first, second
+
+
+def test_csv_escapes_formulas_in_text_columns_only(db):
+    first, second = _seed(db)
+    rows = list(csv.DictReader(io.StringIO("".join(export_orders("csv")))))
+    assert [int(r["order_id"]) for r in rows] == [first.id, first.id, second.id]
+    assert rows[0]["comment"] == "'=HYPERLINK(\"http://x\")"
+    assert rows[0]["item_name"] == "Шланг"
+    assert rows[2]["comment"] == "обычный текст"
+    # числа не трогаем
+    assert rows[2]["order_total"] == "-5.00"
+    assert rows[2]["item_id"] == ""
+
+
+def test_jsonl_groups_items_and_keeps_raw_text(db):
+    first, second = _seed(db)
+    docs = [json.loads(line) for line in "".join(export_orders("jsonl")).splitlines()]
+    assert [d["order_id"] for d in docs] == [first.id, second.id]
+    assert docs[0]["comment"] == "=HYPERLINK(\"http://x\")"
+    assert len(docs[0]["items"]) == 2 and docs[1]["items"] == []
@@ -0,0 +1,44 @@
+import io
+import json
+import os
+from datetime import datetime, timedelta
+from PIL import Image
+from app import images
+from app.images import backfill, pending_remote, process_model_images
+from app.models import Product
+
+
+def _source(app, name="brick.png"):
+    root = app.config["MEDIA_SOURCE_ROOT"]
+    os.makedirs(root, exist_ok=True)
+    buf = io.BytesIO()
+    Image.new("RGB", (800, 600), (200, 80, 40)).save(buf, "PNG")
+    with open(os.path.join(root, name), "wb") as f:
+        f.write(buf.getvalue())
+    return name
+
+
+def test_backfill_touches_updated_at(app, db):
+    old = datetime.utcnow() - timedelta(days=1)
+    p = Product(name="Кирпич", sku="K-1", price=1, images_json=json.dumps([_source(app)]), updated_at=old)
+    db.session.add(p)
+    db.session.commit()
+    stats = backfill(app, workers=1)
+    assert stats["updated"] == 1 and stats["errors"] == 0
+    db.session.expire_all()
+    p = db.session.get(Product, p.id)
+    assert p.updated_at > old  # ключ кэша карточки (app/fragments.py) меняется
+    assert images.first_variant(p.images_json, "thumb")["w"] == 160
+
+
+def test_admin_processing_skips_remote(app, db, monkeypatch):
+    def no_network(*a, **kw):
+        raise AssertionError("remote image fetched in admin request")
+    monkeypatch.setattr("requests.get", no_network)
+    local = _source(app)
+    p = Product(name="Кирпич", price=1, images_json=json.dumps(["https://example.com/a.jpg", local]))
+    assert process_model_images(app, p, remote=False) == 0
+    entries = json.loads(p.images_json)
+    assert entries[0] == "https://example.com/a.jpg"
+    assert entries[1]["variants"]["thumb"]
+    assert pending_remote(p.images_json) == 1
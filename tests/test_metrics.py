@@ -0,0 +1,94 @@
+import os
+import socket
+import subprocess
+import sys
+import time
+import pytest
+import requests
+from prometheus_client import REGISTRY
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+
+def _count(endpoint, status):
+    return REGISTRY.get_sample_value("wg_http_request_duration_seconds_count",
+                                     {"endpoint": endpoint, "method": "GET", "status": status}) or 0
+
+
+def test_metrics_closed_without_token_or_allow_list(client):
+    assert client.get("/metrics").status_code == 403
+
+
+def test_metrics_token(app, client, monkeypatch):
+    monkeypatch.setitem(app.config, "METRICS_TOKEN", "s3cret")
+    assert client.get("/metrics", headers={"Authorization": "Bearer nope"}).status_code == 403
+    r = client.get("/metrics", headers={"Authorization": "Bearer s3cret"})
+    assert r.status_code == 200 and b"wg_http_request_duration_seconds" in r.data
+
+
+def test_allow_list_ignores_proxied_requests(app, client, monkeypatch):
+    monkeypatch.setitem(app.config, "METRICS_ALLOW_IPS", ("127.0.0.1",))
+    assert client.get("/metrics").status_code == 200
+    assert client.get("/metrics", headers={"X-Forwarded-For": "203.0.113.9"}).status_code == 403
+
+
+def test_unhandled_exception_recorded_as_500(app, client, monkeypatch):
+    def boom():
+        raise RuntimeError("boom")
+    monkeypatch.setitem(app.view_functions, "webapp.healthz", boom)
+    before = _count("webapp.healthz", "500")
+    with pytest.raises(RuntimeError):
+        client.get("/app/healthz")
+    assert _count("webapp.healthz", "500") == before + 1
+
+
+def _free_port():
+    with socket.socket() as s:
+        s.bind(("127.0.0.1", 0))
+        return s.getsockname()[1]
+
+
+def test_gunicorn_workers_share_metrics(app, tmp_path):
+    """Штатный gunicorn.conf.py с 3 воркерами: /metrics суммирует все процессы."""
+    pytest.importorskip("gunicorn")
+    port = _free_port()
+    env = dict(os.environ, WG_PROFILE="sync", WEB_WORKERS="3", WEB_BIND=f"127.0.0.1:{port}",
+               WEB_ACCESSLOG="", METRICS_TOKEN="t", TMPDIR=str(tmp_path))
+    env.pop("PROMETHEUS_MULTIPROC_DIR", None)
+    proc = subprocess.Popen([sys.executable, "-m", "gunicorn", "-c", "gunicorn.conf.py", "wsgi:app"],
+                            cwd=ROOT, env=env, stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
+    base = f"http://127.0.0.1:{port}"
+    try:
+        for _ in range(100):
+            try:
+                requests.get(base + "/app/healthz", timeout=1)
+                break
+            except requests.ConnectionError:
+                time.sleep(0.1)
+        n = 30
+        for _ in range(n):
+            assert requests.get(base + "/app/healthz", timeout=5).status_code == 200
+        body = requests.get(base + "/metrics", headers={"Authorization": "Bearer t"}, timeout=5).text
+    finally:
+        proc.terminate()
+        proc.wait(10)
+    line = next(l for l in body.splitlines()
+                if l.startswith("wg_http_request_duration_seconds_count")
+                and 'endpoint="webapp.healthz"' in l and 'status="200"' in l)
+    # первый запрос ожидания старта тоже считается
+    assert float(line.rsplit(" ", 1)[1]) >= n
+    files = [f for d, _, fs in os.walk(tmp_path) for f in fs if f.endswith(".db")]
+    assert len({f.rsplit("_", 1)[-1] for f in files}) > 1  # значения из нескольких процессов
+
+
+def test_on_starting_removes_only_metric_files(tmp_path, monkeypatch):
+    import importlib.util
+    monkeypatch.setenv("PROMETHEUS_MULTIPROC_DIR", str(tmp_path))
+    spec = importlib.util.spec_from_file_location("wg_gunicorn_conf", os.path.join(ROOT, "gunicorn.conf.py"))
+    conf = importlib.util.module_from_spec(spec)
+    spec.loader.exec_module(conf)
+    (tmp_path / "histogram_123.db").write_bytes(b"x")
+    (tmp_path / "unrelated.txt").write_text("keep")
+    (tmp_path / "subdir").mkdir()
+    conf.on_starting(None)
+    assert sorted(p.name for p in tmp_path.iterdir()) == ["subdir", "unrelated.txt"]
@@ -0,0 +1,76 @@
+import asyncio
+import os
+import sys
+import pytest
+
+fakeredis = pytest.importorskip("fakeredis")
+pytest.importorskip("aiogram")
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.dirname(__file__)), "telegram"))
+from notifications import NotificationWorker  # noqa: E402
+
+STREAM, GROUP = "wg:notify:test", "bot"
+
+
+class FakeBot:
+    def __init__(self, hang=False):
+        self.sent = []
+        self.hang = hang
+        self.called = asyncio.Event()
+
+    async def send_message(self, chat_id, text):
+        self.called.set()
+        if self.hang:
+            await asyncio.Event().wait()  # «завис» посреди пачки
+        self.sent.append((chat_id, text))
+
+
+def _worker(server, bot, consumer, **kwargs):
+    w = NotificationWorker(bot, "redis://fake", stream=STREAM, group=GROUP, consumer=consumer,
+                           coalesce_window=0, **kwargs)
+    w._redis = fakeredis.FakeAsyncRedis(server=server, decode_responses=True)
+    return w
+
+
+async def _wait(predicate, timeout=5.0):
+    deadline = asyncio.get_running_loop().time() + timeout
+    while not predicate():
+        assert asyncio.get_running_loop().time() < deadline
+        await asyncio.sleep(0.01)
+
+
+def test_events_of_crashed_consumer_are_delivered_by_another():
+    async def scenario():
+        server = fakeredis.FakeServer()
+        r = fakeredis.FakeAsyncRedis(server=server, decode_responses=True)
+        await r.xgroup_create(STREAM, GROUP, id="0", mkstream=True)
+        for order_id, chat_id in ((1, 11), (2, 12), (3, 13)):
+            await r.xadd(STREAM, {"order_id": order_id, "chat_id": chat_id, "status": "done"})
+
+        crashed = _worker(server, FakeBot(hang=True), "bot-a")
+        await crashed.start()
+        await asyncio.wait_for(crashed.bot.called.wait(), 5)
+        crashed._task.cancel()  # процесс убит, XACK не было
+        assert len(await r.xpending_range(STREAM, GROUP, min="-", max="+", count=10)) == 3
+
+        fresh = _worker(server, FakeBot(), "bot-b", claim_idle=0)
+        await fresh.start()
+        await _wait(lambda: len(fresh.bot.sent) == 3)
+        await fresh.close()
+        assert sorted(chat for chat, _ in fresh.bot.sent) == [11, 12, 13]
+        assert await r.xpending_range(STREAM, GROUP, min="-", max="+", count=10) == []
+
+    asyncio.run(scenario())
+
+
+def test_busy_chat_does_not_hold_slot_from_other_chats():
+    async def scenario():
+        bot = FakeBot()
+        w = _worker(fakeredis.FakeServer(), bot, "bot-a", concurrency=1, per_chat_rate=5)
+        entries = [(f"{i}-0", {"order_id": str(i), "chat_id": "11"}) for i in range(1, 4)]
+        entries.append(("4-0", {"order_id": "4", "chat_id": "12"}))
+        await w._deliver(entries)
+        # чат 12 не ждёт, пока чат 11 отсидит свой лимит 1 сообщение / 0.2 с
+        assert [chat for chat, _ in bot.sent][:2] == [11, 12]
+        assert len(bot.sent) == 4
+
+    asyncio.run(scenario())
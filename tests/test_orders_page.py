@@ -0,0 +1,36 @@
+from datetime import datetime, timedelta
+import pytest
+from app.models import Order, User
+from app.routes.webapp import ORDERS_PAGE
+
+HTML = {"Accept": "text/html"}
+
+
+def _orders(db, n):
+    user_id = db.session.query(User.id).filter_by(role="admin").scalar()
+    now = datetime.utcnow()
+    db.session.add_all([Order(user_id=user_id, status="new", total=i, created_at=now - timedelta(minutes=i))
+                        for i in range(n)])
+    db.session.commit()
+
+
+def test_invalid_cursor_renders_first_page(admin_client, db):
+    _orders(db, 3)
+    r = admin_client.get("/app/orders?cursor=garbage", headers=HTML)
+    assert r.status_code == 200
+    assert r.mimetype == "text/html"
+
+
+def test_invalid_cursor_on_partial_is_400_html(admin_client):
+    r = admin_client.get("/app/orders?partial=1&cursor=garbage", headers=HTML)
+    assert r.status_code == 400
+    assert r.mimetype == "text/plain"
+
+
+@pytest.mark.query_budget(6)
+def test_pagination_follows_cursor(admin_client, db, query_budget):
+    _orders(db, ORDERS_PAGE + 5)
+    first = admin_client.get("/app/orders", headers=HTML).get_data(as_text=True)
+    cursor = first.split('data-cursor="', 1)[1].split('"', 1)[0]
+    r = admin_client.get(f"/app/orders?partial=1&cursor={cursor}", headers=HTML)
+    assert r.status_code == 200
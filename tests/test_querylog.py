@@ -0,0 +1,56 @@
+import time
+import pytest
+from flask import request_started
+from sqlalchemy import event, text
+from sqlalchemy.exc import OperationalError
+from app import querylog
+from app.querylog import QueryRecorder, normalize
+
+
+def test_normalize_collapses_literals_and_in_lists():
+    a = normalize("SELECT * FROM products WHERE id IN (?, ?, ?) AND name = 'x'")
+    b = normalize("SELECT  *  FROM products WHERE id IN (?) AND name = 'yy'")
+    assert a == b
+
+
+def test_repeated_groups_same_statement(db):
+    with QueryRecorder() as rec:
+        for i in range(6):
+            db.session.execute(text("SELECT :i"), {"i": i})
+        db.session.execute(text("SELECT 1, 2"))
+    groups = rec.repeated(5)
+    assert len(groups) == 1 and groups[0][1] == 6
+
+
+def test_failed_statement_keeps_start_time_on_its_context(db):
+    conn = db.session.connection()
+    failed = []
+
+    def on_error(ctx):
+        failed.append(ctx.execution_context)
+
+    event.listen(db.engine, "handle_error", on_error)
+    try:
+        with QueryRecorder() as rec:
+            with pytest.raises(OperationalError):
+                conn.execute(text("SELECT * FROM no_such_table"))
+            time.sleep(0.2)
+            conn.execute(text("SELECT 1"))
+    finally:
+        event.remove(db.engine, "handle_error", on_error)
+    # метка упавшего оператора — на его контексте выполнения и уходит вместе с ним
+    assert hasattr(failed[0], "_wg_querylog_start")
+    assert rec.count == 1 and rec.queries[0][1] < 0.1
+
+
+def test_budget_recorder_stopped_without_response(app, query_budget):
+    # request_finished не приходит при исключении — рекордер снимается в teardown
+    with app.test_request_context("/app/catalog"):
+        request_started.send(app)
+        assert querylog._recorders.get()
+    assert querylog._recorders.get() == ()
+
+
+@pytest.mark.query_budget(1)
+def test_budget_counts_http_request(client, query_budget):
+    client.get("/app/healthz")
@@ -0,0 +1,61 @@
+import asyncio
+import os
+import sys
+from types import SimpleNamespace
+import pytest
+
+aiohttp = pytest.importorskip("aiohttp")
+from aiohttp import web  # noqa: E402
+from aiohttp.test_utils import TestServer  # noqa: E402
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.dirname(__file__)), "telegram"))
+from registration import RegistrationQueue  # noqa: E402
+
+
+_real_sleep = asyncio.sleep
+
+
+async def _no_sleep(delay, *args):
+    await _real_sleep(0)
+
+
+def _run(statuses, retries=0):
+    """Одна пачка из двух пользователей против сервера, отвечающего statuses по очереди."""
+    async def scenario():
+        replies = list(statuses)
+
+        async def bulk(request):
+            await request.json()
+            return web.json_response({"success": True}, status=replies.pop(0))
+
+        app = web.Application()
+        app.router.add_post("/app/api/telegram/register/bulk", bulk)
+        async with TestServer(app) as server:
+            queue = RegistrationQueue(str(server.make_url("/")), secret="bot-secret", max_retries=retries)
+            await queue.start()
+            queue._closing = True  # без фоновой задачи — пачки отправляем сами
+            for tg_id in (1, 2):
+                queue.enqueue(SimpleNamespace(id=tg_id, username=None, first_name="x", last_name=None))
+            batch = queue._take()
+            ok = await queue._flush_batch(batch, queue.max_retries)
+            if not ok:
+                queue._requeue(batch)
+            await queue._session.close()
+            return ok, list(queue._pending), queue.dropped
+
+    return asyncio.run(scenario())
+
+
+@pytest.mark.parametrize("status", [401, 403, 429, 500, 503])
+def test_auth_and_server_errors_keep_batch(status):
+    assert _run([status]) == (False, [1, 2], 0)
+
+
+@pytest.mark.parametrize("status", [400, 413, 422])
+def test_bad_payload_is_dropped_and_counted(status):
+    assert _run([status]) == (True, [], 2)
+
+
+def test_rotated_secret_recovers_on_retry(monkeypatch):
+    monkeypatch.setattr(asyncio, "sleep", _no_sleep)
+    assert _run([403, 200], retries=1) == (True, [], 0)
@@ -0,0 +1,69 @@
+import json
+import pytest
+from app.models import Product, Review, ReviewAggregate, User
+from app.reviews import _insert_missing, rebuild_aggregates
+
+
+@pytest.fixture
+def product(db):
+    user = User(telegram_id=1, first_name="Клиент")
+    product = Product(name="Кирпич", sku="K-1", price=10)
+    db.session.add_all([user, product])
+    db.session.commit()
+    return product
+
+
+def _agg(db, product):
+    db.session.expire_all()
+    return db.session.get(ReviewAggregate, ("product", product.id))
+
+
+def _review(db, product, rating, moderated=False):
+    r = Review(user_id=1, target_type="product", target_id=product.id, rating=rating, is_moderated=moderated)
+    db.session.add(r)
+    db.session.commit()
+    return r
+
+
+def test_publish_increments(db, product):
+    first = _review(db, product, 5)
+    assert _agg(db, product) is None  # без модерации агрегата нет
+    first.is_moderated = True
+    db.session.commit()
+    second = _review(db, product, 3, moderated=True)
+    agg = _agg(db, product)
+    assert (agg.review_count, agg.rating_sum) == (2, 8)
+    assert json.loads(agg.recent_ids) == [second.id, first.id]
+
+
+def test_unpublish_and_delete_recompute(db, product):
+    reviews = [_review(db, product, r, moderated=True) for r in (5, 4, 2)]
+    reviews[0].is_moderated = False
+    db.session.commit()
+    assert (_agg(db, product).review_count, _agg(db, product).rating_sum) == (2, 6)
+    db.session.delete(reviews[1])
+    db.session.commit()
+    agg = _agg(db, product)
+    assert (agg.review_count, agg.rating_sum) == (1, 2)
+    assert json.loads(agg.recent_ids) == [reviews[2].id]
+
+
+def test_incremental_matches_rebuild(db, product):
+    for rating in (1, 2, 3, 4, 5, 5, 4):
+        _review(db, product, rating, moderated=True)
+    incremental = _agg(db, product)
+    before = (incremental.review_count, incremental.rating_sum, incremental.recent_ids)
+    rebuild_aggregates()
+    rebuilt = _agg(db, product)
+    assert (rebuilt.review_count, rebuilt.rating_sum, rebuilt.recent_ids) == before
+
+
+def test_first_row_created_by_concurrent_writer(db, product):
+    # строку агрегата уже вставила параллельная транзакция — вторая вставка не падает
+    conn = db.session.connection()
+    _insert_missing(conn, ("product", product.id))
+    _insert_missing(conn, ("product", product.id))
+    db.session.commit()
+    _review(db, product, 4, moderated=True)
+    agg = _agg(db, product)
+    assert (agg.review_count, agg.rating_sum) == (1, 4)
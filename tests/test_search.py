@@ -0,0 +1,34 @@
+from sqlalchemy.dialects import mysql
+from app.models import Product
+from app.search import _mysql_terms, _name_prefix, _search_like, search
+
+
+def test_mysql_terms_drop_short_and_stopwords(app):
+    with app.test_request_context():
+        assert _mysql_terms(["кирпич", "м", "of", "the", "м500"]) == ["кирпич", "м500"]
+        assert _mysql_terms(["на", "to"]) == []
+
+
+def test_fts_search_and_like_fallback(db):
+    db.session.add_all([Product(name="Кирпич облицовочный", sku="K-1", price=10),
+                        Product(name="Цемент М500", sku="C-500", price=5)])
+    db.session.commit()
+    products, _ = search("кирп")
+    assert [p.sku for p in products] == ["K-1"]
+    # кириллица без учёта регистра в LIKE SQLite не работает — проверяем на латинице
+    db.session.add(Product(name="Mortar M5", sku="M-5", price=1))
+    db.session.commit()
+    products, _ = _search_like(["mortar", "m5"], 10)
+    assert [p.sku for p in products] == ["M-5"]
+
+
+def test_like_fallback_uses_index_and_escapes_wildcards(db):
+    sql = str(_name_prefix(Product.name, ["ки"], "mysql").compile(dialect=mysql.dialect()))
+    assert "lower" not in sql.lower() and "LIKE" in sql
+    db.session.add_all([Product(name="100% cotton", sku="T-1", price=1),
+                        Product(name="1000 bricks", sku="B-1", price=1),
+                        Product(name="a_b pipe", sku="P-1", price=1),
+                        Product(name="axb pipe", sku="P-2", price=1)])
+    db.session.commit()
+    assert [p.sku for p in _search_like(["100%"], 10)[0]] == ["T-1"]
+    assert [p.sku for p in _search_like(["a_b"], 10)[0]] == ["P-1"]
@@ -0,0 +1,63 @@
+import pytest
+from app import cache
+from app.utils import telegram_webapp
+from benchmarks.initdata_verify import sign_init_data
+
+BOT_TOKEN = "123456:test-token"
+
+
+def _init_data(tg_id=555, **extra):
+    return sign_init_data({"id": tg_id, "first_name": "Иван"}, bot_token=BOT_TOKEN, **extra)
+
+
+def test_init_data_issues_tokens_once(app, client):
+    init_data = _init_data()
+    r = client.post("/app/api/telegram/auth", json={"initData": init_data})
+    assert r.status_code == 200 and r.json["success"]
+    # чужой клиент без сессии с перехваченной initData
+    replay = app.test_client().post("/app/api/telegram/auth", json={"initData": init_data})
+    assert replay.status_code == 401
+    fresh = app.test_client().post("/app/api/telegram/auth", json={"initData": _init_data(query_id="other")})
+    assert fresh.status_code == 200
+
+
+def test_reload_in_same_session_keeps_session(client):
+    init_data = _init_data()
+    assert client.post("/app/api/telegram/auth", json={"initData": init_data}).status_code == 200
+    again = client.post("/app/api/telegram/auth", json={"initData": init_data})
+    assert again.status_code == 200 and again.json["user"]["telegram_id"] == 555
+    assert "Set-Cookie" not in again.headers  # новых токенов нет
+
+
+def test_replay_with_other_users_session_rejected(app, client):
+    init_data = _init_data()
+    assert client.post("/app/api/telegram/auth", json={"initData": init_data}).status_code == 200
+    other = app.test_client()
+    assert other.post("/app/api/telegram/auth", json={"initData": _init_data(tg_id=777)}).status_code == 200
+    assert other.post("/app/api/telegram/auth", json={"initData": init_data}).status_code == 401
+
+
+def test_header_login_accepts_same_init_data_without_cookies(app):
+    init_data = _init_data()
+    for _ in range(3):
+        # WebView без cookies: каждый запрос — новый клиент с тем же заголовком
+        r = app.test_client().post("/app/auth", headers={"X-Telegram-Init-Data": init_data})
+        assert r.status_code == 200 and r.json["ok"]
+
+
+def test_tampered_init_data_rejected(client):
+    init_data = _init_data()
+    tampered = init_data.replace("555", "1000")
+    assert tampered != init_data
+    assert client.post("/app/api/telegram/auth", json={"initData": tampered}).status_code == 401
+
+
+def test_replay_detected_across_workers_via_redis(app, client, monkeypatch):
+    fakeredis = pytest.importorskip("fakeredis")
+    monkeypatch.setitem(app.config, "REDIS_URL", "redis://fake/0")
+    monkeypatch.setitem(cache._redis_clients, "redis://fake/0", fakeredis.FakeRedis())
+    init_data = _init_data()
+    assert client.post("/app/api/telegram/auth", json={"initData": init_data}).status_code == 200
+    telegram_webapp._seen_hashes.clear()  # другой воркер: своей памяти о hash нет
+    telegram_webapp._verified.clear()
+    assert app.test_client().post("/app/api/telegram/auth", json={"initData": init_data}).status_code == 401
@@ -0,0 +1,49 @@
+from app.models import User
+from app.users import telegram_id_of, upsert_telegram_user, upsert_telegram_users
+
+BOT = {"X-Bot-Secret": "bot-secret"}
+
+
+def test_telegram_id_validation():
+    assert telegram_id_of({"id": 42}) == 42
+    assert telegram_id_of({"telegram_id": "42"}) == 42
+    for bad in ("abc", "1.5", -1, True, 2 ** 64, {"x": 1}, None):
+        assert telegram_id_of({"telegram_id": bad}) is None
+
+
+def test_upsert_skips_unchanged_and_keeps_old_values(db):
+    first = upsert_telegram_user({"id": 7, "username": "ivan", "first_name": "Иван"})
+    again = upsert_telegram_user({"id": 7, "username": "ivan", "first_name": "Иван"})
+    assert again.id == first.id
+    upsert_telegram_user({"id": 7, "username": "", "first_name": "Ваня"})
+    user = db.session.query(User).filter_by(telegram_id=7).one()
+    assert (user.username, user.first_name) == ("ivan", "Ваня")
+    assert db.session.query(User).count() == 1
+
+
+def test_bulk_upsert_counts(db):
+    upsert_telegram_users([{"telegram_id": 1, "first_name": "A"}])
+    stats = upsert_telegram_users([
+        {"telegram_id": 1, "first_name": "A"},    # без изменений
+        {"telegram_id": 2, "first_name": "B"},
+        {"telegram_id": 2, "first_name": "B2"},   # повтор в пачке — побеждает последний
+        {"telegram_id": "oops"}, "not a dict",
+    ])
+    assert stats == {"received": 5, "written": 1, "invalid": 2}
+    assert db.session.query(User.first_name).filter_by(telegram_id=2).scalar() == "B2"
+
+
+def test_register_rejects_malformed_telegram_id(client):
+    r = client.post("/app/api/telegram/register", json={"telegram_id": "abc"}, headers=BOT)
+    assert r.status_code == 400
+    r = client.post("/app/api/telegram/register", json=[1, 2], headers=BOT)
+    assert r.status_code == 400
+    r = client.post("/app/api/telegram/register", json={"telegram_id": "15", "first_name": "X"}, headers=BOT)
+    assert r.status_code == 200 and r.json["user_id"]
+
+
+def test_register_bulk_reports_invalid_rows(client):
+    r = client.post("/app/api/telegram/register/bulk", headers=BOT,
+                    json={"users": [{"telegram_id": 5}, {"telegram_id": None}, {"id": "x"}]})
+    assert r.status_code == 200
+    assert (r.json["written"], r.json["invalid"]) == (1, 2)